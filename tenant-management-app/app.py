@@ -2,14 +2,20 @@
 
 import os
 from datetime import datetime, date, timedelta
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, g, render_template_string, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+from sqlalchemy import event, inspect, text
 from io import BytesIO, StringIO
 import csv
 from dotenv import load_dotenv
 import shutil
+import click
+import hmac
+import re
+import sys
+import threading
+import time
+from collections import Counter
 
 # Load environment variables from a .env file. This must be called before
 # any os.getenv() calls that rely on the .env file.
@@ -1230,8 +1236,8 @@ class Property(Base):
 
 class Transaction(Base):
     id = db.Column(db.Integer, primary_key=True)
-    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenant.id'))
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False, index=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenant.id'), index=True)
     type = db.Column(db.String(50), nullable=False)
     for_month = db.Column(db.String(20))
     amount = db.Column(db.Float, nullable=False)
@@ -1261,6 +1267,217 @@ class Transaction(Base):
             'comments': self.comments
         }
 
+# --- Materialized Ledger Balances ---
+# Running totals per tenant and per property, updated on the same connection
+# (and therefore in the same database transaction) as every transaction write.
+
+class LedgerBalance(db.Model):
+    entity_type = db.Column(db.String(10), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    charges = db.Column(db.Float, nullable=False, default=0.0)
+    payments = db.Column(db.Float, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+LEDGER_FIELDS = ('type', 'amount', 'tenant_id', 'property_id')
+
+UPSERT_LEDGER_BALANCE = text("""
+    INSERT INTO ledger_balance (entity_type, entity_id, charges, payments, transaction_count)
+    VALUES (:entity_type, :entity_id, :charges, :payments, :count)
+    ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+        charges = ledger_balance.charges + excluded.charges,
+        payments = ledger_balance.payments + excluded.payments,
+        transaction_count = ledger_balance.transaction_count + excluded.transaction_count
+""")
+
+def apply_ledger_delta(connection, values, sign):
+    """Adds (sign=1) or removes (sign=-1) one transaction's contribution."""
+    amount = (values['amount'] or 0.0) * sign
+    charges, payments = (0.0, amount) if values['type'] == 'payment_received' else (amount, 0.0)
+    for entity_type in ('tenant', 'property'):
+        entity_id = values[f'{entity_type}_id']
+        if entity_id is not None:
+            connection.execute(UPSERT_LEDGER_BALANCE, {
+                'entity_type': entity_type, 'entity_id': entity_id,
+                'charges': charges, 'payments': payments, 'count': sign
+            })
+
+def previous_ledger_values(target):
+    state = inspect(target)
+    values = {}
+    for field in LEDGER_FIELDS:
+        history = state.attrs[field].history
+        values[field] = history.deleted[0] if history.deleted else getattr(target, field)
+    return values
+
+@event.listens_for(Transaction, 'after_insert')
+def ledger_after_insert(mapper, connection, target):
+    apply_ledger_delta(connection, {f: getattr(target, f) for f in LEDGER_FIELDS}, 1)
+
+@event.listens_for(Transaction, 'after_update')
+def ledger_after_update(mapper, connection, target):
+    before = previous_ledger_values(target)
+    after = {f: getattr(target, f) for f in LEDGER_FIELDS}
+    if before != after:
+        apply_ledger_delta(connection, before, -1)
+        apply_ledger_delta(connection, after, 1)
+
+@event.listens_for(Transaction, 'after_delete')
+def ledger_after_delete(mapper, connection, target):
+    apply_ledger_delta(connection, previous_ledger_values(target), -1)
+
+EXPECTED_LEDGER_SQL = """
+    SELECT '{entity}' AS entity_type, {entity}_id AS entity_id,
+           SUM(CASE WHEN type <> 'payment_received' THEN amount ELSE 0 END) AS charges,
+           SUM(CASE WHEN type = 'payment_received' THEN amount ELSE 0 END) AS payments,
+           COUNT(*) AS transaction_count
+    FROM "transaction" WHERE {entity}_id IS NOT NULL GROUP BY {entity}_id
+"""
+
+def ledger_totals(row):
+    """(charges, payments, count) rounded to cents: the float sums pick up binary rounding error."""
+    return round(row.charges or 0.0, 2), round(row.payments or 0.0, 2), row.transaction_count
+
+def verify_ledger():
+    """Recomputes every balance from the transaction table and returns the drift."""
+    sql = ' UNION ALL '.join(EXPECTED_LEDGER_SQL.format(entity=e) for e in ('tenant', 'property'))
+    expected = {(r.entity_type, r.entity_id): ledger_totals(r) for r in db.session.execute(text(sql))}
+    stored = {
+        (r.entity_type, r.entity_id): ledger_totals(r) for r in LedgerBalance.query.all()
+        if ledger_totals(r) != (0.0, 0.0, 0)
+    }
+    return [
+        (key, expected.get(key), stored.get(key))
+        for key in sorted(expected.keys() | stored.keys()) if expected.get(key) != stored.get(key)
+    ]
+
+def rebuild_ledger():
+    """Replaces all stored balances with values recomputed from scratch."""
+    drift = verify_ledger()
+    db.session.execute(text('DELETE FROM ledger_balance'))
+    for entity in ('tenant', 'property'):
+        db.session.execute(text(
+            'INSERT INTO ledger_balance (entity_type, entity_id, charges, payments, transaction_count) '
+            + EXPECTED_LEDGER_SQL.format(entity=entity)
+        ))
+    db.session.commit()
+    return drift
+
+def get_ledger_balance(entity_type, entity_id):
+    """O(1) lookup of the stored running balance (payments minus charges)."""
+    row = db.session.get(LedgerBalance, (entity_type, entity_id))
+    return (row.payments - row.charges) if row else 0.0
+
+@app.cli.command('ledger')
+@click.argument('action', type=click.Choice(['verify', 'rebuild']))
+def ledger_command(action):
+    """Verifies or rebuilds the materialized ledger balances."""
+    # Bring the schema up to date through the versioned runner so schema_version stays in step
+    from db_update import upgrade
+    upgrade(db.engine)
+    drift = verify_ledger() if action == 'verify' else rebuild_ledger()
+    for key, expected, stored in drift:
+        click.echo(f'{key}: expected={expected} stored={stored}')
+    click.echo(f'{len(drift)} drifted balance(s) found.')
+    if action == 'rebuild':
+        click.echo('Ledger balances rebuilt.')
+    elif drift:
+        raise SystemExit(1)
+
+# --- Request Profiling ---
+# An admin sends the PROFILE_TOKEN in an X-Profile header (or ?profile=) and gets
+# the request's collapsed stacks back instead of the normal response. With
+# PROFILE_SAMPLE_EVERY=N, every Nth request per route is profiled into PROFILE_DIR.
+# The collapsed format ("a;b;c 12" per line) loads directly into flamegraph tools.
+
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = 0.002
+profile_route_counts = Counter()
+profile_lock = threading.Lock()
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.started = time.perf_counter()
+        self.duration = None
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def profile_mode():
+    """Return 'admin', 'sampled' or None for the current request."""
+    supplied = request.headers.get('X-Profile') or request.args.get('profile')
+    if PROFILE_TOKEN and supplied and hmac.compare_digest(supplied, PROFILE_TOKEN):
+        return 'admin'
+    if PROFILE_SAMPLE_EVERY > 0:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        with profile_lock:
+            profile_route_counts[route] += 1
+            if profile_route_counts[route] % PROFILE_SAMPLE_EVERY == 0:
+                return 'sampled'
+    return None
+
+@app.before_request
+def start_profile():
+    mode = profile_mode()
+    if mode:
+        g.profile = (mode, StackSampler(threading.get_ident()))
+
+@app.after_request
+def finish_profile(response):
+    mode, sampler = g.pop('profile', (None, None))
+    if sampler is None:
+        return response
+    sampler.stop()
+    if mode == 'admin':
+        profiled = app.response_class(sampler.collapsed(), mimetype='text/plain')
+        profiled.headers['X-Profile'] = (
+            f"samples={sampler.samples}; interval_ms={sampler.interval * 1000:g}; "
+            f"duration_ms={sampler.duration * 1000:.1f}"
+        )
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        return profiled
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+    path = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{request.method}_{slug}.folded")
+    with open(path, 'w') as f:
+        f.write(sampler.collapsed())
+    app.logger.info('Saved request profile to %s', path)
+    return response
+
+@app.teardown_request
+def discard_profile(exc):
+    _, sampler = g.pop('profile', (None, None))
+    if sampler is not None:
+        sampler.stop()
+
 # --- API Endpoints ---
 # These endpoints handle the business logic and data interaction.
 
@@ -1419,13 +1636,8 @@ def get_property_transactions(id):
     
     transactions_list = [tx.to_dict() for tx in transactions]
     
-    # Calculate the total balance for the property
-    total_balance = 0.0
-    for tx in transactions:
-        if tx.type == 'payment_received':
-            total_balance += tx.amount
-        else:
-            total_balance -= tx.amount
+    # The running balance is maintained on every write, so this is a key lookup
+    total_balance = get_ledger_balance('property', id)
     
     return jsonify({
         'transactions': transactions_list,
@@ -1437,6 +1649,10 @@ def get_property_transactions(id):
 
 def generate_excel_report(data, headers, title):
     """Helper function to create an Excel file from data."""
+    # Imported here so starting the app does not pay for openpyxl
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
     wb = Workbook()
     ws = wb.active
     ws.title = title
@@ -1647,8 +1863,16 @@ def index():
     """Renders the main HTML page for the application."""
     return render_template_string(HTML_TEMPLATE)
 
+# Workers forked by gunicorn --preload must not reuse the master's pooled connections
+with app.app_context():
+    _engine = db.engine
+os.register_at_fork(after_in_child=lambda: _engine.dispose(close=False))
+
 if __name__ == '__main__':
     with app.app_context():
         # This will create the database tables if they don't already exist
         db.create_all()
+        # Databases created before the ledger existed start with empty balances
+        if Transaction.query.first() and not LedgerBalance.query.first():
+            rebuild_ledger()
     app.run(debug=True)
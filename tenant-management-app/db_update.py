@@ -1,22 +1,209 @@
-import sqlite3
+"""
+Versioned schema migrations for the single-file app's database.
 
-# Connect to (or create) the database
-conn = sqlite3.connect('instance/app.db')
-cursor = conn.cursor()
+Each numbered step in MIGRATIONS runs once, in order, and is recorded in the
+``schema_version`` table when it completes. A database without any of
+the app's tables gets the current schema from ``db.create_all()`` and is
+marked as up to date instead.
 
+Steps may commit between batches. Adding an index to a large SQLite table
+rebuilds it online: a copy is filled in committed batches while triggers
+mirror concurrent writes, then swapped in with a short rename, so the app
+keeps writing throughout. ``rebuild_table()`` (limited to adding indexes)
+and ``create_indexes()`` copy the reference implementation in
+``tenant-management-modular/common/migrations.py``, which this app cannot
+import: fix both together.
 
-# Insert data
-#cursor.execute("ALTER TABLE tenant ADD COLUMN property_id INTEGER;")
+Usage:
+    uv run python db_update.py            # apply pending migrations
+    uv run python db_update.py status     # list applied and pending migrations
+"""
 
-# Commit the changes
-#conn.commit()
+import re
+import sys
+from datetime import datetime, timezone
 
-# Select and print data - test change
-cursor.execute("SELECT * FROM tenants")
-products = cursor.fetchall()
-print("Products in the database:")
-for product in products:
-    print(product)
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
 
-# Close the connection
-conn.close()
+from app import EXPECTED_LEDGER_SQL, app, db
+
+BATCH_SIZE = 5000
+# Below this many rows a plain CREATE INDEX is quicker than a table rebuild
+ONLINE_INDEX_MIN_ROWS = 200000
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+INDEX_HEAD = re.compile(r'^(CREATE (?:UNIQUE )?INDEX\s+)("[^"]+"|\w+)(\s+ON\s+)("[^"]+"|\w+)', re.I)
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def alternate_name(name):
+    """SQLite index names are schema-wide, so each rebuild flips between two names."""
+    return name[:-len('__rebuilt')] if name.endswith('__rebuilt') else name + '__rebuilt'
+
+def rebuild_table(conn, table, indexes):
+    """Rebuilds ``table`` with extra ``{name: columns}`` indexes without a long write lock."""
+    shadow = f'_rebuild_{table}'
+    triggers = [f'_rebuild_{table}_{event}' for event in ('insert', 'update', 'delete')]
+    for trigger in triggers:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {quote(trigger)}'))
+    conn.execute(text(f'DROP TABLE IF EXISTS {quote(shadow)}'))
+    conn.commit()
+
+    master = conn.execute(text(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = :table AND sql IS NOT NULL"
+    ), {'table': table}).fetchall()
+    table_sql = next(row.sql for row in master if row.type == 'table')
+    conn.exec_driver_sql(re.sub(r'^CREATE TABLE\s+("[^"]+"|\w+)', f'CREATE TABLE {quote(shadow)}', table_sql, count=1))
+    for row in master:
+        if row.type == 'index':
+            conn.exec_driver_sql(INDEX_HEAD.sub(
+                lambda m: f'{m[1]}{quote(alternate_name(row.name))}{m[3]}{quote(shadow)}', row.sql, count=1,
+            ))
+    for name, columns in indexes.items():
+        conn.execute(text(f'CREATE INDEX {quote(name)} ON {quote(shadow)} ({", ".join(map(quote, columns))})'))
+
+    # Every table here has an INTEGER PRIMARY KEY or gets its rowid copied explicitly
+    info = conn.execute(text(f'PRAGMA table_info({quote(table)})')).fetchall()
+    key = [column for column in info if column.pk]
+    columns = ([] if len(key) == 1 and key[0].type.upper() == 'INTEGER' else ['rowid']) + [quote(c.name) for c in info]
+    copy_rows = f'INTO {quote(shadow)} ({", ".join(columns)}) SELECT {", ".join(columns)} FROM {quote(table)}'
+    conn.execute(text(f'CREATE TRIGGER {quote(triggers[0])} AFTER INSERT ON {quote(table)} BEGIN '
+                      f'INSERT OR REPLACE {copy_rows} WHERE rowid = NEW.rowid; END'))
+    conn.execute(text(f'CREATE TRIGGER {quote(triggers[1])} AFTER UPDATE ON {quote(table)} BEGIN '
+                      f'DELETE FROM {quote(shadow)} WHERE rowid = OLD.rowid; '
+                      f'INSERT OR REPLACE {copy_rows} WHERE rowid = NEW.rowid; END'))
+    conn.execute(text(f'CREATE TRIGGER {quote(triggers[2])} AFTER DELETE ON {quote(table)} BEGIN '
+                      f'DELETE FROM {quote(shadow)} WHERE rowid = OLD.rowid; END'))
+    # Rows written from here on are mirrored by the triggers
+    last_rowid = conn.execute(text(f'SELECT MAX(rowid) FROM {quote(table)}')).scalar() or 0
+    conn.commit()
+
+    low = 0
+    while low < last_rowid:
+        high = conn.execute(text(
+            f'SELECT MAX(rowid) FROM (SELECT rowid FROM {quote(table)} WHERE rowid > :low ORDER BY rowid LIMIT :limit)'
+        ), {'low': low, 'limit': BATCH_SIZE}).scalar()
+        if high is None:
+            break
+        high = min(high, last_rowid)
+        # OR IGNORE: a row a trigger already mirrored is newer than this copy
+        conn.execute(text(f'INSERT OR IGNORE {copy_rows} WHERE rowid > :low AND rowid <= :high'),
+                     {'low': low, 'high': high})
+        conn.commit()
+        low = high
+
+    # Dropping the table drops its own triggers too, so they are recreated after the swap
+    other_triggers = [row.sql for row in master if row.type == 'trigger' and row.name not in triggers]
+    # pysqlite does not open a transaction for DDL on its own; the swap must be atomic
+    conn.exec_driver_sql('BEGIN IMMEDIATE')
+    for trigger in triggers:
+        conn.execute(text(f'DROP TRIGGER {quote(trigger)}'))
+    conn.execute(text(f'DROP TABLE {quote(table)}'))
+    # Legacy mode skips re-parsing the rest of the schema, which still names the dropped table
+    conn.execute(text('PRAGMA legacy_alter_table = ON'))
+    conn.execute(text(f'ALTER TABLE {quote(shadow)} RENAME TO {quote(table)}'))
+    conn.execute(text('PRAGMA legacy_alter_table = OFF'))
+    for sql in other_triggers:
+        conn.exec_driver_sql(sql)
+    conn.commit()
+
+def create_indexes(conn, table, indexes):
+    """Creates the missing ones of ``{name: columns}``, online for large SQLite tables."""
+    existing = {index['name'] for index in inspect(conn).get_indexes(table)}
+    missing = {name: columns for name, columns in indexes.items() if name not in existing}
+    if not missing:
+        return
+    rows = conn.execute(text(f'SELECT COUNT(*) FROM {quote(table)}')).scalar()
+    if conn.dialect.name == 'sqlite' and rows >= ONLINE_INDEX_MIN_ROWS:
+        rebuild_table(conn, table, missing)
+        return
+    for name, columns in missing.items():
+        conn.execute(text(f'CREATE INDEX {quote(name)} ON {quote(table)} ({", ".join(map(quote, columns))})'))
+
+# --- Migrations ---
+# Append new steps with the next number; never renumber or edit applied ones.
+
+def add_tenant_property_id(conn):
+    """Links tenants to properties on databases created before the column existed."""
+    if 'property_id' not in {column['name'] for column in inspect(conn).get_columns('tenant')}:
+        conn.execute(text('ALTER TABLE tenant ADD COLUMN property_id INTEGER'))
+
+def populate_ledger_balances(conn):
+    """Builds the materialized balances for databases that predate them."""
+    has_balances = conn.execute(text('SELECT 1 FROM ledger_balance LIMIT 1')).first()
+    if conn.execute(text('SELECT 1 FROM "transaction" LIMIT 1')).first() and not has_balances:
+        for entity in ('tenant', 'property'):
+            conn.execute(text(
+                'INSERT INTO ledger_balance (entity_type, entity_id, charges, payments, transaction_count) '
+                + EXPECTED_LEDGER_SQL.format(entity=entity)
+            ))
+
+def index_transaction_lookups(conn):
+    """Indexes the per-tenant and per-property transaction lookups."""
+    create_indexes(conn, 'transaction', {
+        'ix_transaction_tenant_id': ['tenant_id'],
+        'ix_transaction_property_id': ['property_id'],
+    })
+
+MIGRATIONS = [
+    (1, add_tenant_property_id),
+    (2, populate_ledger_balances),
+    (3, index_transaction_lookups),
+]
+
+def applied_versions(conn):
+    schema_version.create(conn, checkfirst=True)
+    return {row.version: row.applied_at for row in conn.execute(schema_version.select())}
+
+def record(conn, version, step):
+    conn.execute(schema_version.insert().values(
+        version=version, name=step.__name__, applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    ))
+
+def upgrade(engine):
+    """Creates missing tables, then applies pending migrations (or stamps a fresh database)."""
+    fresh = not set(inspect(engine).get_table_names()) & set(db.metadata.tables)
+    db.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+        for version, step in MIGRATIONS:
+            if version in done:
+                continue
+            try:
+                if not fresh:
+                    step(conn)
+                    print(f'  applied {version:4} {step.__name__}')
+                record(conn, version, step)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+def status(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    for version, step in MIGRATIONS:
+        state = f'applied {done[version]:%Y-%m-%d %H:%M}' if version in done else 'pending'
+        print(f'  {version:4} {step.__name__:32} {state}')
+    pending = sum(1 for version, _ in MIGRATIONS if version not in done)
+    print(f'{pending} pending migration(s).')
+    return 1 if pending else 0
+
+if __name__ == '__main__':
+    action = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+    with app.app_context():
+        if action == 'status':
+            sys.exit(status(db.engine))
+        elif action == 'upgrade':
+            upgrade(db.engine)
+            print('Database schema is up to date.')
+        else:
+            sys.exit(__doc__)
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import db_update
+
+# The transaction table as created before its lookup indexes existed
+LEGACY_TRANSACTION = """
+    CREATE TABLE "transaction" (
+        id INTEGER NOT NULL, property_id INTEGER NOT NULL, tenant_id INTEGER, type VARCHAR(50) NOT NULL,
+        for_month VARCHAR(20), amount FLOAT NOT NULL, created_date DATETIME, created_by VARCHAR(50),
+        last_updated DATETIME, last_updated_by VARCHAR(50), transaction_date DATE, comments TEXT,
+        PRIMARY KEY (id)
+    )
+"""
+LOOKUP_INDEXES = {'ix_transaction_tenant_id': ['tenant_id'], 'ix_transaction_property_id': ['property_id']}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_TRANSACTION)
+        conn.exec_driver_sql('CREATE INDEX ix_transaction_type ON "transaction" (type)')
+        conn.exec_driver_sql('CREATE TABLE audit (transaction_id INTEGER)')
+        conn.exec_driver_sql(
+            'CREATE TRIGGER transaction_audit AFTER INSERT ON "transaction" '
+            'BEGIN INSERT INTO audit VALUES (NEW.id); END'
+        )
+        conn.execute(
+            text('INSERT INTO "transaction" (id, property_id, tenant_id, type, amount) '
+                 'VALUES (:id, 1, :tenant_id, \'rent\', :amount)'),
+            [{'id': i, 'tenant_id': i % 3 or None, 'amount': i * 1.5} for i in range(1, 12)],
+        )
+    yield engine
+    engine.dispose()
+
+
+def _rows(conn):
+    return conn.execute(text('SELECT * FROM "transaction" ORDER BY id')).fetchall()
+
+
+def test_rebuild_table_keeps_rows_indexes_and_triggers(engine, monkeypatch):
+    monkeypatch.setattr(db_update, 'BATCH_SIZE', 4)
+    with engine.connect() as conn:
+        before = _rows(conn)
+        db_update.rebuild_table(conn, 'transaction', LOOKUP_INDEXES)
+
+        assert _rows(conn) == before
+        indexes = {index['name']: index['column_names'] for index in inspect(conn).get_indexes('transaction')}
+        assert indexes == {
+            'ix_transaction_type__rebuilt': ['type'],
+            'ix_transaction_tenant_id': ['tenant_id'],
+            'ix_transaction_property_id': ['property_id'],
+        }
+        triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars().all()
+        assert triggers == ['transaction_audit']
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE name LIKE '_rebuild_%'")).first() is None
+
+        conn.execute(text('INSERT INTO "transaction" (id, property_id, type, amount) VALUES (12, 1, \'rent\', 1.0)'))
+        conn.commit()
+        assert conn.execute(text('SELECT MAX(transaction_id) FROM audit')).scalar() == 12
+
+
+def test_rebuild_table_twice_flips_index_names_back(engine):
+    with engine.connect() as conn:
+        db_update.rebuild_table(conn, 'transaction', {})
+        db_update.rebuild_table(conn, 'transaction', {})
+        assert [index['name'] for index in inspect(conn).get_indexes('transaction')] == ['ix_transaction_type']
+        assert len(_rows(conn)) == 11
+
+
+def test_create_indexes_rebuilds_only_while_indexes_are_missing(engine, monkeypatch):
+    monkeypatch.setattr(db_update, 'ONLINE_INDEX_MIN_ROWS', 10)
+    with engine.connect() as conn:
+        db_update.create_indexes(conn, 'transaction', LOOKUP_INDEXES)
+        db_update.create_indexes(conn, 'transaction', LOOKUP_INDEXES)
+        names = {index['name'] for index in inspect(conn).get_indexes('transaction')}
+    # A second rebuild would have flipped the existing index back to its original name
+    assert names == set(LOOKUP_INDEXES) | {'ix_transaction_type__rebuilt'}
+
+
+def test_upgrade_applies_each_migration_once(engine, capsys):
+    db_update.upgrade(engine)
+    with engine.connect() as conn:
+        balances = conn.execute(text('SELECT * FROM ledger_balance ORDER BY entity_type, entity_id')).fetchall()
+    capsys.readouterr()
+
+    db_update.upgrade(engine)
+
+    assert capsys.readouterr().out == ''
+    with engine.connect() as conn:
+        assert set(db_update.applied_versions(conn)) == {version for version, _ in db_update.MIGRATIONS}
+        assert conn.execute(text('SELECT * FROM ledger_balance ORDER BY entity_type, entity_id')).fetchall() == balances
+        assert set(LOOKUP_INDEXES) <= {index['name'] for index in inspect(conn).get_indexes('transaction')}
+    assert len(balances) == 3
@@ -1,5 +1,8 @@
-from flask import Flask, send_from_directory
+import time
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
+from common import metrics, profiling, sharding, sqlstats
+from common.workers import dispose_after_fork
 from .config import Config
 from .models import db
 from .routes import api
@@ -23,14 +26,110 @@ def create_app(config_class=Config):
     app.register_blueprint(api)
     app.register_blueprint(swagger_bp)
 
+    # Count and time the SQL issued by each request and export it with the HTTP metrics
+    sqlstats.install()
+    sqlstats.slow_queries.configure(app.config['SLOW_QUERY_MS'], app.config['SLOW_QUERY_EXPLAIN'])
+
+    @app.before_request
+    def start_request_metrics():
+        metrics.http_in_flight.inc()
+        sqlstats.begin_request(app.config['SQL_REPEAT_THRESHOLD'], app.config['SQL_STRICT'])
+
+    @app.after_request
+    def finish_request_metrics(response):
+        stats = sqlstats.current()
+        if stats is not None:
+            response.headers['Server-Timing'] = stats.server_timing()
+            response.headers['X-Query-Count'] = str(stats.count)
+            sqlstats.end_request(stats, request.method, request.path, response.status_code)
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe_request(
+                request.method, route, response.status_code, time.perf_counter() - stats.started, stats
+            )
+        return response
+
+    @app.teardown_request
+    def end_in_flight(exc):
+        metrics.http_in_flight.dec()
+
+    # Route each request to its organization's database (header or /orgs/<org> prefix)
+    if app.config['ORG_DATABASE_URI']:
+        org_engines = sharding.EnginePool(
+            app.config['ORG_DATABASE_URI'], app.config['ORG_ENGINE_POOL_SIZE'], app.instance_path,
+            **Config.engine_options(app.config['ORG_DATABASE_URI'])
+        )
+        app.extensions['org_engines'] = org_engines
+        app.wsgi_app = sharding.PathPrefixMiddleware(app.wsgi_app)
+
+        @app.before_request
+        def route_organization():
+            org = request.headers.get(sharding.HEADER)
+            if not org:
+                return None
+            try:
+                engine = org_engines.get(sharding.validate(org))
+            except LookupError as e:
+                return jsonify({'error': str(e)}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            g.organization = sharding.activate(org, engine)
+
+        @app.teardown_request
+        def release_organization(exc):
+            token = g.pop('organization', None)
+            if token is not None:
+                sharding.deactivate(token)
+
+    # Admin-triggered and 1-in-N sampled profiling
+    profiler = profiling.RequestProfiler(
+        app.config['PROFILE_TOKEN'], app.config['PROFILE_SAMPLE_EVERY'], app.config['PROFILE_DIR']
+    )
+
+    @app.before_request
+    def start_profile():
+        if not profiler.enabled:
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        mode = profiler.mode(route, request.headers.get('X-Profile'), request.args.get('profile'))
+        if mode:
+            profiling.activate(profiler, mode).start()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = profiling.current()
+        if profile is None:
+            return response
+        profiling.deactivate()
+        sampler = profile.stop()
+        if profile.mode == 'admin':
+            profiled = Response(sampler.collapsed(), mimetype='text/plain')
+            profiled.headers['X-Profile'] = profiling.summary(sampler)
+            profiled.headers['X-Profiled-Status'] = str(response.status_code)
+            return profiled
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        app.logger.info('Saved request profile to %s', profiler.save(sampler, request.method, route))
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        profile = profiling.current()
+        if profile is not None:
+            profiling.deactivate()
+            profile.stop()
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
     # Serve the OpenAPI yaml at /openapi.yaml
     @app.route('/openapi.yaml')
     def openapi_spec():
         backend_dir = Path(__file__).resolve().parent
         return send_from_directory(backend_dir, 'openapi.yaml', mimetype='application/yaml')
     
-    # Create database tables
+    # Schema setup is done once per deploy by `manage.py db upgrade`, not per worker
     with app.app_context():
-        db.create_all()
+        metrics.watch_sqlite_engine(db.engine)
+        dispose_after_fork(db.engine)
     
     return app
@@ -1,6 +1,9 @@
 import os
 from dotenv import load_dotenv
 
+from common import engines
+from common.workers import default_workers
+
 # Load environment variables
 load_dotenv()
 
@@ -11,18 +14,86 @@ class Config:
     DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool per worker for PostgreSQL (see common.engines): persistent connections,
+    # extra ones allowed under load, seconds to wait for one and to keep one open
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    
+    # One database per organization, e.g. sqlite:///orgs/{org}.db (empty: DATABASE_URI only),
+    # and how many organization engines each worker keeps open
+    ORG_DATABASE_URI = os.getenv('ORG_DATABASE_URI', '')
+    ORG_ENGINE_POOL_SIZE = int(os.getenv('ORG_ENGINE_POOL_SIZE', '16'))
+    
     # Backup configuration
     BACKUP_STORAGE_PATH = os.getenv('BACKUP_STORAGE_PATH', '.')
     
+    # Seconds a worker may serve cached properties before reloading them
+    PROPERTY_CACHE_TTL = float(os.getenv('PROPERTY_CACHE_TTL', '60'))
+    
+    # Seconds between reads of the data_version table (0 checks on every cache lookup)
+    DATA_VERSION_POLL_INTERVAL = float(os.getenv('DATA_VERSION_POLL_INTERVAL', '1'))
+    
+    # A statement shape repeated more than this many times in one request is logged as N+1;
+    # with SQL_STRICT enabled (tests, development) it raises instead
+    SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', '10'))
+    SQL_STRICT = os.getenv('SQL_STRICT', 'false').lower() == 'true'
+    
+    # Request profiling: admins send X-Profile (or ?profile=) with this token to get
+    # collapsed stacks back; every Nth request per route is also profiled into PROFILE_DIR
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    
+    # Statements slower than this (milliseconds, negative disables) go to the slow-query log
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    
+    # Token expected in the X-Admin-Token header by /api/admin endpoints (empty disables them)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
+    # Production server (serve.py): gunicorn workers, threads per worker, keep-alive and
+    # graceful shutdown seconds, preloading the app in the master, and recycling a worker
+    # after this many requests (0 never recycles)
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '5000'))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0')) or default_workers()
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))
+    SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '5'))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '120'))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+    SERVER_PRELOAD = os.getenv('SERVER_PRELOAD', 'false').lower() == 'true'
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '0'))
+    
     # Flask configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
     # CORS configuration for frontend
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
+    @staticmethod
+    def engine_options(url):
+        """``create_engine()`` options for ``url`` with the configured pool."""
+        return engines.engine_options(
+            url, Config.DB_POOL_SIZE, Config.DB_MAX_OVERFLOW, Config.DB_POOL_TIMEOUT, Config.DB_POOL_RECYCLE
+        )
+    
     @staticmethod
     def init_app(app):
         """Initialize Flask app with configuration."""
         app.config['SQLALCHEMY_DATABASE_URI'] = Config.DATABASE_URI
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = Config.engine_options(Config.DATABASE_URI)
+        app.config['ORG_DATABASE_URI'] = Config.ORG_DATABASE_URI
+        app.config['ORG_ENGINE_POOL_SIZE'] = Config.ORG_ENGINE_POOL_SIZE
         app.config['SECRET_KEY'] = Config.SECRET_KEY
+        app.config['BACKUP_STORAGE_PATH'] = Config.BACKUP_STORAGE_PATH
+        app.config['SQL_REPEAT_THRESHOLD'] = Config.SQL_REPEAT_THRESHOLD
+        app.config['SQL_STRICT'] = Config.SQL_STRICT
+        app.config['PROFILE_TOKEN'] = Config.PROFILE_TOKEN
+        app.config['PROFILE_SAMPLE_EVERY'] = Config.PROFILE_SAMPLE_EVERY
+        app.config['PROFILE_DIR'] = Config.PROFILE_DIR
+        app.config['SLOW_QUERY_MS'] = Config.SLOW_QUERY_MS
+        app.config['SLOW_QUERY_EXPLAIN'] = Config.SLOW_QUERY_EXPLAIN
+        app.config['ADMIN_TOKEN'] = Config.ADMIN_TOKEN
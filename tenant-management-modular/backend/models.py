@@ -1,7 +1,22 @@
 from datetime import datetime, date
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from common import ledger, sharding
+from common.cache import track_data_versions
+from common.money import Money
+from common.periods import period_month
 
-db = SQLAlchemy()
+class OrganizationSession(Session):
+    """Session bound to the current request's organization database, if any."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = sharding.current_engine()
+        if bind is None and engine is not None:
+            return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': OrganizationSession})
 
 class Base(db.Model):
     """Base model with common fields."""
@@ -17,28 +32,34 @@ class Tenant(Base):
     name = db.Column(db.String(100), nullable=False)
     property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=True)
     passport = db.Column(db.String(100))
-    passport_validity = db.Column(db.Date)
+    passport_validity = db.Column(db.Date, index=True)
     aadhar_no = db.Column(db.String(100))
     employment_details = db.Column(db.String(255))
     permanent_address = db.Column(db.String(255))
     contact_no = db.Column(db.String(20))
     emergency_contact_no = db.Column(db.String(20))
-    rent = db.Column(db.Float, default=0.0)
-    security = db.Column(db.Float, default=0.0)
+    rent = db.Column(Money, default=0.0)
+    security = db.Column(Money, default=0.0)
     move_in_date = db.Column(db.Date)
     contract_start_date = db.Column(db.Date)
-    contract_expiry_date = db.Column(db.Date)
+    contract_expiry_date = db.Column(db.Date, index=True)
 
     # Relationship to Property model
     property = db.relationship('Property', backref='tenants')
 
-    def to_dict(self):
+    def property_address(self, addresses=None):
+        """Resolve the property address, from a cached id->address map when given."""
+        if addresses is not None:
+            return addresses.get(self.property_id, 'N/A')
+        return self.property.address if self.property else 'N/A'
+
+    def to_dict(self, addresses=None):
         """Convert model instance to dictionary for JSON serialization."""
         return {
             'id': self.id,
             'name': self.name,
             'property_id': self.property_id,
-            'property_address': self.property.address if self.property else 'N/A',
+            'property_address': self.property_address(addresses),
             'passport': self.passport,
             'passport_validity': self.passport_validity.isoformat() if self.passport_validity else None,
             'aadhar_no': self.aadhar_no,
@@ -61,8 +82,8 @@ class Property(Base):
     """Property model for property management."""
     id = db.Column(db.Integer, primary_key=True)
     address = db.Column(db.String(255), nullable=False)
-    rent = db.Column(db.Float, default=0.0)
-    maintenance = db.Column(db.Float, default=0.0)
+    rent = db.Column(Money, default=0.0)
+    maintenance = db.Column(Money, default=0.0)
 
     def to_dict(self):
         """Convert model instance to dictionary for JSON serialization."""
@@ -84,29 +105,89 @@ class Transaction(Base):
     tenant_id = db.Column(db.Integer, db.ForeignKey('tenant.id'))
     type = db.Column(db.String(50), nullable=False)
     for_month = db.Column(db.String(20))
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     transaction_date = db.Column(db.Date, default=date.today, nullable=False)
     comments = db.Column(db.String(255))
+    # First day of the month this transaction applies to, derived from for_month
+    period_month = db.Column(db.Date)
+
+    __table_args__ = (
+        db.Index('ix_transaction_property_period', 'property_id', 'period_month'),
+        db.Index('ix_transaction_tenant_period', 'tenant_id', 'period_month'),
+    )
 
     # Relationships to Property and Tenant models
     property = db.relationship('Property', backref='transactions')
     tenant = db.relationship('Tenant', backref='transactions')
 
-    def to_dict(self):
+    def property_address(self, addresses=None):
+        """Resolve the property address, from a cached id->address map when given."""
+        if addresses is not None:
+            return addresses.get(self.property_id, 'N/A')
+        return self.property.address if self.property else 'N/A'
+
+    def to_dict(self, addresses=None):
         """Convert model instance to dictionary for JSON serialization."""
         return {
             'id': self.id,
             'property_id': self.property_id,
-            'property_address': self.property.address if self.property else 'N/A',
+            'property_address': self.property_address(addresses),
             'tenant_id': self.tenant_id,
             'tenant_name': self.tenant.name if self.tenant else 'N/A',
             'type': self.type,
             'for_month': self.for_month,
+            'period_month': self.period_month.isoformat() if self.period_month else None,
             'amount': self.amount,
-            'transaction_date': self.transaction_date.isoformat(),
+            'transaction_date': self.transaction_date.isoformat() if self.transaction_date else None,
             'comments': self.comments,
-            'created_date': self.created_date.isoformat(),
+            'created_date': self.created_date.isoformat() if self.created_date else None,
             'created_by': self.created_by,
-            'last_updated': self.last_updated.isoformat(),
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
             'last_updated_by': self.last_updated_by
         }
+
+@event.listens_for(Transaction, 'before_insert')
+@event.listens_for(Transaction, 'before_update')
+def set_period_month(mapper, connection, target):
+    """Keep period_month in sync with for_month and transaction_date on every write."""
+    target.period_month = period_month(target.for_month, target.transaction_date)
+
+ledger.track(Transaction)
+
+class LedgerBalance(db.Model):
+    """Running totals per tenant or property, maintained on every transaction write."""
+    entity_type = db.Column(db.String(10), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    charges = db.Column(Money, nullable=False, default=0.0)
+    payments = db.Column(Money, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+class LedgerMonthBalance(db.Model):
+    """Per-month totals per tenant or property, keyed by period_month."""
+    entity_type = db.Column(db.String(10), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    period_month = db.Column(db.Date, primary_key=True)
+    charges = db.Column(Money, nullable=False, default=0.0)
+    payments = db.Column(Money, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ExpiryAlert(db.Model):
+    """Alert recorded when a tenant's contract or passport crosses an expiry threshold."""
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenant.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False)
+    threshold_days = db.Column(db.Integer, nullable=False)
+    created_date = db.Column(db.DateTime, server_default=db.func.now())
+    acknowledged = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'kind', 'expiry_date', 'threshold_days'),
+    )
+
+class DataVersion(db.Model):
+    """Write counter per entity type, bumped in the same transaction as each write."""
+    entity = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+track_data_versions({'property': Property, 'tenant': Tenant, 'transaction': Transaction})
@@ -1,33 +1,51 @@
-from flask import Blueprint, request, jsonify, send_file
+import hmac
+from flask import Blueprint, current_app, request, jsonify, send_file
 from datetime import datetime, date
+from io import BytesIO
 from .models import db, Tenant, Property, Transaction
+from common import metrics, pgcopy, sqlstats
+from common.reports import ARREARS_HEADERS, arrears_table
 from .services import (
     DatabaseService, ReportService, 
-    TenantService, PropertyService, TransactionService
+    TenantService, PropertyService, TransactionService, LedgerService,
+    AnalyticsService, AlertService, request_flights
 )
 
 # Create API blueprint
 api = Blueprint('api', __name__, url_prefix='/api')
 
+def _tenant_ledger(tenant_id):
+    TenantService.get_tenant_by_id(tenant_id)
+    transactions = TransactionService.get_transactions('transaction_date DESC', tenant_id=tenant_id)
+    addresses = PropertyService.get_address_map()
+    # The running balance is maintained on every write, so this is a key lookup
+    balance = LedgerService.get_balance('tenant', tenant_id)
+    return {
+        'transactions': [tx.to_dict(addresses) for tx in transactions],
+        'total': balance['balance']
+    }
+
+def _balance(entity_type, entity_id):
+    if entity_type == 'tenant':
+        TenantService.get_tenant_by_id(entity_id)
+    else:
+        PropertyService.get_property_by_id(entity_id)
+    return LedgerService.get_balance(entity_type, entity_id)
+
 # Tenant Transactions Summary Endpoint
 @api.route('/tenants/<int:tenant_id>/transactions', methods=['GET'])
 def get_tenant_transactions(tenant_id):
     """Fetch all transactions for a specific tenant and calculate the total balance."""
     try:
-        tenant_obj = TenantService.get_tenant_by_id(tenant_id)
-        transactions = Transaction.query.filter_by(tenant_id=tenant_id).order_by(Transaction.transaction_date.desc()).all()
-        transactions_list = [tx.to_dict() for tx in transactions]
-        # Calculate the total balance for the tenant
-        total_balance = 0.0
-        for tx in transactions:
-            if tx.type == 'payment_received':
-                total_balance += tx.amount
-            else:
-                total_balance -= tx.amount
-        return jsonify({
-            'transactions': transactions_list,
-            'total': total_balance
-        })
+        return jsonify(request_flights.do(('tenant_transactions', tenant_id), _tenant_ledger, tenant_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+@api.route('/tenants/<int:tenant_id>/balance', methods=['GET'])
+def get_tenant_balance(tenant_id):
+    """Get the current running balance for a tenant."""
+    try:
+        return jsonify(request_flights.do(('tenant_balance', tenant_id), _balance, 'tenant', tenant_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -42,9 +60,10 @@ def get_tenants():
         tenants = Tenant.query.paginate(
             page=page, per_page=per_page, error_out=False
         )
+        addresses = PropertyService.get_address_map()
         
         return jsonify({
-            'tenants': [tenant.to_dict() for tenant in tenants.items],
+            'tenants': [tenant.to_dict(addresses) for tenant in tenants.items],
             'total': tenants.total,
             'pages': tenants.pages,
             'current_page': tenants.page,
@@ -59,7 +78,7 @@ def get_tenant(tenant_id):
     """Get a specific tenant by ID."""
     try:
         tenant = TenantService.get_tenant_by_id(tenant_id)
-        return jsonify(tenant.to_dict())
+        return jsonify(tenant.to_dict(PropertyService.get_address_map()))
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -111,8 +130,7 @@ def delete_tenant(tenant_id):
 def get_properties():
     """Get all properties."""
     try:
-        properties = PropertyService.get_all_properties()
-        return jsonify([property.to_dict() for property in properties])
+        return jsonify(PropertyService.get_cached_properties())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -154,24 +172,28 @@ def delete_property(property_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def _property_ledger(property_id):
+    property_obj = PropertyService.get_property_by_id(property_id)
+    transactions = TransactionService.get_transactions('transaction_date DESC', property_id=property_id)
+    balance = LedgerService.get_balance('property', property_id)
+    return {
+        'transactions': [tx.to_dict({property_id: property_obj.address}) for tx in transactions],
+        'total': balance['balance']
+    }
+
 @api.route('/properties/<int:property_id>/transactions', methods=['GET'])
 def get_property_transactions(property_id):
     """Fetch all transactions for a specific property and calculate the total balance."""
     try:
-        property_obj = PropertyService.get_property_by_id(property_id)
-        transactions = Transaction.query.filter_by(property_id=property_id).order_by(Transaction.transaction_date.desc()).all()
-        transactions_list = [tx.to_dict() for tx in transactions]
-        # Calculate the total balance for the property
-        total_balance = 0.0
-        for tx in transactions:
-            if tx.type == 'payment_received':
-                total_balance += tx.amount
-            else:
-                total_balance -= tx.amount
-        return jsonify({
-            'transactions': transactions_list,
-            'total': total_balance
-        })
+        return jsonify(request_flights.do(('property_transactions', property_id), _property_ledger, property_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+@api.route('/properties/<int:property_id>/balance', methods=['GET'])
+def get_property_balance(property_id):
+    """Get the current running balance for a property."""
+    try:
+        return jsonify(request_flights.do(('property_balance', property_id), _balance, 'property', property_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -181,7 +203,8 @@ def get_transactions():
     """Get all transactions."""
     try:
         transactions = TransactionService.get_all_transactions()
-        return jsonify([transaction.to_dict() for transaction in transactions])
+        addresses = PropertyService.get_address_map()
+        return jsonify([transaction.to_dict(addresses) for transaction in transactions])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -190,7 +213,7 @@ def get_transaction(transaction_id):
     """Get a specific transaction by ID."""
     try:
         transaction = TransactionService.get_transaction_by_id(transaction_id)
-        return jsonify(transaction.to_dict())
+        return jsonify(transaction.to_dict(PropertyService.get_address_map()))
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -234,24 +257,62 @@ def delete_transaction(transaction_id):
         return jsonify({'error': str(e)}), 400
 
 # Report routes
+# Report bodies are built as bytes so coalesced requests each get their own file object;
+# on PostgreSQL the server writes the CSV with COPY
+@metrics.timed_report('tenants_csv')
+def _tenants_csv():
+    if pgcopy.is_postgresql(db.session):
+        return pgcopy.export_csv(db.session, 'tenants')
+    tenants = TenantService.get_all_tenants()
+    addresses = PropertyService.get_address_map()
+    headers = [
+        'ID', 'Name', 'Property Address', 'Passport', 'Passport Validity', 'Aadhar No',
+        'Employment Details', 'Permanent Address', 'Contact No', 'Emergency Contact No',
+        'Rent', 'Security', 'Move In Date', 'Contract Start Date', 'Contract Expiry Date', 'Created Date'
+    ]
+    data = [
+        [
+            t.id, t.name, t.property_address(addresses), t.passport, t.passport_validity,
+            t.aadhar_no, t.employment_details, t.permanent_address, t.contact_no, t.emergency_contact_no,
+            t.rent, t.security, t.move_in_date, t.contract_start_date, t.contract_expiry_date, t.created_date
+        ] for t in tenants
+    ]
+    return ReportService.generate_csv_report(data, headers).getvalue()
+
+@metrics.timed_report('properties_csv')
+def _properties_csv():
+    if pgcopy.is_postgresql(db.session):
+        return pgcopy.export_csv(db.session, 'properties')
+    properties = PropertyService.get_all_properties()
+    headers = ['ID', 'Address', 'Rent', 'Maintenance', 'Created Date']
+    data = [
+        [p.id, p.address, p.rent, p.maintenance, p.created_date] for p in properties
+    ]
+    return ReportService.generate_csv_report(data, headers).getvalue()
+
+@metrics.timed_report('transactions_csv')
+def _transactions_csv():
+    if pgcopy.is_postgresql(db.session):
+        return pgcopy.export_csv(db.session, 'transactions')
+    transactions = TransactionService.get_all_transactions()
+    addresses = PropertyService.get_address_map()
+    headers = [
+        'ID', 'Property Address', 'Tenant Name', 'Type', 'For Month', 'Amount', 'Transaction Date', 'Comments'
+    ]
+    data = [
+        [
+            t.id, t.property_address(addresses),
+            t.tenant.name if t.tenant else 'N/A',
+            t.type, t.for_month, t.amount, t.transaction_date, t.comments
+        ] for t in transactions
+    ]
+    return ReportService.generate_csv_report(data, headers).getvalue()
+
 @api.route('/reports/tenants_csv')
 def report_tenants_csv():
     """Generate and download a CSV report of all tenants."""
     try:
-        tenants = TenantService.get_all_tenants()
-        headers = [
-            'ID', 'Name', 'Property Address', 'Passport', 'Passport Validity', 'Aadhar No',
-            'Employment Details', 'Permanent Address', 'Contact No', 'Emergency Contact No',
-            'Rent', 'Security', 'Move In Date', 'Contract Start Date', 'Contract Expiry Date', 'Created Date'
-        ]
-        data = [
-            [
-                t.id, t.name, t.property.address if t.property else 'N/A', t.passport, t.passport_validity,
-                t.aadhar_no, t.employment_details, t.permanent_address, t.contact_no, t.emergency_contact_no,
-                t.rent, t.security, t.move_in_date, t.contract_start_date, t.contract_expiry_date, t.created_date
-            ] for t in tenants
-        ]
-        report_file = ReportService.generate_csv_report(data, headers)
+        report_file = BytesIO(request_flights.do(('tenants_csv',), _tenants_csv))
         return send_file(
             report_file,
             mimetype='text/csv',
@@ -265,12 +326,7 @@ def report_tenants_csv():
 def report_properties_csv():
     """Generate and download a CSV report of all properties."""
     try:
-        properties = PropertyService.get_all_properties()
-        headers = ['ID', 'Address', 'Rent', 'Maintenance', 'Created Date']
-        data = [
-            [p.id, p.address, p.rent, p.maintenance, p.created_date] for p in properties
-        ]
-        report_file = ReportService.generate_csv_report(data, headers)
+        report_file = BytesIO(request_flights.do(('properties_csv',), _properties_csv))
         return send_file(
             report_file,
             mimetype='text/csv',
@@ -284,18 +340,7 @@ def report_properties_csv():
 def report_transactions_csv():
     """Generate and download a CSV report of all transactions."""
     try:
-        transactions = TransactionService.get_all_transactions()
-        headers = [
-            'ID', 'Property Address', 'Tenant Name', 'Type', 'For Month', 'Amount', 'Transaction Date', 'Comments'
-        ]
-        data = [
-            [
-                t.id, t.property.address if t.property else 'N/A',
-                t.tenant.name if t.tenant else 'N/A',
-                t.type, t.for_month, t.amount, t.transaction_date, t.comments
-            ] for t in transactions
-        ]
-        report_file = ReportService.generate_csv_report(data, headers)
+        report_file = BytesIO(request_flights.do(('transactions_csv',), _transactions_csv))
         return send_file(
             report_file,
             mimetype='text/csv',
@@ -305,6 +350,149 @@ def report_transactions_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@metrics.timed_report('arrears')
+def _arrears(as_of, group_by, include_settled, report_format):
+    report = ReportService.generate_arrears_report(as_of, group_by, include_settled)
+    if report_format == 'csv':
+        return report, ReportService.generate_csv_report(arrears_table(report), ARREARS_HEADERS).getvalue()
+    if report_format == 'xlsx':
+        return report, ReportService.generate_excel_report(arrears_table(report), ARREARS_HEADERS, 'Arrears').getvalue()
+    return report, None
+
+@api.route('/reports/arrears')
+def report_arrears():
+    """Outstanding balances per tenant or property with aging buckets.
+
+    Query parameters: ``as_of`` (YYYY-MM-DD, default today), ``group_by``
+    (tenant|property), ``include_settled`` (true|false) and ``format``
+    (json|csv|xlsx).
+    """
+    try:
+        as_of = request.args.get('as_of')
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else date.today()
+        group_by = request.args.get('group_by', 'tenant')
+        include_settled = request.args.get('include_settled', 'false').lower() == 'true'
+        report_format = request.args.get('format', 'json').lower()
+        report, body = request_flights.do(
+            ('arrears', as_of, group_by, include_settled, report_format),
+            _arrears, as_of, group_by, include_settled, report_format
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    filename = f"arrears_{group_by}_{report['as_of']}"
+    if report_format == 'csv':
+        return send_file(
+            BytesIO(body),
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f'{filename}.csv'
+        )
+    if report_format == 'xlsx':
+        return send_file(
+            BytesIO(body),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f'{filename}.xlsx'
+        )
+    return jsonify(report)
+
+# Analytics routes
+ANALYTICS_REPORTS = {
+    'collections': AnalyticsService.monthly_collections,
+    'rent_roll': AnalyticsService.rent_roll,
+    'occupancy': AnalyticsService.occupancy,
+}
+
+@api.route('/analytics/<string:report>')
+def get_analytics(report):
+    """Monthly portfolio series; optional ``start`` and ``end`` as YYYY-MM."""
+    if report not in ANALYTICS_REPORTS:
+        return jsonify({'error': 'Invalid analytics report'}), 404
+    try:
+        start, end = request.args.get('start'), request.args.get('end')
+        return jsonify(request_flights.do(('analytics', report, start, end), ANALYTICS_REPORTS[report], start, end))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Alert routes
+@api.route('/alerts/expiring', methods=['GET'])
+def get_expiring():
+    """List contracts and passports expiring within ``within_days`` (default 30)."""
+    try:
+        within_days = request.args.get('within_days', 30, type=int)
+        return jsonify(AlertService.get_expiring(within_days))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/alerts', methods=['GET'])
+def get_alerts():
+    """List recorded expiry alerts."""
+    try:
+        include_acknowledged = request.args.get('include_acknowledged', 'false').lower() == 'true'
+        return jsonify(AlertService.get_alerts(include_acknowledged))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/alerts/scan', methods=['POST'])
+def scan_alerts():
+    """Record alerts for thresholds crossed since the last scan."""
+    try:
+        return jsonify(AlertService.scan())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/alerts/<int:alert_id>/acknowledge', methods=['POST'])
+def acknowledge_alert(alert_id):
+    """Acknowledge a recorded alert."""
+    try:
+        if not AlertService.acknowledge(alert_id):
+            return jsonify({'error': 'Alert not found'}), 404
+        return jsonify({'message': 'Alert acknowledged'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+# Cache monitoring
+@api.route('/cache/stats')
+def get_cache_stats():
+    """Hit/miss counters for this worker's in-process caches, coalesced requests and org engines."""
+    stats = [PropertyService.get_cache_stats(), request_flights.stats()]
+    if 'org_engines' in current_app.extensions:
+        stats.append(current_app.extensions['org_engines'].stats())
+    return jsonify(stats)
+
+# Admin routes
+def is_admin():
+    token = current_app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+@api.route('/admin/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Slowest statement shapes seen by this worker; ``order_by`` total_ms|max_ms|count."""
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    order_by = request.args.get('order_by', 'total_ms')
+    if order_by not in ('total_ms', 'max_ms', 'count'):
+        return jsonify({'error': 'order_by must be total_ms, max_ms or count'}), 400
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'threshold_ms': sqlstats.slow_queries.threshold_ms,
+        'queries': sqlstats.slow_queries.top(limit, order_by),
+    })
+
+@api.route('/admin/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    """Clear this worker's slow-query log."""
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    sqlstats.slow_queries.reset()
+    return jsonify({'message': 'Slow-query log cleared'})
+
 # Backup route
 @api.route('/backup')
 def backup_database():
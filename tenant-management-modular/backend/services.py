@@ -1,55 +1,50 @@
-import os
-import shutil
-from datetime import datetime
+import time
 from io import BytesIO, StringIO
 import csv
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from flask import current_app
+from flask import abort, current_app
+from sqlalchemy.orm import selectinload
+from common import alerts, backups, ledger, metrics, partitions, sharding
+from common.cache import DataVersionPoller, ReadThroughCache, invalidate_on_commit
+from common.coalesce import SingleFlight
+from common.reports import arrears_report
+from .config import Config
 from .models import db, Tenant, Property, Transaction
 
+# Properties change rarely, so each worker keeps a copy that is dropped on commit
+property_cache = ReadThroughCache('properties', ttl=Config.PROPERTY_CACHE_TTL)
+invalidate_on_commit(Property, property_cache)
+
+# Writes made by other workers show up as a bumped property version
+data_versions = DataVersionPoller(interval=Config.DATA_VERSION_POLL_INTERVAL)
+data_versions.watch('property', property_cache)
+
+# Identical report, ledger and analytics requests running at once share one computation;
+# any committed write starts a new generation so later requests see it
+request_flights = SingleFlight('requests')
+for _model in (Tenant, Property, Transaction):
+    invalidate_on_commit(_model, request_flights)
+
 class DatabaseService:
     """Service class for database operations."""
     
     @staticmethod
     def backup_database():
-        """Create a backup of the database file."""
+        """Back up the request's database: a file copy for SQLite, pg_dump for PostgreSQL."""
         try:
-            # Get the database path from the configured DATABASE_URI
-            database_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
-            
-            # Handle SQLite database paths
-            if database_uri.startswith('sqlite:///'):
-                # Remove 'sqlite:///' prefix
-                db_filename = database_uri.replace('sqlite:///', '')
-                
-                # Flask creates an 'instance' directory for the database
-                # Construct the full path: app_root/instance/db_filename
-                db_path = os.path.join(current_app.root_path, 'instance', db_filename)
-            else:
-                raise ValueError('Backup is only supported for SQLite databases')
-            
-            # Check if the database file exists
-            if not os.path.exists(db_path):
-                raise FileNotFoundError(f'Database file not found at: {db_path}')
+            # The engine of the request's organization, or of DATABASE_URI; Flask-SQLAlchemy
+            # has already resolved a relative SQLite path against the instance directory
+            url = db.session.get_bind().url
             
             # Get backup storage path from environment variable
             backup_storage_path = current_app.config.get('BACKUP_STORAGE_PATH', '.')
             
-            # Ensure the backup directory exists
-            os.makedirs(backup_storage_path, exist_ok=True)
-            
-            # Create a dynamic filename for the backup
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"app_backup_{timestamp}.db"
+            # Save a copy on the server's file system (send_file resolves relative paths
+            # against the app root, so the returned path is absolute)
+            started = time.perf_counter()
+            backup = backups.backup_database(url, backup_storage_path, sharding.current_org() or 'app')
+            metrics.backup_duration.observe(time.perf_counter() - started)
             
-            # Create the full backup file path
-            backup_file_path = os.path.join(backup_storage_path, backup_filename)
-            
-            # Save a copy on the server's file system
-            shutil.copy2(db_path, backup_file_path)
-            
-            return backup_file_path, backup_filename
+            return backup
             
         except Exception as e:
             raise Exception(f"Backup failed: {str(e)}")
@@ -70,6 +65,10 @@ class ReportService:
     @staticmethod
     def generate_excel_report(data, headers, sheet_name="Report"):
         """Generate an Excel report from data and headers."""
+        # openpyxl takes ~200 ms to import; only XLSX downloads pay for it
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, Alignment
+        
         wb = Workbook()
         ws = wb.active
         ws.title = sheet_name
@@ -103,6 +102,11 @@ class ReportService:
         wb.save(output)
         output.seek(0)
         return output
+    
+    @staticmethod
+    def generate_arrears_report(as_of=None, group_by='tenant', include_settled=False):
+        """Compute outstanding balances with aging buckets in one grouped query."""
+        return arrears_report(db.session, as_of, group_by, include_settled)
 
 class TenantService:
     """Service class for tenant operations."""
@@ -151,6 +155,31 @@ class PropertyService:
         """Get all properties."""
         return Property.query.all()
     
+    @staticmethod
+    def _load_property_snapshot():
+        properties = Property.query.order_by(Property.id).all()
+        return {
+            'properties': [p.to_dict() for p in properties],
+            'addresses': {p.id: p.address for p in properties},
+        }
+    
+    @staticmethod
+    def get_cached_properties():
+        """Get all properties as dictionaries from the per-process cache."""
+        data_versions.poll(db.session.get_bind())
+        return property_cache.get(PropertyService._load_property_snapshot)['properties']
+    
+    @staticmethod
+    def get_address_map():
+        """Get a property id to address map from the per-process cache."""
+        data_versions.poll(db.session.get_bind())
+        return property_cache.get(PropertyService._load_property_snapshot)['addresses']
+    
+    @staticmethod
+    def get_cache_stats():
+        """Get hit/miss counters for the property cache."""
+        return dict(property_cache.stats(), data_version=data_versions.stats())
+    
     @staticmethod
     def get_property_by_id(property_id):
         """Get a property by ID."""
@@ -187,13 +216,18 @@ class TransactionService:
     
     @staticmethod
     def get_all_transactions():
-        """Get all transactions."""
-        return Transaction.query.all()
+        """Get all transactions, including year partitions, with their tenants preloaded."""
+        return TransactionService.get_transactions()
+    
+    @staticmethod
+    def get_transactions(order_by=None, **filters):
+        """Get the transactions matching column filters from the live table, year partitions and archive."""
+        return partitions.load(db.session, Transaction, filters, order_by, options=[selectinload(Transaction.tenant)])
     
     @staticmethod
     def get_transaction_by_id(transaction_id):
         """Get a transaction by ID."""
-        return Transaction.query.get_or_404(transaction_id)
+        return partitions.get(db.session, Transaction, transaction_id) or abort(404)
     
     @staticmethod
     def create_transaction(data):
@@ -206,7 +240,9 @@ class TransactionService:
     @staticmethod
     def update_transaction(transaction_id, data):
         """Update an existing transaction."""
-        transaction = TransactionService.get_transaction_by_id(transaction_id)
+        partitions.promote(db.session, transaction_id)
+        # Archived transactions are read-only
+        transaction = db.session.get(Transaction, transaction_id) or abort(404)
         for key, value in data.items():
             if hasattr(transaction, key):
                 setattr(transaction, key, value)
@@ -216,7 +252,81 @@ class TransactionService:
     @staticmethod
     def delete_transaction(transaction_id):
         """Delete a transaction."""
-        transaction = TransactionService.get_transaction_by_id(transaction_id)
+        partitions.promote(db.session, transaction_id)
+        # Archived transactions are read-only
+        transaction = db.session.get(Transaction, transaction_id) or abort(404)
         db.session.delete(transaction)
         db.session.commit()
         return transaction
+
+class LedgerService:
+    """Service class for materialized ledger balances."""
+    
+    @staticmethod
+    def get_balance(entity_type, entity_id):
+        """Get the stored running balance for a tenant or property."""
+        return ledger.get_balance(db.session, entity_type, entity_id)
+    
+    @staticmethod
+    def verify():
+        """Recompute balances from the transaction table and return any drift."""
+        return ledger.verify(db.session)
+    
+    @staticmethod
+    def rebuild():
+        """Recompute and replace all stored balances, returning the drift found."""
+        drift = ledger.rebuild(db.session)
+        db.session.commit()
+        return drift
+
+class AnalyticsService:
+    """Service class for vectorized portfolio analytics.
+
+    ``common.analytics`` pulls in NumPy, so it is imported on first use
+    rather than when a worker boots.
+    """
+    
+    @staticmethod
+    def monthly_collections(start=None, end=None):
+        """Payments received per property per month."""
+        from common import analytics
+        return analytics.monthly_collections(db.session, start, end)
+    
+    @staticmethod
+    def rent_roll(start=None, end=None):
+        """Billed rent and collections per property against the listed rent."""
+        from common import analytics
+        return analytics.rent_roll(db.session, start, end)
+    
+    @staticmethod
+    def occupancy(start=None, end=None):
+        """Occupied properties per month."""
+        from common import analytics
+        return analytics.occupancy(db.session, start, end)
+
+class AlertService:
+    """Service class for contract and passport expiry alerts."""
+    
+    @staticmethod
+    def get_expiring(within_days=30):
+        """Get contracts and passports expiring within the given number of days."""
+        return alerts.expiring(db.session, within_days)
+    
+    @staticmethod
+    def scan():
+        """Record alerts for newly crossed expiry thresholds."""
+        inserted = alerts.scan(db.session)
+        db.session.commit()
+        return inserted
+    
+    @staticmethod
+    def get_alerts(include_acknowledged=False):
+        """Get stored alerts."""
+        return alerts.list_alerts(db.session, include_acknowledged)
+    
+    @staticmethod
+    def acknowledge(alert_id):
+        """Acknowledge a stored alert."""
+        found = alerts.acknowledge(db.session, alert_id)
+        db.session.commit()
+        return found
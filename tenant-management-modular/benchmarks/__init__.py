@@ -0,0 +1 @@
+# Benchmarks for the Tenant Management System (Modular Version)
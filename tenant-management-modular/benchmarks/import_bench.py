@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measure module import cost of the apps and CLI tools with ``python -X importtime``.
+
+Each target is imported in a fresh interpreter several times; the report
+shows the median total import time and the packages that contribute most
+(cumulative time of each top-level package's first import), so heavy
+dependencies that could be loaded on first use stand out.
+
+Usage:
+    python -m benchmarks.import_bench [--runs 5] [--top 8] [--output imports.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+MODULAR_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+MONOLITH_ROOT = os.path.join(MODULAR_ROOT, os.pardir, 'tenant-management-app')
+
+# name: (module to import, working directory)
+TARGETS = {
+    'flask app': ('backend.app', MODULAR_ROOT),
+    'fastapi app': ('fastapi_backend.main', MODULAR_ROOT),
+    'manage.py': ('manage', MODULAR_ROOT),
+    'synthetic': ('benchmarks.synthetic', MODULAR_ROOT),
+    'single-file app': ('app', MONOLITH_ROOT),
+}
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse(output):
+    """Return (total microseconds, {top-level package: cumulative microseconds})."""
+    total = 0
+    packages = {}
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        cumulative = int(cumulative)
+        if len(indent) == 1:
+            total += cumulative
+        if '.' not in name and name not in packages:
+            packages[name] = cumulative
+    return total, packages
+
+
+def measure(module, cwd, runs):
+    totals = []
+    packages = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=cwd, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise SystemExit(f'importing {module} failed:\n{result.stderr[-2000:]}')
+        total, seen = parse(result.stderr)
+        totals.append(total)
+        for name, cumulative in seen.items():
+            packages[name].append(cumulative)
+    return {
+        'total_ms': round(statistics.median(totals) / 1000, 1),
+        'packages_ms': {
+            name: round(statistics.median(values) / 1000, 1)
+            for name, values in packages.items() if len(values) == runs
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the apps and CLI tools")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="Heaviest packages listed per target")
+    parser.add_argument('--output', help="Write the medians as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, (module, cwd) in TARGETS.items():
+        result = measure(module, cwd, args.runs)
+        results[label] = result
+        heaviest = sorted(result['packages_ms'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{label:16} {result['total_ms']:>8.1f} ms   "
+              + ', '.join(f"{name} {ms:.0f}" for name, ms in heaviest))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
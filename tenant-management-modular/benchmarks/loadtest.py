@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Drive a locally started backend with concurrent HTTP load and report how it copes.
+
+A closed-loop asyncio client (plain HTTP/1.1 over keep-alive connections,
+no third-party client library) runs a weighted mix of reads, writes,
+ledger views and exports. Concurrency is stepped up (``--concurrency
+1,4,16,64``) and each step reports throughput, error rate, latency
+percentiles per category and the number of SQLite "database is locked"
+errors, counted from response bodies and from the server's log.
+
+The server is started by the harness (the Flask development server in
+threaded mode, gunicorn with threaded workers, or uvicorn) against a copy
+of the given database, or against a freshly generated one; ``--url``
+targets a server that is already running instead.
+
+Usage:
+    python -m benchmarks.loadtest --server uvicorn --database /tmp/bench.db
+    python -m benchmarks.loadtest --server flask-gunicorn --workers 4 --concurrency 1,8,32,128
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --duration 30
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date
+from urllib.parse import urlsplit
+
+from benchmarks import synthetic
+from benchmarks.routes_bench import percentile
+from manage import upgrade_database
+
+MODULAR_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+SERVERS = ('flask', 'flask-gunicorn', 'uvicorn')
+DEFAULT_MIX = {'read': 55, 'ledger': 20, 'write': 20, 'export': 5}
+LOCKED = b'database is locked'
+# One line per failed statement in a server-side traceback
+LOCKED_LOG_LINE = re.compile(rb'^sqlalchemy\.exc\.OperationalError: .*database is locked', re.MULTILINE)
+
+
+class HttpError(Exception):
+    """The connection failed or the response could not be parsed."""
+
+
+class Connection:
+    """A minimal keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Send one request and return ``(status, body)``; reconnects when the server closed."""
+        try:
+            return await asyncio.wait_for(self._request(method, path, body), self.timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            self.close()
+            raise HttpError(type(e).__name__) from e
+
+    async def _request(self, method, path, body):
+        if self.writer is None:
+            await self._open()
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = f'{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Length: {len(payload)}\r\n'
+        if body is not None:
+            head += 'Content-Type: application/json\r\n'
+        self.writer.write(head.encode() + b'\r\n' + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or int(status) in (204, 304):
+            data = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close' or version == b'HTTP/1.0':
+            self.close()
+        return int(status), data
+
+
+class Workload:
+    """Pick the next request from the weighted mix of categories."""
+
+    def __init__(self, properties, tenants, mix, seed=None):
+        self.rng = random.Random(seed)
+        self.properties = properties
+        self.tenants = tenants
+        self.categories = list(mix)
+        self.weights = [mix[name] for name in self.categories]
+        self.created = []
+
+    def next(self):
+        category = self.rng.choices(self.categories, self.weights)[0]
+        return (category, *getattr(self, f'_{category}')())
+
+    def _tenant(self):
+        return self.rng.choice(self.tenants)
+
+    def _read(self):
+        rng = self.rng
+        tenant = self._tenant()
+        return rng.choice((
+            ('tenant', 'GET', f"/api/tenants/{tenant['id']}", None),
+            ('tenant_balance', 'GET', f"/api/tenants/{tenant['id']}/balance", None),
+            ('property', 'GET', f"/api/properties/{rng.choice(self.properties)}", None),
+            ('property_balance', 'GET', f"/api/properties/{rng.choice(self.properties)}/balance", None),
+            ('tenants_page', 'GET', f"/api/tenants?page={rng.randint(1, 20)}&per_page=20", None),
+            ('properties', 'GET', '/api/properties', None),
+        ))
+
+    def _ledger(self):
+        if self.rng.random() < 0.7:
+            return 'tenant_ledger', 'GET', f"/api/tenants/{self._tenant()['id']}/transactions", None
+        return 'property_ledger', 'GET', f"/api/properties/{self.rng.choice(self.properties)}/transactions", None
+
+    def _write(self):
+        roll = self.rng.random()
+        if roll < 0.15 and self.created:
+            return 'delete_transaction', 'DELETE', f"/api/transactions/{self.created.pop()}", None
+        tenant = self._tenant()
+        if roll < 0.40:
+            contact = f"+91 9{self.rng.randint(100000000, 999999999)}"
+            return 'update_tenant', 'PUT', f"/api/tenants/{tenant['id']}", {'contact_no': contact}
+        today = date.today()
+        return 'create_transaction', 'POST', '/api/transactions', {
+            'property_id': tenant['property_id'], 'tenant_id': tenant['id'], 'type': 'payment_received',
+            'for_month': today.strftime('%B %Y'), 'amount': round(self.rng.uniform(5000, 50000), 2),
+            'transaction_date': today.isoformat(), 'comments': 'load test',
+        }
+
+    def _export(self):
+        return self.rng.choice((
+            ('arrears', 'GET', '/api/reports/arrears', None),
+            ('arrears_csv', 'GET', '/api/reports/arrears?format=csv&group_by=property', None),
+            ('tenants_csv', 'GET', '/api/reports/tenants_csv', None),
+            ('collections', 'GET', '/api/analytics/collections', None),
+            ('occupancy', 'GET', '/api/analytics/occupancy', None),
+        ))
+
+
+class StepStats:
+    """Outcome of one concurrency step."""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.latencies = defaultdict(list)
+        self.statuses = Counter()
+        self.transport_errors = Counter()
+        self.locked_responses = 0
+        self.locked_in_log = 0
+        self.elapsed = 0.0
+
+    def record(self, category, status, body, seconds):
+        self.latencies[category].append(seconds * 1000)
+        self.statuses[status] += 1
+        if status >= 500 and LOCKED in body:
+            self.locked_responses += 1
+
+    def summary(self):
+        everything = sorted(value for values in self.latencies.values() for value in values)
+        requests = len(everything) + sum(self.transport_errors.values())
+        failed = sum(n for status, n in self.statuses.items() if status >= 500) + sum(self.transport_errors.values())
+        categories = {}
+        for category, values in sorted(self.latencies.items()):
+            values.sort()
+            categories[category] = {
+                'requests': len(values),
+                'p50_ms': _round(percentile(values, 0.50)),
+                'p95_ms': _round(percentile(values, 0.95)),
+                'p99_ms': _round(percentile(values, 0.99)),
+            }
+        return {
+            'concurrency': self.concurrency,
+            'duration_s': round(self.elapsed, 2),
+            'requests': requests,
+            'throughput_rps': round(requests / self.elapsed, 1) if self.elapsed else 0.0,
+            'error_rate': round(failed / requests, 4) if requests else 0.0,
+            'status': {str(status): n for status, n in sorted(self.statuses.items())},
+            'transport_errors': dict(self.transport_errors),
+            'locked_errors': self.locked_responses + self.locked_in_log,
+            'p50_ms': _round(percentile(everything, 0.50)),
+            'p95_ms': _round(percentile(everything, 0.95)),
+            'p99_ms': _round(percentile(everything, 0.99)),
+            'max_ms': _round(everything[-1] if everything else None),
+            'categories': categories,
+        }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+async def _client(host, port, timeout, workload, stats, deadline, record):
+    connection = Connection(host, port, timeout)
+    try:
+        while time.perf_counter() < deadline:
+            category, name, method, path, body = workload.next()
+            started = time.perf_counter()
+            try:
+                status, data = await connection.request(method, path, body)
+            except HttpError as e:
+                stats.transport_errors[str(e)] += 1
+                continue
+            if record:
+                stats.record(category, status, data, time.perf_counter() - started)
+            if name == 'create_transaction' and status == 201:
+                workload.created.append(json.loads(data)['id'])
+    finally:
+        connection.close()
+
+
+async def run_step(host, port, concurrency, duration, workload, timeout, record=True):
+    """Keep ``concurrency`` clients busy for ``duration`` seconds."""
+    stats = StepStats(concurrency)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client(host, port, timeout, workload, stats, deadline, record) for _ in range(concurrency)
+    ))
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def fetch_ids(host, port, timeout):
+    """Property ids and (id, property_id) of tenants that have a property, read through the API."""
+    connection = Connection(host, port, timeout)
+    try:
+        status, body = await connection.request('GET', '/api/properties')
+        properties = [item['id'] for item in json.loads(body)]
+        # The Flask backend paginates tenants; the FastAPI backend returns them all
+        status, body = await connection.request('GET', '/api/tenants?page=1&per_page=2000')
+        payload = json.loads(body)
+        tenants = payload['tenants'] if isinstance(payload, dict) else payload
+    finally:
+        connection.close()
+    tenants = [{'id': t['id'], 'property_id': t['property_id']} for t in tenants if t.get('property_id')]
+    if not properties or not tenants:
+        raise SystemExit('The target database has no properties or tenants; generate data first')
+    return properties, tenants
+
+
+# --- Server management ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port, workers, threads):
+    if server == 'flask':
+        code = ("from backend.app import create_app; "
+                f"create_app().run(host='127.0.0.1', port={port}, threaded=True)")
+        return [sys.executable, '-c', code]
+    if server == 'flask-gunicorn':
+        if importlib.util.find_spec('gunicorn') is None:
+            raise SystemExit('gunicorn is not installed (uv pip install gunicorn)')
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'backend.app:create_app()']
+    return [sys.executable, '-m', 'uvicorn', 'fastapi_backend.main:app', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+
+
+class Server:
+    """Run a backend in a subprocess with its stderr captured to a log file."""
+
+    def __init__(self, server, database_uri, workers, threads, scratch):
+        self.port = _free_port()
+        self.command = server_command(server, self.port, workers, threads)
+        self.env = dict(os.environ, DATABASE_URI=database_uri, BACKUP_STORAGE_PATH=scratch)
+        self.log_path = os.path.join(scratch, 'server.log')
+        self.log_offset = 0
+        self.process = None
+
+    def start(self, timeout=120):
+        self.log = open(self.log_path, 'wb')
+        self.process = subprocess.Popen(
+            self.command, cwd=MODULAR_ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f'Server exited with {self.process.returncode}; see {self.log_path}')
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        raise SystemExit(f'Server did not start within {timeout}s')
+
+    def locked_errors_since_last_call(self):
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.log_offset)
+            chunk = f.read()
+        self.log_offset += len(chunk)
+        return len(LOCKED_LOG_LINE.findall(chunk))
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.log.close()
+
+
+def print_step(summary):
+    print(f"c={summary['concurrency']:<4} {summary['throughput_rps']:>8} req/s  "
+          f"errors={summary['error_rate']:.2%}  locked={summary['locked_errors']:<5} "
+          f"p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms max={summary['max_ms']}ms")
+    for category, values in summary['categories'].items():
+        print(f"         {category:8} {values['requests']:>7} req  p50={values['p50_ms']}ms "
+              f"p95={values['p95_ms']}ms p99={values['p99_ms']}ms")
+
+
+async def drive(host, port, args, server=None):
+    properties, tenants = await fetch_ids(host, port, args.timeout)
+    workload = Workload(properties, tenants, args.mix, args.seed)
+    if args.warmup > 0:
+        await run_step(host, port, args.concurrency[0], args.warmup, workload, args.timeout, record=False)
+        if server is not None:
+            server.locked_errors_since_last_call()
+    steps = []
+    for concurrency in args.concurrency:
+        stats = await run_step(host, port, concurrency, args.duration, workload, args.timeout)
+        if server is not None:
+            stats.locked_in_log = server.locked_errors_since_last_call()
+        summary = stats.summary()
+        print_step(summary)
+        steps.append(summary)
+    return steps
+
+
+def _mix(value):
+    mix = dict(DEFAULT_MIX)
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown category {name!r}; use {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load test against a local backend")
+    parser.add_argument('--server', choices=SERVERS, default='uvicorn')
+    parser.add_argument('--url', help="Target an already running server instead of starting one")
+    parser.add_argument('--database', help="SQLite file to serve; a copy is used so it is left untouched")
+    parser.add_argument('--properties', type=int, default=200, help="Size of the generated dataset without --database")
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn/uvicorn worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker")
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in v.split(',')], default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=15.0, help="Seconds per concurrency step")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unrecorded seconds before the first step")
+    parser.add_argument('--mix', type=_mix, default=dict(DEFAULT_MIX),
+                        help="Category weights, e.g. read=60,write=30 (read, ledger, write, export)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the step summaries as JSON")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        target = urlsplit(args.url)
+        label = args.url
+        steps = asyncio.run(drive(target.hostname, target.port or 80, args))
+    else:
+        scratch = tempfile.mkdtemp(prefix='loadtest-')
+        database = os.path.join(scratch, 'load.db')
+        try:
+            if args.database:
+                shutil.copyfile(args.database, database)
+            else:
+                print(f"Generating {args.transactions:,} transactions...", file=sys.stderr)
+                synthetic.generate(f'sqlite:///{database}', args.properties, args.tenants, args.transactions, args.seed)
+            # The apps no longer create the schema on import, so bring the copy up to date first
+            upgrade_database(f'sqlite:///{database}')
+            server = Server(args.server, f'sqlite:///{database}', args.workers, args.threads, scratch).start()
+            label = ' '.join(server.command[1:])
+            print(f"{args.server} on port {server.port} ({args.workers} worker(s))", file=sys.stderr)
+            try:
+                steps = asyncio.run(drive('127.0.0.1', server.port, args, server))
+            finally:
+                server.stop()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target': label, 'server': None if args.url else args.server, 'workers': args.workers,
+                       'mix': args.mix, 'steps': steps}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare ledger aggregates over float and integer minor-unit money columns.
+
+Generates a synthetic portfolio, rewrites a copy of it with the money
+columns stored as floats in major units (the layout before migration 4),
+times the aggregate queries there, then times ``store_money_in_minor_units``
+migrating that copy and the same queries over the integer columns. The
+float grand total is compared with the exact one to show the accumulated
+rounding error.
+
+Usage:
+    python -m benchmarks.money_bench [--transactions 1000000] [--repeat 3] [--output money.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks import synthetic
+from common import money
+from common.migrations import _quote, _retype, _table_sql, migrate, rebuild_table, schema_version
+
+QUERIES = {
+    'grand total': 'SELECT SUM(amount) FROM "transaction"',
+    'per property': 'SELECT property_id, SUM(amount) FROM "transaction" GROUP BY property_id',
+    'per tenant month': """
+        SELECT tenant_id, period_month,
+               SUM(CASE WHEN type <> 'payment_received' THEN amount ELSE 0 END),
+               SUM(CASE WHEN type = 'payment_received' THEN amount ELSE 0 END)
+        FROM "transaction" WHERE tenant_id IS NOT NULL GROUP BY tenant_id, period_month
+    """,
+}
+
+
+def to_major_units(engine):
+    """Turn the money columns back into floats in major units, as before migration 4."""
+    with engine.connect() as conn:
+        for table, columns in money.COLUMNS.items():
+            rebuild_table(
+                conn, table,
+                create_sql=_retype(_table_sql(conn, table), columns, 'FLOAT'),
+                columns={column: f'{_quote(column)} / {float(money.MINOR_UNITS)}' for column in columns},
+                batch_size=100000,
+            )
+        conn.execute(schema_version.delete().where(schema_version.c.version == 4))
+        conn.commit()
+
+
+def time_queries(engine, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                rows = conn.execute(text(sql)).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = min(timings)
+            if name == 'grand total':
+                results['total'] = rows[0][0]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Float vs integer minor-unit money aggregates")
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = os.path.join(tmp, 'exact.db')
+        n = args.transactions
+        synthetic.generate(f'sqlite:///{exact}', max(n // 500, 10), max(n // 100, 50), n)
+        legacy = os.path.join(tmp, 'legacy.db')
+        shutil.copy(exact, legacy)
+        engine = create_engine(f'sqlite:///{legacy}')
+        to_major_units(engine)
+
+        before = time_queries(engine, args.repeat)
+        started = time.perf_counter()
+        migrate(engine)
+        migration = time.perf_counter() - started
+        after = time_queries(engine, args.repeat)
+        engine.dispose()
+
+    print(f"migration {migration:.1f} s")
+    print(f"{'query':18} {'float':>9} {'integer':>9}")
+    for name in QUERIES:
+        print(f"{name:18} {before[name] * 1000:>7.0f}ms {after[name] * 1000:>7.0f}ms")
+    exact_total = money.from_minor(after['total'])
+    print(f"grand total: float {before['total']!r}, integer {exact_total:.2f} "
+          f"(error {before['total'] - exact_total:+.2e})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'transactions': n, 'migration_seconds': migration,
+                'float_seconds': before, 'integer_seconds': after,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
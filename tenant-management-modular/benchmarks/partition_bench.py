@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Time date-bounded ledger, report and analytics queries before and after
+splitting the transaction table into year partitions.
+
+Generates a synthetic portfolio sized for ten years of dense history (the
+longest tenancies reach further back), runs each query on the single table,
+splits every closed year into its own table with ``partitions.split()`` and
+runs them again. Results must be identical; the ``tables`` column shows how
+many tables the pruned query read. Queries bounded to recent months only
+read the live table; all-time ones such as ``ledger verify`` read them all.
+
+Usage:
+    python -m benchmarks.partition_bench [--transactions 1000000] [--years 10] [--repeat 3] [--output partitions.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from benchmarks import synthetic
+from common import analytics, ledger, partitions, reports
+
+
+def _this_year_by_type(conn, start):
+    source = partitions.source(conn, start=start)
+    return conn.execute(text(
+        f'SELECT type, SUM(amount) FROM {source} AS tx WHERE transaction_date >= :start GROUP BY type ORDER BY type'
+    ), {'start': start.isoformat()}).fetchall()
+
+
+def build_queries(today):
+    """Name -> (function of a connection, the bounds it passes to partitions.source())."""
+    this_year = date(today.year, 1, 1)
+    last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    year_end = date(today.year - 8, 12, 31)
+    return {
+        'this year by type': (
+            lambda conn: _this_year_by_type(conn, this_year),
+            {'start': this_year},
+        ),
+        'collections last month': (
+            lambda conn: analytics.monthly_collections(conn, last_month, last_month),
+            {'start': last_month, 'end': today, 'column': 'period_month'},
+        ),
+        'rent roll this year': (
+            lambda conn: analytics.rent_roll(conn, this_year, today),
+            {'start': this_year, 'end': today, 'column': 'period_month'},
+        ),
+        f'arrears as of {year_end}': (
+            lambda conn: reports.arrears_report(conn, as_of=year_end),
+            {'end': year_end + timedelta(days=1)},
+        ),
+        'ledger verify': (ledger.verify, {}),
+    }
+
+
+def time_queries(engine, queries, repeat):
+    timings, results, tables = {}, {}, {}
+    with engine.connect() as conn:
+        for name, (query, bounds) in queries.items():
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                results[name] = query(conn)
+                best = min(best, time.perf_counter() - started)
+            timings[name] = best
+            tables[name] = partitions.source(conn, **bounds).count(' FROM ') or 1
+    return timings, results, tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Date-bounded queries on one table vs year partitions")
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--years', type=int, default=10, help="Years of history to generate")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    n = args.transactions
+    # Tenancies average about two years, so five tenants per property span the history
+    n_properties = max(round(n / (args.years * 12 * synthetic.ROWS_PER_MONTH)), 1)
+    today = date.today()
+    queries = build_queries(today)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'partitioned.db')
+        synthetic.generate(f'sqlite:///{path}', n_properties, n_properties * 5, n)
+        engine = create_engine(f'sqlite:///{path}')
+
+        before, expected, _ = time_queries(engine, queries, args.repeat)
+        started = time.perf_counter()
+        split = partitions.split(engine, today.year - 1)
+        split_seconds = time.perf_counter() - started
+        after, results, tables = time_queries(engine, queries, args.repeat)
+        with engine.connect() as conn:
+            live = conn.execute(text('SELECT COUNT(*) FROM "transaction"')).scalar()
+        engine.dispose()
+
+    print(f"split {n - live:,} of {n:,} transactions into {len(split)} year tables in {split_seconds:.1f} s; "
+          f"{live:,} stay in the live table")
+    print(f"{'query':28} {'single':>9} {'partitioned':>12} {'tables':>7}")
+    for name in queries:
+        same = '' if results[name] == expected[name] else '  RESULTS DIFFER'
+        print(f"{name:28} {before[name] * 1000:>7.0f}ms {after[name] * 1000:>10.0f}ms {tables[name]:>7}{same}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'transactions': n, 'partitions': len(split), 'live_rows': live, 'split_seconds': split_seconds,
+                'single_seconds': before, 'partitioned_seconds': after, 'tables_read': tables,
+            }, f, indent=2)
+    return 0 if all(results[name] == expected[name] for name in queries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare ways of restoring a SQLite dump into an empty database.
+
+    replay   one statement at a time with a commit after each, as a
+             line-by-line restore script does (timed on the first
+             --replay-rows INSERTs and extrapolated)
+    script   the whole dump through sqlite3's executescript, i.e.
+             ``sqlite3 new.db < dump.sql`` in one transaction
+    loader   ``manage.py load --no-upgrade``: batched multi-row inserts,
+             journal off, deferred indexes, integrity check
+    upgrade  the loader followed by migrations and the ledger rebuild
+
+The dump is written with ``iterdump()``, the same format as ``.dump``.
+
+Usage:
+    python -m benchmarks.restore_bench [--transactions 1000000] [--dump dump.sql] [--output restore.json]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from common.bulkload import iter_statements
+from manage import restore_database
+
+
+def _replay(dump, database, limit):
+    """Execute statements one by one, committing after each INSERT, until ``limit`` rows."""
+    conn = sqlite3.connect(database, isolation_level=None)
+    rows = 0
+    started = time.perf_counter()
+    with open(dump, encoding='utf-8') as f:
+        for statement in iter_statements(f):
+            if statement.startswith(('BEGIN', 'COMMIT')):
+                continue
+            conn.execute(statement)
+            if statement.startswith('INSERT'):
+                rows += 1
+                if rows >= limit:
+                    break
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return rows, elapsed
+
+
+def _script(dump, database):
+    conn = sqlite3.connect(database)
+    started = time.perf_counter()
+    with open(dump, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time dump restores: replay, executescript and the bulk loader")
+    parser.add_argument('--transactions', type=int, default=1000000, help="Size of the generated dataset")
+    parser.add_argument('--dump', help="Existing .dump file to restore instead of generating one")
+    parser.add_argument('--replay-rows', type=int, default=20000, help="INSERTs to time for the replay estimate")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = args.dump
+        if not dump:
+            source = os.path.join(tmp, 'source.db')
+            n = args.transactions
+            synthetic.generate(f'sqlite:///{source}', max(n // 500, 10), max(n // 100, 50), n)
+            dump = os.path.join(tmp, 'dump.sql')
+            with sqlite3.connect(source) as conn, open(dump, 'w', encoding='utf-8') as f:
+                for line in conn.iterdump():
+                    f.write(f'{line}\n')
+        size_mb = os.path.getsize(dump) / 1e6
+        print(f"dump: {size_mb:.0f} MB")
+
+        results = {}
+        replayed, elapsed = _replay(dump, os.path.join(tmp, 'replay.db'), args.replay_rows)
+
+        target = os.path.join(tmp, 'loader.db')
+        started = time.perf_counter()
+        report = restore_database([dump], f'sqlite:///{target}', upgrade=False)
+        results['loader'] = time.perf_counter() - started
+        total_rows = sum(report['rows'].values())
+        results['replay'] = elapsed / max(replayed, 1) * total_rows
+
+        results['script'] = _script(dump, os.path.join(tmp, 'script.db'))
+
+        target = os.path.join(tmp, 'upgrade.db')
+        started = time.perf_counter()
+        restore_database([dump], f'sqlite:///{target}')
+        results['upgrade'] = time.perf_counter() - started
+
+    print(f"{total_rows:,} rows, integrity {report['integrity']}")
+    for method in ('replay', 'script', 'loader', 'upgrade'):
+        note = f"  (estimated from {replayed:,} rows)" if method == 'replay' else ''
+        print(f"{method:8} {results[method]:>10.1f} s {total_rows / results[method]:>12,.0f} rows/s{note}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'dump_mb': round(size_mb, 1), 'rows': total_rows, 'seconds': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
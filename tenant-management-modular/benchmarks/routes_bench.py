@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Benchmark every API route of the three backends on generated datasets.
+
+For each dataset size and backend a fresh worker process copies a cached
+synthetic database (see ``benchmarks.synthetic``), imports the app against
+it and drives each route in-process through the framework's test client.
+Per route it records latency percentiles, SQL statements per request,
+response size and the peak Python memory allocated while serving it.
+
+Results are written as JSON together with the commit they were measured
+on; ``--compare`` diffs two result files and exits non-zero when a route
+got slower or issues more queries than before.
+
+Usage:
+    python -m benchmarks.routes_bench --sizes small,medium --output before.json
+    python -m benchmarks.routes_bench --backends fastapi --sizes small --iterations 50
+    python -m benchmarks.routes_bench --compare before.json after.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks import synthetic
+
+MODULAR_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+MONOLITH_APP = os.path.join(MODULAR_ROOT, os.pardir, 'tenant-management-app', 'app.py')
+
+# (properties, tenants, transactions)
+SIZES = {
+    'small': (50, 250, 25_000),
+    'medium': (500, 2_500, 250_000),
+    'large': (10_000, 50_000, 5_000_000),
+}
+BACKENDS = ('flask', 'fastapi', 'monolith')
+SCHEMAS = {'flask': 'modular', 'fastapi': 'modular', 'monolith': 'monolith'}
+ADMIN_TOKEN = 'bench-admin'
+
+
+class Case:
+    """One request to benchmark.
+
+    ``path`` may be a callable taking the shared state dict, so write routes
+    can target the rows created by an earlier case; it raises ``IndexError``
+    when there is nothing left to act on. ``capture`` stores whatever a later
+    case needs from the JSON response.
+    """
+
+    def __init__(self, name, method, path, body=None, capture=None, headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.capture = capture
+        self.headers = headers or {}
+
+    def resolve(self, state):
+        return self.path(state) if callable(self.path) else self.path
+
+
+def _created(kind):
+    def capture(state, payload):
+        state.setdefault(kind, []).append(payload['id'])
+    return capture
+
+
+def _alert(state, payload):
+    alerts = payload if isinstance(payload, list) else payload.get('alerts', [])
+    if alerts:
+        state['alert'] = alerts[0]['id']
+
+
+def _last(kind, prefix):
+    return lambda state: f"{prefix}/{state[kind][-1]}"
+
+
+def _pop(kind, prefix):
+    return lambda state: f"{prefix}/{state[kind].pop()}"
+
+
+def _bodies(sample):
+    tenant = {
+        'name': 'Bench Tenant', 'property_id': sample['property'], 'passport': 'K1234567',
+        'passport_validity': '2030-01-01', 'aadhar_no': '1234 5678 9012', 'employment_details': 'Bench',
+        'permanent_address': '1 Bench Street', 'contact_no': '+91 9000000000', 'emergency_contact_no': '+91 8000000000',
+        'rent': 25000, 'security': 50000, 'move_in_date': '2025-01-01',
+        'contract_start_date': '2025-01-01', 'contract_expiry_date': '2025-11-30',
+    }
+    prop = {'address': 'Bench Property', 'rent': 25000, 'maintenance': 1000}
+    transaction = {
+        'property_id': sample['property'], 'tenant_id': sample['tenant'], 'type': 'payment_received',
+        'for_month': 'January 2025', 'amount': 25000, 'transaction_date': '2025-01-05', 'comments': 'bench',
+    }
+    return tenant, prop, transaction
+
+
+def _crud_cases(kind, list_path, body, sample_id):
+    prefix = f'/api/{kind}'
+    return [
+        Case(f'{kind}_list', 'GET', list_path),
+        Case(f'{kind}_detail', 'GET', f'{prefix}/{sample_id}'),
+        Case(f'{kind}_create', 'POST', prefix, body, _created(kind)),
+        Case(f'{kind}_update', 'PUT', _last(kind, prefix), body),
+        Case(f'{kind}_delete', 'DELETE', _pop(kind, prefix)),
+    ]
+
+
+def modular_cases(sample):
+    """Every route in backend/routes.py; fastapi_backend/main.py serves the same paths."""
+    tenant, prop, transaction = _bodies(sample)
+    admin = {'X-Admin-Token': ADMIN_TOKEN}
+    return [
+        *_crud_cases('tenants', '/api/tenants?page=1&per_page=50', tenant, sample['tenant']),
+        Case('tenant_ledger', 'GET', f"/api/tenants/{sample['tenant']}/transactions"),
+        Case('tenant_balance', 'GET', f"/api/tenants/{sample['tenant']}/balance"),
+        *_crud_cases('properties', '/api/properties', prop, sample['property']),
+        Case('property_ledger', 'GET', f"/api/properties/{sample['property']}/transactions"),
+        Case('property_balance', 'GET', f"/api/properties/{sample['property']}/balance"),
+        *_crud_cases('transactions', '/api/transactions', transaction, sample['transaction']),
+        Case('report_tenants_csv', 'GET', '/api/reports/tenants_csv'),
+        Case('report_properties_csv', 'GET', '/api/reports/properties_csv'),
+        Case('report_transactions_csv', 'GET', '/api/reports/transactions_csv'),
+        Case('report_arrears', 'GET', '/api/reports/arrears'),
+        Case('report_arrears_csv', 'GET', '/api/reports/arrears?format=csv&group_by=property'),
+        Case('report_arrears_xlsx', 'GET', '/api/reports/arrears?format=xlsx'),
+        Case('analytics_collections', 'GET', '/api/analytics/collections'),
+        Case('analytics_rent_roll', 'GET', '/api/analytics/rent_roll'),
+        Case('analytics_occupancy', 'GET', '/api/analytics/occupancy'),
+        Case('alerts_expiring', 'GET', '/api/alerts/expiring?within_days=60'),
+        Case('alerts_scan', 'POST', '/api/alerts/scan'),
+        Case('alerts_list', 'GET', '/api/alerts?include_acknowledged=true', capture=_alert),
+        Case('alerts_acknowledge', 'POST', lambda state: f"/api/alerts/{state['alert']}/acknowledge"),
+        Case('cache_stats', 'GET', '/api/cache/stats'),
+        Case('admin_slow_queries', 'GET', '/api/admin/slow-queries', headers=admin),
+        Case('admin_slow_queries_reset', 'DELETE', '/api/admin/slow-queries', headers=admin),
+        Case('backup', 'GET', '/api/backup'),
+        Case('metrics', 'GET', '/metrics'),
+    ]
+
+
+def monolith_cases(sample):
+    """``api_list``/``api_detail`` for each model plus the single-file app's reports."""
+    tenant, prop, transaction = _bodies(sample)
+    return [
+        *_crud_cases('tenants', '/api/tenants', tenant, sample['tenant']),
+        *_crud_cases('properties', '/api/properties', prop, sample['property']),
+        Case('property_ledger', 'GET', f"/api/properties/{sample['property']}/transactions"),
+        *_crud_cases('transactions', '/api/transactions?page=1&per_page=50', transaction, sample['transaction']),
+        Case('report_tenants_xlsx', 'GET', '/api/reports/tenants'),
+        Case('report_transactions_xlsx', 'GET', '/api/reports/transactions'),
+        Case('report_tenants_csv', 'GET', '/api/reports/tenants_csv'),
+        Case('report_properties_csv', 'GET', '/api/reports/properties_csv'),
+        Case('report_transactions_csv', 'GET', '/api/reports/transactions_csv'),
+        Case('backup', 'GET', '/api/backup'),
+        Case('index', 'GET', '/'),
+    ]
+
+
+# --- Dataset preparation (runs inside the worker) ---
+
+def _load_monolith():
+    spec = importlib.util.spec_from_file_location('tenant_management_monolith', MONOLITH_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def prepare_dataset(backend, size, data_dir, database, seed):
+    """Copy the cached dataset for ``size`` to ``database``, generating it on first use.
+
+    Returns the imported single-file app for the monolith backend, since its
+    schema has to be created through it before the data can be generated.
+    """
+    n_properties, n_tenants, n_transactions = SIZES[size]
+    template = os.path.join(data_dir, f'{SCHEMAS[backend]}-{size}-seed{seed}.db')
+    uri = f'sqlite:///{database}'
+    os.environ['DATABASE_URI'] = uri
+    monolith = _load_monolith() if backend == 'monolith' else None
+
+    if os.path.exists(template):
+        shutil.copyfile(template, database)
+        return monolith
+
+    print(f'  generating {size} dataset for the {SCHEMAS[backend]} schema...', file=sys.stderr)
+    if monolith is not None:
+        with monolith.app.app_context():
+            monolith.db.create_all()
+    synthetic.generate(uri, n_properties, n_tenants, n_transactions, seed)
+    if monolith is not None:
+        with monolith.app.app_context():
+            monolith.rebuild_ledger()
+            monolith.db.engine.dispose()
+    os.makedirs(data_dir, exist_ok=True)
+    shutil.copyfile(database, template + '.tmp')
+    os.replace(template + '.tmp', template)
+    return monolith
+
+
+def sample_ids(database):
+    """Pick a tenant, property and transaction from the middle of the ledger."""
+    conn = sqlite3.connect(database)
+    try:
+        count = conn.execute('SELECT COUNT(*) FROM "transaction"').fetchone()[0]
+        row = conn.execute(
+            'SELECT id, tenant_id, property_id FROM "transaction" WHERE tenant_id IS NOT NULL '
+            'ORDER BY id LIMIT 1 OFFSET ?', (count // 2,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return {'transaction': row[0], 'tenant': row[1], 'property': row[2]}
+
+
+# --- Measurement ---
+
+class QueryCounter:
+    """Count statements on every engine; requests are issued one at a time."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def make_client(backend, monolith):
+    if backend == 'flask':
+        from backend.app import create_app
+        client = create_app().test_client()
+    elif backend == 'fastapi':
+        from fastapi.testclient import TestClient
+        from fastapi_backend.main import app
+        client = TestClient(app)
+    else:
+        client = monolith.app.test_client()
+
+    def call(method, path, body, headers):
+        if backend == 'fastapi':
+            response = client.request(method, path, json=body, headers=headers)
+            return response.status_code, response.content
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+    return call
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_case(case, call, state, counter, iterations, min_iterations, time_budget):
+    """Serve ``case`` once under tracemalloc, then time up to ``iterations`` requests."""
+    latencies, queries, statuses = [], [], Counter()
+    size = peak = None
+    started = time.perf_counter()
+    for i in range(iterations + 1):
+        if i > min_iterations and time.perf_counter() - started > time_budget:
+            break
+        try:
+            path = case.resolve(state)
+        except (IndexError, KeyError):
+            break
+        measure_memory = i == 0
+        if measure_memory:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        before = counter.count
+        t0 = time.perf_counter()
+        status, body = call(case.method, path, case.body, case.headers)
+        elapsed = time.perf_counter() - t0
+        if measure_memory:
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+        else:
+            # The first request is warm-up and memory measurement only
+            latencies.append(elapsed * 1000)
+            queries.append(counter.count - before)
+        statuses[status] += 1
+        size = len(body)
+        if case.capture and status < 300:
+            case.capture(state, json.loads(body))
+
+    latencies.sort()
+    queries.sort()
+    return {
+        'route': case.name,
+        'method': case.method,
+        'path': case.path if isinstance(case.path, str) else None,
+        'iterations': len(latencies),
+        'status': dict(sorted(statuses.items())),
+        'errors': sum(n for status, n in statuses.items() if status >= 400),
+        'p50_ms': _round(percentile(latencies, 0.50)),
+        'p90_ms': _round(percentile(latencies, 0.90)),
+        'p95_ms': _round(percentile(latencies, 0.95)),
+        'p99_ms': _round(percentile(latencies, 0.99)),
+        'max_ms': _round(latencies[-1] if latencies else None),
+        'mean_ms': _round(sum(latencies) / len(latencies) if latencies else None),
+        'queries': queries[len(queries) // 2] if queries else None,
+        'response_bytes': size,
+        'peak_memory_kb': round(peak / 1024, 1) if peak is not None else None,
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def worker(args):
+    """Benchmark one backend on one dataset size and write the results as JSON."""
+    scratch = tempfile.mkdtemp(prefix='routes-bench-')
+    database = os.path.join(scratch, 'bench.db')
+    os.environ.update({
+        'BACKUP_STORAGE_PATH': scratch,
+        'ADMIN_TOKEN': ADMIN_TOKEN,
+        'PROFILE_DIR': os.path.join(scratch, 'profiles'),
+    })
+    logging.getLogger('tenant_management').setLevel(logging.ERROR)
+    try:
+        monolith = prepare_dataset(args.worker, args.size, args.data_dir, database, args.seed)
+        sample = sample_ids(database)
+        call = make_client(args.worker, monolith)
+        counter = QueryCounter()
+        cases = monolith_cases(sample) if args.worker == 'monolith' else modular_cases(sample)
+        state = {}
+        results = []
+        for case in cases:
+            if args.routes and case.name not in args.routes:
+                continue
+            result = run_case(case, call, state, counter, args.iterations, args.min_iterations, args.time_budget)
+            result.update(backend=args.worker, size=args.size)
+            results.append(result)
+            print(f"  {args.worker:8} {args.size:7} {case.name:28} p50={result['p50_ms']}ms "
+                  f"queries={result['queries']}", file=sys.stderr)
+        output = {
+            'backend': args.worker,
+            'size': args.size,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'results': results,
+        }
+        with open(args.worker_output, 'w') as f:
+            json.dump(output, f)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# --- Orchestration and comparison ---
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=MODULAR_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    runs = []
+    for size in args.sizes:
+        for backend in args.backends:
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+                worker_output = f.name
+            command = [
+                sys.executable, '-m', 'benchmarks.routes_bench', '--worker', backend, '--size', size,
+                '--worker-output', worker_output, '--data-dir', args.data_dir, '--seed', str(args.seed),
+                '--iterations', str(args.iterations), '--min-iterations', str(args.min_iterations),
+                '--time-budget', str(args.time_budget),
+            ]
+            if args.routes:
+                command += ['--routes', ','.join(args.routes)]
+            try:
+                subprocess.run(command, cwd=MODULAR_ROOT, check=True)
+                with open(worker_output) as f:
+                    runs.append(json.load(f))
+            finally:
+                os.unlink(worker_output)
+
+    document = {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'sizes': {size: dict(zip(('properties', 'tenants', 'transactions'), SIZES[size])) for size in args.sizes},
+        'runs': runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+
+    print(f"{'backend':8} {'size':7} {'route':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'queries':>7} {'peak KB':>9} {'errors':>6}")
+    for entry in runs:
+        for r in entry['results']:
+            print(f"{r['backend']:8} {r['size']:7} {r['route']:28} {_cell(r['p50_ms'])} {_cell(r['p95_ms'])} "
+                  f"{_cell(r['p99_ms'])} {_cell(r['queries'], 7)} {_cell(r['peak_memory_kb'])} {r['errors']:>6}")
+        print(f"{entry['backend']:8} {entry['size']:7} {'(peak RSS of worker)':28} {entry['max_rss_kb']:>9} KB")
+    print(f"Results written to {args.output}")
+
+
+def _cell(value, width=9):
+    return f"{'-' if value is None else value:>{width}}"
+
+
+def _index(document):
+    return {
+        (r['backend'], r['size'], r['route']): r
+        for entry in document['runs'] for r in entry['results']
+    }
+
+
+def compare(before_path, after_path, threshold):
+    """Print per-route changes; return 1 if any route regressed beyond ``threshold``."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    old, new = _index(before), _index(after)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'backend':8} {'size':7} {'route':28} {'p50 ms':>17} {'p95 ms':>17} {'queries':>9}")
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        a, b = old[key], new[key]
+        if a['p50_ms'] is None or b['p50_ms'] is None:
+            continue
+        change = (b['p95_ms'] - a['p95_ms']) / a['p95_ms'] if a['p95_ms'] else 0.0
+        more_queries = (b['queries'] or 0) > (a['queries'] or 0)
+        flag = ''
+        if change > threshold or more_queries:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key[0]:8} {key[1]:7} {key[2]:28} {a['p50_ms']:>8}->{b['p50_ms']:<8} "
+              f"{a['p95_ms']:>8}->{b['p95_ms']:<8} {a['queries']:>4}->{b['queries']:<4}{flag}")
+    missing, added = len(set(old) - set(new)), len(set(new) - set(old))
+    if missing or added:
+        print(f"{missing} route(s) only in {before_path}, {added} only in {after_path}")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%} p95 or added queries")
+    return 1 if regressions else 0
+
+
+def _list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API route of the Flask, FastAPI and single-file backends")
+    parser.add_argument('--sizes', type=_list, default=['small', 'medium'], help=f"Comma-separated: {', '.join(SIZES)}")
+    parser.add_argument('--backends', type=_list, default=list(BACKENDS), help=f"Comma-separated: {', '.join(BACKENDS)}")
+    parser.add_argument('--routes', type=_list, default=None, help="Only these route names")
+    parser.add_argument('--iterations', type=int, default=30, help="Timed requests per route")
+    parser.add_argument('--min-iterations', type=int, default=3, help="Timed requests per route even over budget")
+    parser.add_argument('--time-budget', type=float, default=10.0, help="Seconds per route before stopping early")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'tenant-management-bench'),
+                        help="Where generated datasets are cached between runs")
+    parser.add_argument('--output', default='routes_bench.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Diff two result files")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative p95 slowdown for --compare")
+    parser.add_argument('--worker', choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument('--size', choices=list(SIZES), help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+    if args.worker:
+        worker(args)
+        return 0
+    unknown = [size for size in args.sizes if size not in SIZES] + [b for b in args.backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown size or backend: {', '.join(unknown)}")
+    run(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
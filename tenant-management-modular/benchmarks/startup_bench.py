@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Measure worker cold start: interpreter plus app import, and the first requests.
+
+Each sample is a fresh Python process that imports the app (building it
+with ``create_app()`` for Flask), then serves two requests through the test
+client. The first request pays for lazy initialization (engine connect,
+caches, first-use imports); the second shows the steady state. The time
+``manage.py db upgrade`` takes on the same database is measured as well,
+since that is what every worker used to run while starting.
+
+Usage:
+    python -m benchmarks.startup_bench [--runs 10] [--database /tmp/bench.db] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+MODULAR_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+PATH = '/api/properties'
+
+_PROBES = {
+    'flask': """
+from backend.app import create_app
+app = create_app()
+imported = time.perf_counter()
+client = app.test_client()
+def get():
+    return client.get(PATH).status_code
+""",
+    'fastapi': """
+from fastapi_backend.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+def get():
+    return client.get(PATH).status_code
+""",
+}
+
+_TEMPLATE = """
+import json, sys, time
+started = time.perf_counter()
+PATH = {path!r}
+{probe}
+t0 = time.perf_counter(); status = get(); first = time.perf_counter() - t0
+t0 = time.perf_counter(); get(); second = time.perf_counter() - t0
+json.dump({{'import_s': imported - started, 'first_request_s': first, 'second_request_s': second,
+           'status': status, 'modules': len(sys.modules)}}, sys.stdout)
+"""
+
+_UPGRADE = """
+import json, sys, time
+started = time.perf_counter()
+from manage import upgrade_database
+upgrade_database({uri!r})
+json.dump({{'upgrade_s': time.perf_counter() - started}}, sys.stdout)
+"""
+
+
+def _sample(code, env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=MODULAR_ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    sample = json.loads(result.stdout)
+    sample['process_s'] = wall
+    return sample
+
+
+def _summarize(samples):
+    keys = [key for key in samples[0] if key.endswith('_s')]
+    summary = {key: round(statistics.median(s[key] for s in samples) * 1000, 1) for key in keys}
+    for key in ('status', 'modules'):
+        if key in samples[0]:
+            summary[key] = samples[0][key]
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import and first-request latency of the backends")
+    parser.add_argument('--runs', type=int, default=10, help="Fresh processes per backend")
+    parser.add_argument('--database', help="SQLite file to start against (default: a small generated dataset)")
+    parser.add_argument('--output', help="Write the medians as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = args.database or os.path.join(tmp, 'startup.db')
+        uri = f'sqlite:///{os.path.abspath(database)}'
+        if not args.database:
+            synthetic.generate(uri, 50, 250, 10000)
+        env = dict(os.environ, DATABASE_URI=uri)
+
+        results = {}
+        for backend, probe in _PROBES.items():
+            code = _TEMPLATE.format(path=PATH, probe=probe)
+            results[backend] = _summarize([_sample(code, env) for _ in range(args.runs)])
+        results['db_upgrade'] = _summarize([_sample(_UPGRADE.format(uri=uri), env) for _ in range(args.runs)])
+
+    print(f"median of {args.runs} runs, milliseconds")
+    print(f"{'':10} {'process':>9} {'import':>9} {'1st req':>9} {'2nd req':>9} {'modules':>8}")
+    for backend in _PROBES:
+        r = results[backend]
+        print(f"{backend:10} {r['process_s']:>9} {r['import_s']:>9} {r['first_request_s']:>9} "
+              f"{r['second_request_s']:>9} {r['modules']:>8}")
+    r = results['db_upgrade']
+    print(f"{'db upgrade':10} {r['process_s']:>9} {r['upgrade_s']:>9}   (run once per deploy, no longer per worker)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Generate a realistic synthetic portfolio for load tests and benchmarks.
+
+Each property gets a sequence of tenancies separated by short vacancies,
+ending today. Contracts run in 11-month terms with renewals, rent rises
+about 5% a year, and every occupied month produces a rent charge, usually a
+payment (sometimes late, partial or missing), maintenance and occasional
+utility bills. Rows are bulk inserted in batches.
+
+The target database may use either schema: if the tables already exist
+(for example the single-file app's instance/app.db after its first start),
+only the columns they have are filled, with amounts in minor units where
+the column is an integer; otherwise the modular schema is created. Ledger balances are rebuilt afterwards when the ledger tables of
+the modular schema are present.
+
+Usage:
+    python -m benchmarks.synthetic --database-uri sqlite:////tmp/bench.db
+    python -m benchmarks.synthetic --database-uri sqlite:////tmp/small.db \\
+        --properties 100 --tenants 500 --transactions 50000
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import date
+from operator import itemgetter
+
+from sqlalchemy import Integer, MetaData, create_engine, event, func, inspect, select
+
+from common import ledger, money
+from common.migrations import bootstrap
+
+TRANSACTION_TYPES = ('rent', 'payment_received', 'maintenance', 'electricity', 'water', 'gas', 'security', 'misc')
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+)
+FIRST_NAMES = (
+    'Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Sai', 'Reyansh', 'Ishaan', 'Kabir', 'Rohan', 'Vikram',
+    'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Meera', 'Priya', 'Kavya', 'Isha', 'Neha', 'Pooja',
+    'James', 'Maria', 'Chen', 'Fatima', 'Olivia', 'Lucas', 'Sofia', 'Omar', 'Yuki', 'Elena',
+)
+LAST_NAMES = (
+    'Sharma', 'Verma', 'Iyer', 'Nair', 'Reddy', 'Patel', 'Gupta', 'Singh', 'Kumar', 'Das',
+    'Menon', 'Rao', 'Joshi', 'Mehta', 'Kapoor', 'Smith', 'Garcia', 'Wang', 'Khan', 'Rossi',
+)
+STREETS = ('MG Road', 'Park Street', 'Lake View', 'Hill Road', 'Church Street', 'Station Road', 'Ring Road', 'Main Street')
+AREAS = ('Indiranagar', 'Koramangala', 'Whitefield', 'Bandra', 'Andheri', 'Powai', 'Salt Lake', 'Banjara Hills')
+EMPLOYERS = ('Infosys', 'TCS', 'Wipro', 'Accenture', 'HDFC Bank', 'Self-employed', 'Student', 'Government')
+
+# Expected rows per occupied month (rent, payment, maintenance on 60% of
+# tenancies, utilities, misc), used to size tenancies for the transaction target
+ROWS_PER_MONTH = 1.0 + 0.97 + 0.6 + 0.35 + 0.10 + 0.05 + 0.02
+
+DEFAULT_BATCH_SIZE = 20000
+
+
+ROW_COLUMNS = {
+    'property': ('id', 'address', 'rent', 'maintenance'),
+    'tenant': (
+        'id', 'name', 'property_id', 'passport', 'passport_validity', 'aadhar_no', 'employment_details',
+        'permanent_address', 'contact_no', 'emergency_contact_no', 'rent', 'security', 'move_in_date',
+        'contract_start_date', 'contract_expiry_date',
+    ),
+    'transaction': (
+        'property_id', 'tenant_id', 'type', 'for_month', 'amount', 'transaction_date', 'comments', 'period_month',
+    ),
+}
+AUDIT_COLUMNS = ('created_date', 'created_by', 'last_updated', 'last_updated_by')
+ROW_COLUMNS = {name: columns + AUDIT_COLUMNS for name, columns in ROW_COLUMNS.items()}
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _day(month_index, day=1):
+    """ISO date string for a day of a month given as year * 12 + month - 1."""
+    return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}-{day:02d}"
+
+
+def _audit(created):
+    return {'created_date': created, 'created_by': 'synthetic', 'last_updated': created, 'last_updated_by': 'synthetic'}
+
+
+class Generator:
+    """Produce property, tenant and transaction rows as dicts with every known column."""
+
+    def __init__(self, n_properties, n_tenants, n_transactions, seed=42, today=None):
+        self.rng = random.Random(seed)
+        self.n_properties = n_properties
+        self.n_tenants = n_tenants
+        self.n_transactions = n_transactions
+        self.today = today or date.today()
+        self.current_month = _month_index(self.today)
+
+    def properties(self, first_id=1):
+        rng = self.rng
+        self.base_rents = {}
+        for offset in range(self.n_properties):
+            property_id = first_id + offset
+            rent = round(rng.lognormvariate(math.log(22000), 0.45) / 500) * 500 or 500
+            maintenance = round(rent * rng.choice((0, 0.04, 0.05, 0.08)) / 50) * 50
+            self.base_rents[property_id] = rent
+            yield dict(
+                id=property_id,
+                address=f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(AREAS)} #{property_id}",
+                rent=float(rent),
+                maintenance=float(maintenance),
+                **_audit(f"{self.today.year - 15}-01-01 00:00:00"),
+            )
+
+    def _tenancies(self):
+        """Return (property_id, start_month, end_month) tenancies walking back from today.
+
+        Durations are drawn first and then scaled so the expected number of
+        transactions matches the target.
+        """
+        rng = self.rng
+        property_ids = list(self.base_rents)
+        per_property = [self.n_tenants // len(property_ids)] * len(property_ids)
+        for i in rng.sample(range(len(property_ids)), self.n_tenants % len(property_ids)):
+            per_property[i] += 1
+        # Contract lengths in 11-month terms, with a long tail of renewals
+        durations = [[11 * (1 + int(rng.expovariate(1.0))) for _ in range(count)] for count in per_property]
+        drawn = sum(map(sum, durations)) or 1
+        wanted = max(self.n_transactions - 2 * self.n_tenants, 0) / ROWS_PER_MONTH * 1.02
+        scale = wanted / drawn
+
+        tenancies = []
+        for property_id, months_list in zip(property_ids, durations):
+            # About 8% of properties are vacant right now
+            end = self.current_month - (rng.randint(1, 3) if rng.random() < 0.08 else 0)
+            timeline = []
+            for months in months_list:
+                start = end - max(1, round(months * scale)) + 1
+                timeline.append((property_id, start, end))
+                end = start - 1 - int(rng.expovariate(1 / 1.5))
+            tenancies.extend(reversed(timeline))
+        return tenancies
+
+    def tenants_and_transactions(self, first_tenant_id=1):
+        """Yield ('tenant', row) and ('transaction', row) pairs; transactions stop at the target."""
+        rng = self.rng
+        emitted = 0
+        for tenant_id, (property_id, start, end) in enumerate(self._tenancies(), first_tenant_id):
+            years_ago = (self.current_month - start) / 12
+            rent = round(self.base_rents[property_id] / (1.05 ** years_ago) / 100) * 100
+            security = rent * 2
+            # Contracts run in 11-month terms; the current one may expire in the future
+            terms = math.ceil((end - start + 1) / 11)
+            yield 'tenant', dict(
+                id=tenant_id,
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                property_id=property_id,
+                passport=f"{rng.choice('JKLMNPRSTUVZ')}{rng.randint(1000000, 9999999)}",
+                passport_validity=_day(start + rng.randint(12, 120), rng.randint(1, 28)),
+                aadhar_no=f"{rng.randint(2000, 9999)} {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+                employment_details=rng.choice(EMPLOYERS),
+                permanent_address=f"{rng.randint(1, 500)} {rng.choice(STREETS)}, {rng.choice(AREAS)}",
+                contact_no=f"+91 9{rng.randint(100000000, 999999999)}",
+                emergency_contact_no=f"+91 8{rng.randint(100000000, 999999999)}",
+                rent=float(rent),
+                security=float(security),
+                move_in_date=_day(start),
+                contract_start_date=_day(start),
+                contract_expiry_date=_day(start + terms * 11 - 1, 28),
+                **_audit(f"{_day(start)} 09:00:00"),
+            )
+            if emitted >= self.n_transactions:
+                continue
+            for row in self._ledger_rows(tenant_id, property_id, start, min(end, self.current_month), rent, security):
+                yield 'transaction', row
+                emitted += 1
+                if emitted >= self.n_transactions:
+                    break
+
+    def _ledger_rows(self, tenant_id, property_id, start, end, rent, security):
+        rng = self.rng
+        maintenance = self.base_rents[property_id] * 0.05 if rng.random() < 0.6 else 0.0
+
+        def row(kind, amount, month, day, comments=None):
+            paid = _day(month, day)
+            return dict(
+                property_id=property_id, tenant_id=tenant_id, type=kind,
+                for_month=f"{MONTH_NAMES[month % 12]} {month // 12}", amount=round(amount, 2),
+                transaction_date=paid, comments=comments, period_month=_day(month),
+                **_audit(f"{paid} 10:00:00"),
+            )
+
+        yield row('security', security, start, 1, 'Security deposit')
+        yield row('payment_received', security, start, 1, 'Security deposit')
+        for month in range(start, end + 1):
+            if month > start and (month - start) % 12 == 0:
+                rent = round(rent * 1.05 / 100) * 100
+            yield row('rent', rent, month, 1)
+            roll = rng.random()
+            if roll < 0.90:
+                yield row('payment_received', rent, month, min(28, 1 + int(rng.expovariate(1 / 4))))
+            elif roll < 0.95:
+                yield row('payment_received', rent, month, rng.randint(15, 28), 'Late payment')
+            elif roll < 0.97:
+                yield row('payment_received', rent * rng.uniform(0.5, 0.9), month, rng.randint(5, 28), 'Partial payment')
+            if maintenance:
+                yield row('maintenance', maintenance, month, 5)
+            if rng.random() < 0.35:
+                yield row('electricity', rng.lognormvariate(math.log(1800), 0.5), month, rng.randint(10, 20))
+            if rng.random() < 0.10:
+                yield row('water', rng.uniform(200, 900), month, rng.randint(10, 20))
+            if rng.random() < 0.05:
+                yield row('gas', rng.uniform(500, 1500), month, rng.randint(10, 20))
+            if rng.random() < 0.02:
+                yield row('misc', rng.uniform(500, 5000), month, rng.randint(1, 28), 'Repairs')
+
+
+class BulkWriter:
+    """Buffer rows per table and insert them with driver-level executemany.
+
+    Only the columns the target table actually has are written, so the same
+    rows load into either schema; amounts go into integer money columns as
+    minor units.
+    """
+
+    def __init__(self, connection, tables, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.progress = progress
+        dialect = connection.dialect
+        placeholder = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}.get(dialect.paramstyle, '?')
+        quote = dialect.identifier_preparer.quote
+        self.getters = {}
+        self.scaled = {}
+        self.statements = {}
+        for name, table in tables.items():
+            columns = [column.name for column in table.columns if column.name in ROW_COLUMNS[name]]
+            self.getters[name] = itemgetter(*columns)
+            self.scaled[name] = [
+                i for i, column in enumerate(columns)
+                if column in money.COLUMNS[name] and isinstance(table.c[column].type, Integer)
+            ]
+            self.statements[name] = (
+                f"INSERT INTO {quote(name)} ({', '.join(quote(c) for c in columns)}) "
+                f"VALUES ({', '.join([placeholder] * len(columns))})"
+            )
+        self.buffers = {name: [] for name in tables}
+        self.counts = {name: 0 for name in tables}
+
+    def add(self, table_name, row):
+        buffer = self.buffers[table_name]
+        values = self.getters[table_name](row)
+        if self.scaled[table_name]:
+            values = list(values)
+            for i in self.scaled[table_name]:
+                values[i] = money.to_minor(values[i])
+            values = tuple(values)
+        buffer.append(values)
+        if len(buffer) >= self.batch_size:
+            self.flush(table_name)
+
+    def flush(self, table_name=None):
+        for name in ([table_name] if table_name else list(self.buffers)):
+            buffer = self.buffers[name]
+            if buffer:
+                self.connection.exec_driver_sql(self.statements[name], buffer)
+                self.counts[name] += len(buffer)
+                self.buffers[name] = []
+                if self.progress:
+                    self.progress(self.counts)
+
+
+def _max_id(connection, table):
+    return connection.execute(select(func.max(table.c.id))).scalar() or 0
+
+
+def prepare_database(engine):
+    """Create the modular schema unless the core tables already exist; return reflected tables."""
+    existing = set(inspect(engine).get_table_names())
+    if not {'property', 'tenant', 'transaction'} <= existing:
+        from fastapi_backend.models import Base
+        bootstrap(engine, Base.metadata)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    return metadata.tables
+
+
+def fast_sqlite_pragmas(engine):
+    """Trade durability for speed on SQLite connections used for bulk loading."""
+    if engine.url.get_backend_name() != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA journal_mode=MEMORY')
+        cursor.execute('PRAGMA cache_size=-200000')
+        cursor.close()
+
+
+def generate(database_uri, n_properties, n_tenants, n_transactions, seed=42,
+             batch_size=DEFAULT_BATCH_SIZE, append=False, progress=None):
+    """Fill ``database_uri`` with synthetic data and return the row counts inserted."""
+    engine = create_engine(database_uri)
+    fast_sqlite_pragmas(engine)
+    tables = prepare_database(engine)
+    core = {name: tables[name] for name in ('property', 'tenant', 'transaction')}
+    generator = Generator(n_properties, n_tenants, n_transactions, seed)
+
+    with engine.begin() as conn:
+        if not append and any(_max_id(conn, table) for table in core.values()):
+            raise SystemExit('Target database already has data; pass --append to add to it')
+        writer = BulkWriter(conn, core, batch_size, progress)
+        for row in generator.properties(_max_id(conn, core['property']) + 1):
+            writer.add('property', row)
+        writer.flush('property')
+        first_tenant = _max_id(conn, core['tenant']) + 1
+        for table_name, row in generator.tenants_and_transactions(first_tenant):
+            writer.add(table_name, row)
+        writer.flush()
+
+        if 'ledger_month_balance' in tables:
+            ledger.rebuild(conn)
+    engine.dispose()
+    return writer.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic tenant management dataset")
+    parser.add_argument('--database-uri', required=True, help="SQLAlchemy URL of the database to fill")
+    parser.add_argument('--properties', type=int, default=10000)
+    parser.add_argument('--tenants', type=int, default=50000)
+    parser.add_argument('--transactions', type=int, default=5000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--append', action='store_true', help="Add to a database that already has rows")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+
+    def progress(counts):
+        if counts['transaction'] and counts['transaction'] % (args.batch_size * 25) == 0:
+            elapsed = time.perf_counter() - started
+            print(f"  {counts['transaction']:,} transactions ({elapsed:.0f}s)", file=sys.stderr)
+
+    counts = generate(
+        args.database_uri, args.properties, args.tenants, args.transactions,
+        args.seed, args.batch_size, args.append, progress,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {counts['property']:,} properties, {counts['tenant']:,} tenants and "
+          f"{counts['transaction']:,} transactions in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Shared helpers used by both the Flask and FastAPI backends
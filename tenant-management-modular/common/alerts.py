@@ -0,0 +1,133 @@
+"""Contract and passport expiry alerts backed by indexed date range queries."""
+
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+# Days-before-expiry thresholds; 0 means the document has already expired
+THRESHOLDS = (90, 60, 30, 7, 0)
+
+EXPIRY_COLUMNS = {
+    'contract': 'contract_expiry_date',
+    'passport': 'passport_validity',
+}
+
+# One range query per column so each can use its own index
+_EXPIRING_SQL = """
+    SELECT tenant.id AS tenant_id, tenant.name AS tenant_name, property.address AS property_address,
+           '{kind}' AS kind, tenant.{column} AS expiry_date
+    FROM tenant
+    LEFT JOIN property ON property.id = tenant.property_id
+    WHERE tenant.{column} >= :start AND tenant.{column} <= :end
+"""
+
+_INSERT_ALERT = text("""
+    INSERT INTO expiry_alert (tenant_id, kind, expiry_date, threshold_days, created_date, acknowledged)
+    VALUES (:tenant_id, :kind, :expiry_date, :threshold_days, :created_date, :acknowledged)
+    ON CONFLICT (tenant_id, kind, expiry_date, threshold_days) DO NOTHING
+""")
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def expiring(connection, within_days=30, today=None, include_expired_days=0):
+    """List contracts and passports expiring within ``within_days`` of today.
+
+    ``include_expired_days`` widens the window backwards to also return
+    documents that expired recently.
+    """
+    today = today or date.today()
+    params = {
+        'start': (today - timedelta(days=include_expired_days)).isoformat(),
+        'end': (today + timedelta(days=within_days)).isoformat(),
+    }
+    sql = ' UNION ALL '.join(
+        _EXPIRING_SQL.format(kind=kind, column=column) for kind, column in EXPIRY_COLUMNS.items()
+    )
+    items = []
+    for row in connection.execute(text(sql), params):
+        expiry = _as_date(row.expiry_date)
+        items.append({
+            'tenant_id': row.tenant_id,
+            'tenant_name': row.tenant_name,
+            'property_address': row.property_address or 'N/A',
+            'kind': row.kind,
+            'expiry_date': expiry.isoformat(),
+            'days_left': (expiry - today).days,
+        })
+    items.sort(key=lambda item: (item['days_left'], item['tenant_id'], item['kind']))
+    return items
+
+
+def crossed_threshold(days_left):
+    """Return the tightest threshold already crossed, or None if none is."""
+    crossed = [threshold for threshold in THRESHOLDS if days_left <= threshold]
+    return min(crossed) if crossed else None
+
+
+def scan(connection, today=None, lookback_days=365):
+    """Record an alert for every threshold newly crossed since the last scan.
+
+    Only the tightest crossed threshold is written per document, and the
+    unique key on (tenant, kind, expiry date, threshold) makes re-runs
+    no-ops; renewing a contract changes the expiry date and starts afresh.
+    Returns the alerts inserted by this run.
+    """
+    today = today or date.today()
+    created = datetime.now(timezone.utc).replace(tzinfo=None)
+    inserted = []
+    for item in expiring(connection, max(THRESHOLDS), today, include_expired_days=lookback_days):
+        threshold = crossed_threshold(item['days_left'])
+        if threshold is None:
+            continue
+        result = connection.execute(_INSERT_ALERT, {
+            'tenant_id': item['tenant_id'],
+            'kind': item['kind'],
+            'expiry_date': item['expiry_date'],
+            'threshold_days': threshold,
+            'created_date': created.isoformat(sep=' '),
+            'acknowledged': False,
+        })
+        if result.rowcount:
+            inserted.append(dict(item, threshold_days=threshold))
+    return inserted
+
+
+def list_alerts(connection, include_acknowledged=False):
+    """Return stored alerts, newest first."""
+    sql = """
+        SELECT expiry_alert.id, expiry_alert.tenant_id, tenant.name AS tenant_name, expiry_alert.kind,
+               expiry_alert.expiry_date, expiry_alert.threshold_days, expiry_alert.created_date,
+               expiry_alert.acknowledged
+        FROM expiry_alert
+        LEFT JOIN tenant ON tenant.id = expiry_alert.tenant_id
+    """
+    if not include_acknowledged:
+        sql += ' WHERE expiry_alert.acknowledged = :false'
+    sql += ' ORDER BY expiry_alert.created_date DESC, expiry_alert.id DESC'
+    return [
+        {
+            'id': row.id,
+            'tenant_id': row.tenant_id,
+            'tenant_name': row.tenant_name,
+            'kind': row.kind,
+            'expiry_date': _as_date(row.expiry_date).isoformat(),
+            'threshold_days': row.threshold_days,
+            'created_date': str(row.created_date),
+            'acknowledged': bool(row.acknowledged),
+        }
+        for row in connection.execute(text(sql), {'false': False})
+    ]
+
+
+def acknowledge(connection, alert_id):
+    """Mark an alert as handled; returns False when it does not exist."""
+    result = connection.execute(
+        text('UPDATE expiry_alert SET acknowledged = :true WHERE id = :id'),
+        {'true': True, 'id': alert_id},
+    )
+    return bool(result.rowcount)
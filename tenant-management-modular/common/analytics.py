@@ -0,0 +1,246 @@
+"""Vectorized portfolio analytics over columnar snapshots of the database.
+
+Each report pulls the columns it needs in one bulk query, converts them to
+NumPy arrays and aggregates with ``bincount`` over dense (property, month)
+indices instead of looping over rows in Python. Amounts stay in integer
+minor units until the payload is built.
+"""
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import text
+
+from . import partitions
+from .money import MINOR_UNITS
+
+PAYMENT_TYPE = 'payment_received'
+RENT_TYPE = 'rent'
+
+
+def _month_index(values):
+    """Convert dates (or ISO strings) to months since 1970-01 as int64; None becomes NaT."""
+    return np.array(values, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _fetch(connection, sql, params=None):
+    """Run a query and return plain DBAPI tuples, skipping per-row Row objects."""
+    result = connection.execute(text(sql), params or {})
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+
+def _month_label(index):
+    return str(np.datetime64(int(index), 'M'))
+
+
+def _parse_month(value):
+    """Accept 'YYYY-MM' or a date and return its month index."""
+    if isinstance(value, date):
+        value = value.isoformat()[:7]
+    return int(np.datetime64(value, 'M').astype(np.int64))
+
+
+def _month_start(index):
+    return str(np.datetime64(int(index), 'M').astype('datetime64[D]'))
+
+
+def _bounds(start, end):
+    """Month indexes of the requested window; None where it is open."""
+    return (
+        None if start is None else _parse_month(start),
+        None if end is None else _parse_month(end),
+    )
+
+
+def _month_range(start, end, observed):
+    """Resolve the inclusive month window, defaulting to the observed data range."""
+    valid = observed[observed != np.iinfo(np.int64).min]
+    if start is None:
+        start = int(valid.min()) if valid.size else _parse_month(date.today())
+    else:
+        start = _parse_month(start)
+    if end is None:
+        end = int(valid.max()) if valid.size else start
+    else:
+        end = _parse_month(end)
+    if end < start:
+        raise ValueError('end must not be before start')
+    return start, end
+
+
+def load_properties(connection):
+    """Return (ids, addresses, rents in minor units) arrays ordered by property id."""
+    rows = _fetch(connection, 'SELECT id, address, rent FROM property ORDER BY id')
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    addresses = [r[1] for r in rows]
+    rents = np.array([r[2] or 0 for r in rows], dtype=np.int64)
+    return ids, addresses, rents
+
+
+def load_transactions(connection, types=None, start=None, end=None):
+    """Fetch property, month and amount (minor units) columns for transactions in one query.
+
+    ``start`` and ``end`` are month indexes bounding ``period_month``; only the
+    year partitions and archive that hold months in that window are read.
+    """
+    conditions = []
+    params = {}
+    if types:
+        conditions.append('type IN (' + ', '.join(f':t{i}' for i in range(len(types))) + ')')
+        params.update({f't{i}': t for i, t in enumerate(types)})
+    if start is not None:
+        conditions.append('period_month >= :start')
+        params['start'] = _month_start(start)
+    if end is not None:
+        conditions.append('period_month < :end')
+        params['end'] = _month_start(end + 1)
+    source = partitions.source(connection, params.get('start'), params.get('end'), 'period_month')
+    sql = 'SELECT property_id, period_month, amount FROM ' + source
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    rows = _fetch(connection, sql, params)
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64)
+    property_ids, months, amounts = zip(*rows)
+    return (
+        np.fromiter(property_ids, dtype=np.int64, count=len(rows)),
+        _month_index(months),
+        np.fromiter(amounts, dtype=np.int64, count=len(rows)),
+    )
+
+
+def grouped_monthly_sum(property_index, months, amounts, n_properties, start, end):
+    """Sum amounts into an (n_properties, n_months) grid with a single bincount."""
+    n_months = end - start + 1
+    mask = (months >= start) & (months <= end) & (property_index >= 0)
+    cells = property_index[mask] * n_months + (months[mask] - start)
+    # bincount sums in float64, which is exact for integer totals below 2**53
+    grid = np.bincount(cells, weights=amounts[mask], minlength=n_properties * n_months)
+    return grid.reshape(n_properties, n_months)
+
+
+def _dense_index(ids, values):
+    """Map raw ids to positions in the sorted ``ids`` array (-1 when unknown)."""
+    if not ids.size:
+        return np.full(values.shape, -1, dtype=np.int64)
+    positions = np.searchsorted(ids, values)
+    positions = np.clip(positions, 0, ids.size - 1)
+    return np.where(ids[positions] == values, positions, -1)
+
+
+def _major(value):
+    return round(float(value) / MINOR_UNITS, 2)
+
+
+def _series_payload(start, end, ids, addresses, grid):
+    return {
+        'months': [_month_label(m) for m in range(start, end + 1)],
+        'series': [
+            {'property_id': int(pid), 'address': address, 'values': np.round(values / MINOR_UNITS, 2).tolist()}
+            for pid, address, values in zip(ids, addresses, grid)
+        ],
+        'total': np.round(grid.sum(axis=0) / MINOR_UNITS, 2).tolist(),
+    }
+
+
+def monthly_collections(connection, start=None, end=None):
+    """Payments received per property per month."""
+    ids, addresses, _ = load_properties(connection)
+    property_ids, months, amounts = load_transactions(connection, [PAYMENT_TYPE], *_bounds(start, end))
+    start, end = _month_range(start, end, months)
+    grid = grouped_monthly_sum(_dense_index(ids, property_ids), months, amounts, ids.size, start, end)
+    return _series_payload(start, end, ids, addresses, grid)
+
+
+def rent_roll(connection, start=None, end=None):
+    """Rent billed and payments collected per property against ``Property.rent``."""
+    ids, addresses, rents = load_properties(connection)
+    bounds = _bounds(start, end)
+    property_ids, months, amounts = load_transactions(connection, [RENT_TYPE], *bounds)
+    pay_property_ids, pay_months, pay_amounts = load_transactions(connection, [PAYMENT_TYPE], *bounds)
+    start, end = _month_range(start, end, np.concatenate([months, pay_months]))
+    n_months = end - start + 1
+
+    billed = grouped_monthly_sum(_dense_index(ids, property_ids), months, amounts, ids.size, start, end)
+    collected = grouped_monthly_sum(
+        _dense_index(ids, pay_property_ids), pay_months, pay_amounts, ids.size, start, end
+    )
+    expected = rents * n_months
+    billed_total = billed.sum(axis=1)
+    collected_total = collected.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        billing_ratio = np.where(expected > 0, billed_total / expected, np.nan)
+        collection_rate = np.where(billed_total > 0, collected_total / billed_total, np.nan)
+
+    def _ratio(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    return {
+        'start': _month_label(start),
+        'end': _month_label(end),
+        'months': n_months,
+        'properties': [
+            {
+                'property_id': int(ids[i]),
+                'address': addresses[i],
+                'listed_rent': _major(rents[i]),
+                'expected_rent': _major(expected[i]),
+                'billed_rent': _major(billed_total[i]),
+                'average_monthly_rent': _major(billed_total[i] / n_months),
+                'collected': _major(collected_total[i]),
+                'billing_ratio': _ratio(billing_ratio[i]),
+                'collection_rate': _ratio(collection_rate[i]),
+            }
+            for i in range(ids.size)
+        ],
+    }
+
+
+def occupancy(connection, start=None, end=None):
+    """Occupied properties per month from tenant move-in and contract expiry dates."""
+    ids, _, _ = load_properties(connection)
+    rows = _fetch(
+        connection,
+        'SELECT property_id, COALESCE(move_in_date, contract_start_date), contract_expiry_date '
+        'FROM tenant WHERE property_id IS NOT NULL',
+    )
+    if rows:
+        property_ids, move_ins, expiries = zip(*rows)
+        tenant_property = _dense_index(ids, np.array(property_ids, dtype=np.int64))
+        occupied_from = _month_index(move_ins)
+        occupied_to = _month_index(expiries)
+    else:
+        tenant_property = occupied_from = occupied_to = np.empty(0, np.int64)
+
+    nat = np.iinfo(np.int64).min
+    start, end = _month_range(start, end, occupied_from)
+    n_months = end - start + 1
+
+    # Tenants without a move-in date are treated as occupying from the window start,
+    # open-ended contracts as running past its end.
+    first = np.where(occupied_from == nat, start, occupied_from)
+    last = np.where(occupied_to == nat, end, occupied_to)
+    keep = (tenant_property >= 0) & (first <= end) & (last >= start) & (first <= last)
+    first = np.clip(first[keep], start, end) - start
+    last = np.clip(last[keep], start, end) - start
+    rows_index = tenant_property[keep]
+
+    # Difference array per property: +1 at move-in month, -1 after the last month
+    width = n_months + 1
+    diff = np.zeros(ids.size * width, dtype=np.int64)
+    np.add.at(diff, rows_index * width + first, 1)
+    np.add.at(diff, rows_index * width + last + 1, -1)
+    tenants_per_property = diff.reshape(ids.size, width)[:, :n_months].cumsum(axis=1)
+
+    occupied = (tenants_per_property > 0).sum(axis=0)
+    total = int(ids.size)
+    return {
+        'months': [_month_label(m) for m in range(start, end + 1)],
+        'total_properties': total,
+        'occupied': occupied.tolist(),
+        'tenants': tenants_per_property.sum(axis=0).tolist(),
+        'occupancy_rate': [round(o / total, 4) if total else None for o in occupied.tolist()],
+    }
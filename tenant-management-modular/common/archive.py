@@ -0,0 +1,222 @@
+"""Cold storage for transactions of closed years in a separate SQLite file.
+
+``archive_transactions()`` moves transactions dated before a cutoff out of the
+main database into an archive file, ATTACHed as ``archive`` on the archiving
+connection, in committed batches. The main database records where the
+archive lives and which dates it covers in ``transaction_archive``, so the
+live ``transaction`` table (and every scan, count and export over it) only
+holds recent years.
+
+Readers take the FROM clause of a transaction query from
+``partitions.source()``. It adds the archive only when the requested range
+reaches into the archived dates (``covers()``); only then is the archive
+attached on that connection. Ledger balances are all-time totals kept up to
+date on every write, so they already include archived rows;
+``ledger.verify()`` and ``rebuild()`` read the archive too, and so do the
+transaction lists, ledgers and exports (``partitions.load()``). Archived
+transactions are read-only: they cannot be edited or deleted through the
+ORM models or the CRUD endpoints.
+"""
+
+import os
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, text
+
+SCHEMA = 'archive'
+DEFAULT_BATCH_SIZE = 5000
+TABLE = '"transaction"'
+
+archive_state = Table(
+    'transaction_archive', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('path', String(500), nullable=False),
+    Column('cutoff', Date, nullable=False),
+    Column('first_transaction_date', Date),
+    Column('last_transaction_date', Date),
+    Column('last_period_month', Date),
+    Column('row_count', Integer, nullable=False, default=0),
+    Column('archived_at', DateTime, nullable=False),
+)
+
+_INDEX_HEAD = re.compile(r'^CREATE (UNIQUE )?INDEX\s+("[^"]+"|\w+)\s+ON\s+("[^"]+"|\w+)', re.I)
+
+
+def default_path(database_path):
+    """Archive file next to the main database: ``app.db`` -> ``app-archive.db``."""
+    root, ext = os.path.splitext(database_path)
+    return f'{root}-archive{ext or ".db"}'
+
+
+def is_sqlite(connection):
+    # Sessions do not expose the dialect directly
+    bind = connection.get_bind() if hasattr(connection, 'get_bind') else connection
+    return bind.dialect.name == 'sqlite'
+
+
+def has_table(connection, name):
+    return connection.execute(
+        text("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = :name"), {'name': name},
+    ).first() is not None
+
+
+def get_state(connection):
+    """Return the ``transaction_archive`` row, or None when nothing was ever archived."""
+    if not is_sqlite(connection) or not has_table(connection, 'transaction_archive'):
+        return None
+    return connection.execute(archive_state.select()).first()
+
+
+def attach(connection, path):
+    """ATTACH the archive file as ``archive`` unless this connection already has it."""
+    attached = {row[1] for row in connection.execute(text('PRAGMA database_list'))}
+    if SCHEMA not in attached:
+        connection.execute(text(f'ATTACH DATABASE :path AS {SCHEMA}'), {'path': path})
+
+
+def as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def covers(state, start=None, end=None, column='transaction_date'):
+    """Whether rows with ``start <= column < end`` (open where None) may be archived."""
+    if state is None or not state.row_count:
+        return False
+    last = state.last_period_month if column == 'period_month' else state.last_transaction_date
+    if start is not None and (last is None or as_date(start) > as_date(last)):
+        return False
+    # Charges can be entered long after the month they apply to, so the archived
+    # period months have no lower bound worth pruning on
+    if end is not None and column == 'transaction_date' and as_date(end) <= as_date(state.first_transaction_date):
+        return False
+    return True
+
+
+def columns(connection, table, schema='main'):
+    """Column names of ``schema.table`` in order (empty when it does not exist)."""
+    return [row[1] for row in connection.execute(text(f'PRAGMA {schema}.table_info({table})'))]
+
+
+def select_list(live, present):
+    """Select the ``live`` columns from a copy that has ``present``; missing ones read as NULL."""
+    present = set(present)
+    return ', '.join(name if name in present else f'NULL AS {name}' for name in live)
+
+
+def copy_definition(connection, table, schema='main', index_suffix=''):
+    """Create ``schema.table`` like the live transaction table, or add the columns it lacks.
+
+    The live table's indexes are recreated on a new copy, with ``index_suffix``
+    appended to their names so copies in the main schema do not clash.
+    """
+    existing = columns(connection, table, schema)
+    if existing:
+        for row in connection.execute(text(f'PRAGMA main.table_info({TABLE})')).fetchall():
+            if row[1] not in existing:
+                connection.exec_driver_sql(f'ALTER TABLE {schema}.{table} ADD COLUMN {row[1]} {row[2]}')
+        return
+    rows = connection.execute(text(
+        "SELECT type, name, sql FROM main.sqlite_master WHERE tbl_name = 'transaction' AND sql IS NOT NULL "
+        "AND type IN ('table', 'index')"
+    )).fetchall()
+    for row in sorted(rows, key=lambda row: row.type != 'table'):
+        if row.type == 'table':
+            sql = re.sub(r'^CREATE TABLE\s+("[^"]+"|\w+)', f'CREATE TABLE {schema}.{table}', row.sql, count=1)
+        else:
+            name = f'"{row.name}{index_suffix}"'
+            sql = _INDEX_HEAD.sub(lambda m: f'CREATE {m[1] or ""}INDEX {schema}.{name} ON {table}', row.sql, count=1)
+        connection.exec_driver_sql(sql)
+
+
+def move_rows(connection, source, targets, params=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Move rows of ``main.source`` into other tables in committed batches of ids.
+
+    ``targets`` maps ``(schema, table)`` to the SQL condition selecting the
+    rows that belong there. Each batch copies the matching rows, deletes them
+    from the source and commits, so the apps keep writing while a large
+    history moves. The live table keeps its row with the highest id, so
+    SQLite never hands that id out again to a new transaction. Returns the
+    number of rows moved.
+    """
+    last_id = connection.execute(text(f'SELECT MAX(id) FROM main.{source}')).scalar() or 0
+    ceiling = last_id if source == TABLE else last_id + 1
+    copies = {target: ', '.join(columns(connection, target[1], target[0])) for target in targets}
+    moving = ' OR '.join(f'({condition})' for condition in targets.values())
+    moved = 0
+    low = 0
+    while low < ceiling - 1:
+        high = connection.execute(text(
+            f'SELECT MAX(id) FROM (SELECT id FROM main.{source} WHERE id > :low AND id < :ceiling '
+            f'ORDER BY id LIMIT :limit)'
+        ), {'low': low, 'ceiling': ceiling, 'limit': batch_size}).scalar()
+        if high is None:
+            break
+        batch = dict(params or {}, low=low, high=high)
+        for (schema, table), condition in targets.items():
+            listed = copies[(schema, table)]
+            # OR REPLACE: rows copied by an interrupted run are still in the source
+            connection.execute(text(
+                f'INSERT OR REPLACE INTO {schema}.{table} ({listed}) SELECT {listed} FROM main.{source} '
+                f'WHERE id > :low AND id <= :high AND ({condition})'
+            ), batch)
+        moved += connection.execute(
+            text(f'DELETE FROM main.{source} WHERE id > :low AND id <= :high AND ({moving})'), batch,
+        ).rowcount
+        connection.commit()
+        low = high
+        if progress:
+            progress(moved)
+    return moved
+
+
+def archive_transactions(engine, path, before, sources=(TABLE,), batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Move transactions dated before ``before`` from ``sources`` into the archive file at ``path``.
+
+    ``sources`` are the main tables holding transactions: the live table and,
+    once the database is partitioned, the year tables. Re-running with the
+    same or an earlier cutoff is a no-op; a later cutoff archives the next
+    rows into the same file. Returns the updated ``transaction_archive`` row.
+    """
+    if engine.dialect.name != 'sqlite':
+        raise ValueError('Archiving is only supported for SQLite databases')
+    path = os.path.abspath(path)
+    with engine.connect() as conn:
+        archive_state.create(conn, checkfirst=True)
+        state = get_state(conn)
+        if state is not None and os.path.abspath(state.path) != path:
+            raise ValueError(f'Transactions are already archived in {state.path}')
+        if state is not None:
+            before = max(before, as_date(state.cutoff))
+        attach(conn, path)
+        copy_definition(conn, TABLE, SCHEMA)
+        conn.commit()
+
+        moved = 0
+        for source in sources:
+            done = moved
+            moved += move_rows(
+                conn, source, {(SCHEMA, TABLE): 'transaction_date < :before'}, {'before': before.isoformat()},
+                batch_size, progress and (lambda count: progress(done + count)),
+            )
+
+        summary = conn.execute(text(
+            f'SELECT MIN(transaction_date), MAX(transaction_date), MAX(period_month), COUNT(*) FROM {SCHEMA}.{TABLE}'
+        )).first()
+        values = {
+            'path': path,
+            'cutoff': before,
+            'first_transaction_date': as_date(summary[0]),
+            'last_transaction_date': as_date(summary[1]),
+            'last_period_month': as_date(summary[2]),
+            'row_count': summary[3],
+            'archived_at': datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        if state is None:
+            conn.execute(archive_state.insert().values(id=1, **values))
+        else:
+            conn.execute(archive_state.update().where(archive_state.c.id == 1).values(**values))
+        conn.commit()
+        return get_state(conn)
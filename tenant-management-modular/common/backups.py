@@ -0,0 +1,60 @@
+"""Database backups for the ``/api/backup`` endpoints of both apps.
+
+SQLite databases are copied file for file (``.db``). PostgreSQL databases
+are written with ``pg_dump --format=custom`` (``.dump``), a consistent
+logical snapshot taken while the apps keep writing; restore one with
+``pg_restore --clean --no-owner -d <database> <file>``. ``pg_dump`` must be
+on the PATH, at the same or a newer major version than the server.
+"""
+
+import os
+import shutil
+import subprocess
+from datetime import datetime
+
+PG_DUMP = os.getenv('PG_DUMP', 'pg_dump')
+
+
+def backup_database(url, directory, name='app'):
+    """Back up the database at ``url`` into ``directory``; return ``(path, filename)``.
+
+    The file is named ``<name>_backup_<timestamp>`` with the extension of its
+    format. Raises ValueError for other databases, FileNotFoundError when a
+    SQLite file or ``pg_dump`` is missing and RuntimeError when ``pg_dump``
+    fails.
+    """
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backend = url.get_backend_name()
+    if backend == 'sqlite' and url.database:
+        if not os.path.exists(url.database):
+            raise FileNotFoundError(f'Database file not found at: {url.database}')
+        filename = f'{name}_backup_{timestamp}.db'
+        path = os.path.abspath(os.path.join(directory, filename))
+        shutil.copy2(url.database, path)
+    elif backend == 'postgresql':
+        filename = f'{name}_backup_{timestamp}.dump'
+        path = os.path.abspath(os.path.join(directory, filename))
+        _pg_dump(url, path)
+    else:
+        raise ValueError('Backup is only supported for SQLite and PostgreSQL databases')
+    return path, filename
+
+
+def _pg_dump(url, path):
+    # libpq reads the password from the environment, keeping it out of the process list
+    env = dict(os.environ)
+    if url.password:
+        env['PGPASSWORD'] = str(url.password)
+    dsn = url.set(drivername='postgresql', password=None).render_as_string(hide_password=False)
+    try:
+        result = subprocess.run(
+            [PG_DUMP, '--format=custom', '--no-owner', '--file', path, '--dbname', dsn],
+            env=env, capture_output=True, text=True,
+        )
+    except FileNotFoundError:
+        raise FileNotFoundError(f'{PG_DUMP} not found; install the PostgreSQL client tools') from None
+    if result.returncode != 0:
+        if os.path.exists(path):
+            os.remove(path)
+        raise RuntimeError(f'pg_dump failed: {result.stderr.strip()}')
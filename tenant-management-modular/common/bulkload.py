@@ -0,0 +1,346 @@
+"""Fast restore of SQL dumps and CSV report exports into an empty database.
+
+``Loader.load_dump()`` reads the output of SQLite's ``.dump`` (such as
+instance/output_file.sql). Instead of replaying one INSERT at a time it lets
+an in-memory SQLite connection parse each ``VALUES(...)`` list, so every
+literal the dump may contain (quoted strings, ``replace(..., char(10))``,
+blobs) comes back exactly, and writes the rows with driver-level executemany
+in batches. Tables the dump creates keep its definition; tables that already
+exist (and are empty) are filled by column name. ``Loader.load_csv()`` reads
+the tenants, properties and transactions CSV reports of either app and maps
+property addresses and tenant names back to ids.
+
+While loading, SQLite runs with ``journal_mode=OFF`` and ``synchronous=OFF``,
+secondary indexes, triggers and views are created only after the rows are
+in, and ``finish()`` ends with ``PRAGMA integrity_check`` and
+``foreign_key_check``. A load that fails part way leaves an unusable file:
+restore into a new, empty database and move it into place afterwards.
+
+On PostgreSQL the rows go to ``COPY ... FROM STDIN`` (see ``common.pgcopy``)
+instead of INSERTs, and ``finish()`` moves each loaded table's id sequence
+past the ids the rows brought along.
+
+Money columns that the target stores as integer minor units are converted
+when the source has major units: always for CSV reports, and for dumps whose
+own definition declares the column with a non-integer type.
+"""
+
+import csv
+import re
+import sqlite3
+import time
+
+from sqlalchemy import Integer, inspect, text
+
+from . import money, pgcopy
+
+DEFAULT_BATCH_SIZE = 20000
+
+_INSERT = re.compile(r'INSERT INTO\s+("(?:[^"]|"")+"|\w+)\s*(?:\(([^)]*)\))?\s*VALUES\s*', re.I)
+_CREATE_TABLE = re.compile(r'CREATE TABLE\s+(?:IF NOT EXISTS\s+)?("(?:[^"]|"")+"|\w+)', re.I)
+_DEFERRED = re.compile(r'CREATE\s+(?:UNIQUE\s+)?(?:INDEX|TRIGGER|VIEW)\b', re.I)
+# Dump bookkeeping that does not apply to a fresh load (or is managed here)
+_SKIPPED = re.compile(r'(PRAGMA|BEGIN|COMMIT|ANALYZE|DELETE FROM\s+"?sqlite_sequence"?)(?!\w)', re.I)
+_INTERNAL_TABLES = ('sqlite_sequence', 'sqlite_stat1', 'sqlite_stat4')
+
+# Report headers (both apps) -> column; None marks columns resolved to ids
+CSV_COLUMNS = {
+    'property': {
+        'ID': 'id', 'Address': 'address', 'Rent': 'rent', 'Maintenance': 'maintenance',
+        'Created Date': 'created_date',
+    },
+    'tenant': {
+        'ID': 'id', 'Name': 'name', 'Property Address': None, 'Passport': 'passport',
+        'Passport Validity': 'passport_validity', 'Aadhar No': 'aadhar_no',
+        'Employment Details': 'employment_details', 'Permanent Address': 'permanent_address',
+        'Contact No': 'contact_no', 'Emergency Contact No': 'emergency_contact_no', 'Rent': 'rent',
+        'Security': 'security', 'Move In Date': 'move_in_date', 'Contract Start Date': 'contract_start_date',
+        'Contract Expiry Date': 'contract_expiry_date', 'Created Date': 'created_date',
+    },
+    'transaction': {
+        'ID': 'id', 'Property Address': None, 'Tenant Name': None, 'Type': 'type', 'For Month': 'for_month',
+        'Amount': 'amount', 'Transaction Date': 'transaction_date', 'Comments': 'comments',
+    },
+}
+CSV_TABLE_ORDER = ('property', 'tenant', 'transaction')
+_INTEGER_COLUMNS = {'id', 'property_id', 'tenant_id'}
+_REAL_COLUMNS = {'rent', 'maintenance', 'security', 'amount'}
+_MISSING = ('', 'N/A')
+
+
+def _unquote(name):
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name
+
+
+def iter_statements(lines):
+    """Yield complete SQL statements from an iterable of lines."""
+    buffer = []
+    for line in lines:
+        # Fast path: dumps put almost every statement on a line of its own
+        if not buffer and line.endswith(';\n') and sqlite3.complete_statement(line):
+            yield line[:-1]
+            continue
+        buffer.append(line)
+        if line.rstrip().endswith(';'):
+            statement = ''.join(buffer)
+            if sqlite3.complete_statement(statement):
+                yield statement.strip()
+                buffer = []
+    if ''.join(buffer).strip():
+        raise ValueError("Dump ends inside an unterminated statement")
+
+
+def csv_table(header):
+    """Return the table a report CSV with this header row belongs to."""
+    for table, columns in CSV_COLUMNS.items():
+        if set(header) == set(columns):
+            return table
+    raise ValueError(f"Unrecognised CSV header: {', '.join(header)}")
+
+
+def _is_integer(declared):
+    return 'INT' in (declared or '').upper()
+
+
+def _scaled(row, positions):
+    row = list(row)
+    for i in positions:
+        row[i] = money.to_minor(row[i])
+    return tuple(row)
+
+
+def _convert(column, value):
+    if value in _MISSING:
+        return None
+    if column in _INTEGER_COLUMNS:
+        return int(value)
+    if column in _REAL_COLUMNS:
+        return float(value)
+    return value
+
+
+class Loader:
+    """Restore dumps and CSV exports on one connection, deferring indexes to ``finish()``."""
+
+    def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.progress = progress
+        self.connection = engine.connect()
+        self.sqlite = engine.dialect.name == 'sqlite'
+        self.copy = engine.dialect.name == 'postgresql'
+        dialect = self.connection.dialect
+        self.placeholder = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}.get(dialect.paramstyle, '?')
+        self.quote = dialect.identifier_preparer.quote
+        self.deferred = []
+        self.counts = {}
+        self.started = time.perf_counter()
+        self.parser = sqlite3.connect(':memory:')
+        if self.sqlite:
+            for pragma in ('foreign_keys=OFF', 'journal_mode=OFF', 'synchronous=OFF', 'cache_size=-200000'):
+                self.connection.exec_driver_sql(f'PRAGMA {pragma}')
+        self._prepared = set()
+
+    def close(self):
+        self.connection.close()
+        self.parser.close()
+
+    def _prepare(self, table):
+        """Check that ``table`` is empty and move its secondary indexes to the end of the load."""
+        if table in self._prepared:
+            return
+        self._prepared.add(table)
+        if self.connection.execute(text(f'SELECT 1 FROM {self.quote(table)} LIMIT 1')).first():
+            raise ValueError(f"Table {table} already has rows; restore into an empty database")
+        if self.sqlite:
+            indexes = self.connection.execute(
+                text("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table "
+                     "AND sql IS NOT NULL"),
+                {'table': table},
+            ).fetchall()
+            for name, sql in indexes:
+                self.connection.exec_driver_sql(f'DROP INDEX {self.quote(name)}')
+                self.deferred.append(sql)
+        self.connection.commit()
+
+    def _writer(self, table, columns, major_units):
+        """Return an INSERT (on PostgreSQL, COPY) statement, the positions of ``columns`` the
+        target has (None: all) and the positions in the written row to convert to minor units.
+
+        ``major_units`` names the source columns that hold amounts in major units.
+        """
+        target = {column['name']: column['type'] for column in inspect(self.connection).get_columns(table)}
+        keep = [i for i, column in enumerate(columns) if column in target]
+        listed = [self.quote(columns[i]) for i in keep]
+        if self.copy:
+            statement = pgcopy.copy_statement(self.quote(table), listed)
+        else:
+            statement = (
+                f"INSERT INTO {self.quote(table)} ({', '.join(listed)}) "
+                f"VALUES ({', '.join([self.placeholder] * len(keep))})"
+            )
+        scale = [
+            n for n, i in enumerate(keep)
+            if columns[i] in money.COLUMNS.get(table, ()) and columns[i] in major_units
+            and isinstance(target[columns[i]], Integer)
+        ]
+        return statement, (None if len(keep) == len(columns) else keep), scale
+
+    def _write(self, table, statement, rows=None):
+        """Insert ``rows`` with executemany (or COPY), or run ``statement`` as is when there are none."""
+        if rows is None:
+            count = self.connection.exec_driver_sql(statement).rowcount
+        elif rows:
+            if self.copy:
+                pgcopy.copy_from(self.connection, statement, rows)
+            else:
+                self.connection.exec_driver_sql(statement, rows)
+            count = len(rows)
+        else:
+            return
+        self.connection.commit()
+        self.counts[table] = self.counts.get(table, 0) + count
+        if self.progress:
+            self.progress(self.counts)
+
+    def load_dump(self, path):
+        """Load a SQLite ``.dump`` file, inserting its rows in batches.
+
+        When the target is SQLite and has every column of an INSERT, batches
+        of VALUES lists are sent as one multi-row INSERT, so SQLite parses each
+        row once; otherwise the in-memory parser turns them into parameters.
+        """
+        existing = set(inspect(self.connection).get_table_names())
+        layouts = {}
+        writers = {}
+        # VALUES lists of consecutive INSERTs sharing ``prefix`` (same table and columns)
+        pending = []
+        prefix = table = writer = None
+
+        def flush():
+            if pending:
+                statement, keep, scale = writer
+                values = ','.join(pending)
+                pending.clear()
+                if self.sqlite and keep is None and not scale:
+                    self._write(table, statement.split(' VALUES ', 1)[0] + ' VALUES ' + values)
+                    return
+                rows = self.parser.execute('VALUES ' + values).fetchall()
+                if keep is not None:
+                    rows = [tuple(row[i] for i in keep) for row in rows]
+                if scale:
+                    rows = [_scaled(row, scale) for row in rows]
+                self._write(table, statement, rows)
+
+        with open(path, encoding='utf-8') as f:
+            for statement in iter_statements(f):
+                if prefix and statement.startswith(prefix):
+                    pending.append(statement[len(prefix):].rstrip(';'))
+                    if len(pending) >= self.batch_size:
+                        flush()
+                    continue
+                flush()
+                insert = _INSERT.match(statement)
+                if insert:
+                    if _unquote(insert[1]) in _INTERNAL_TABLES:
+                        # Not a prefix to batch under: the writer still belongs to the previous table
+                        prefix = None
+                        continue
+                    prefix, table = insert[0], _unquote(insert[1])
+                    key = (table, insert[2])
+                    if key not in writers:
+                        self._prepare(table)
+                        columns = (
+                            [_unquote(c.strip()) for c in insert[2].split(',')] if insert[2] else list(layouts[table])
+                        )
+                        # Without the dump's definition the amounts are taken to match the target
+                        major_units = {
+                            column for column, declared in layouts.get(table, {}).items() if not _is_integer(declared)
+                        }
+                        writers[key] = self._writer(table, columns, major_units)
+                    writer = writers[key]
+                    pending.append(statement[len(prefix):].rstrip(';'))
+                    continue
+                prefix = None
+                create = _CREATE_TABLE.match(statement)
+                if create:
+                    table = _unquote(create[1])
+                    if table in _INTERNAL_TABLES:
+                        continue
+                    # The dump's own layout gives positional VALUES their column names
+                    self.parser.execute(f'DROP TABLE IF EXISTS {self.quote(table)}')
+                    self.parser.execute(statement)
+                    layouts[table] = {
+                        row[1]: row[2] for row in self.parser.execute(f'PRAGMA table_info({self.quote(table)})')
+                    }
+                    if table not in existing:
+                        self.connection.exec_driver_sql(statement)
+                        self.connection.commit()
+                        existing.add(table)
+                elif _DEFERRED.match(statement):
+                    self.deferred.append(statement)
+                elif not _SKIPPED.match(statement):
+                    raise ValueError(f"Unsupported statement in dump: {statement[:80]}")
+        flush()
+
+    def load_csv(self, path, table=None):
+        """Load one of the CSV reports, resolving addresses and tenant names to ids."""
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            table = table or csv_table(header)
+            self._prepare(table)
+            mapping = CSV_COLUMNS[table]
+            columns = [mapping[name] for name in header if mapping[name]]
+            positions = [i for i, name in enumerate(header) if mapping[name]]
+            property_ids = tenant_ids = None
+            if 'Property Address' in header:
+                columns.append('property_id')
+                property_ids = {
+                    address: pk for pk, address in self.connection.execute(text('SELECT id, address FROM property'))
+                }
+            if 'Tenant Name' in header:
+                columns.append('tenant_id')
+                tenant_ids = {}
+                for pk, name, property_id in self.connection.execute(text('SELECT id, name, property_id FROM tenant')):
+                    tenant_ids.setdefault((property_id, name), pk)
+                    tenant_ids.setdefault((None, name), pk)
+            statement, keep, scale = self._writer(table, columns, _REAL_COLUMNS)
+            batch = []
+            property_id = None
+            for record in reader:
+                row = [_convert(columns[n], record[i]) for n, i in enumerate(positions)]
+                if property_ids is not None:
+                    property_id = property_ids.get(record[header.index('Property Address')])
+                    row.append(property_id)
+                if tenant_ids is not None:
+                    name = record[header.index('Tenant Name')]
+                    row.append(tenant_ids.get((property_id, name), tenant_ids.get((None, name))))
+                row = tuple(row) if keep is None else tuple(row[i] for i in keep)
+                batch.append(_scaled(row, scale) if scale else row)
+                if len(batch) >= self.batch_size:
+                    self._write(table, statement, batch)
+                    batch = []
+            self._write(table, statement, batch)
+
+    def finish(self):
+        """Create the deferred indexes, triggers and views, then check the database."""
+        for statement in self.deferred:
+            self.connection.exec_driver_sql(statement)
+        if self.copy:
+            # Rows keep their ids, which serial columns do not see; continue after the highest
+            for table in self.counts:
+                if 'id' in {column['name'] for column in inspect(self.connection).get_columns(table)}:
+                    self.connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence(:table, 'id'), MAX(id)) FROM {self.quote(table)}"
+                    ), {'table': self.quote(table)})
+        self.connection.commit()
+        report = {'rows': dict(self.counts), 'integrity': 'ok', 'foreign_key_violations': 0}
+        if self.sqlite:
+            problems = [row[0] for row in self.connection.exec_driver_sql('PRAGMA integrity_check')]
+            report['integrity'] = '; '.join(problems)
+            report['foreign_key_violations'] = len(
+                self.connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+            )
+        report['seconds'] = round(time.perf_counter() - self.started, 2)
+        return report
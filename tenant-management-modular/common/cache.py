@@ -0,0 +1,178 @@
+"""Small in-process read-through caches invalidated by SQLAlchemy commits.
+
+Within a worker, caches are dropped as soon as a session commits a write.
+Across workers, every write also bumps a per-entity counter in the
+``data_version`` table inside the same transaction; ``DataVersionPoller``
+reads that table at most once per interval and drops caches whose entity
+version moved.
+
+With one database per organization (see ``common.sharding``) cached values
+and polled versions are kept per organization; an invalidation drops every
+organization's copy.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .sharding import current_org
+
+_BUMP_VERSION = text("""
+    INSERT INTO data_version (entity, version) VALUES (:entity, 1)
+    ON CONFLICT (entity) DO UPDATE SET version = data_version.version + 1
+""")
+
+
+class ReadThroughCache:
+    """Hold one loaded value per process and organization until it expires or is invalidated.
+
+    ``get(loader, *args)`` returns the cached value or calls ``loader(*args)``
+    on a miss. A value loaded while an invalidation happened is returned but
+    not stored, so a concurrent write never leaves stale data behind.
+    """
+
+    def __init__(self, name, ttl=60.0):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # organization -> (value, expires_at)
+        self._values = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, loader, *args):
+        org = current_org()
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(org)
+            if cached is not None and now < cached[1]:
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader(*args)
+
+        with self._lock:
+            if generation == self._generation:
+                self._values[org] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._values.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'ttl_seconds': self.ttl,
+                'loaded': bool(self._values),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def invalidate_on_commit(model, cache):
+    """Invalidate ``cache`` whenever a session commits a write to ``model``.
+
+    Mapper events flag the session when a row is inserted, updated or
+    deleted; the flag is acted on after commit (and after rollback, in case
+    the cache was filled with uncommitted rows in the meantime).
+    """
+    flag = f'invalidate_{cache.name}_cache'
+
+    def _mark(mapper, connection, target):
+        session = Session.object_session(target)
+        if session is not None:
+            session.info[flag] = True
+
+    for mapper_event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, mapper_event, _mark)
+
+    def _flush_flag(session):
+        if session.info.pop(flag, False):
+            cache.invalidate()
+
+    event.listen(Session, 'after_commit', _flush_flag)
+    event.listen(Session, 'after_rollback', _flush_flag)
+
+
+def track_data_versions(models_by_entity):
+    """Bump ``data_version`` once per flush for every entity type written.
+
+    ``models_by_entity`` maps an entity name to its model class. The bump
+    runs on the flushing session's connection, so it commits or rolls back
+    together with the write itself.
+    """
+    def _bump(session, flush_context):
+        touched = {
+            entity
+            for obj in (*session.new, *session.dirty, *session.deleted)
+            for entity, model in models_by_entity.items()
+            if isinstance(obj, model) and (obj not in session.dirty or session.is_modified(obj))
+        }
+        if touched:
+            connection = session.connection()
+            for entity in sorted(touched):
+                connection.execute(_BUMP_VERSION, {'entity': entity})
+
+    event.listen(Session, 'after_flush', _bump)
+
+
+class DataVersionPoller:
+    """Invalidate local caches when another process bumps an entity version."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._caches = {}
+        # organization -> last versions read / when to read them again
+        self._versions = {}
+        self._next_check = {}
+        self.polls = 0
+        self.remote_invalidations = 0
+
+    def watch(self, entity, cache):
+        self._caches.setdefault(entity, []).append(cache)
+
+    def poll(self, engine):
+        """Read the version table if the interval has elapsed; cheap otherwise.
+
+        ``engine`` is the current organization's database.
+        """
+        org = current_org()
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check.get(org, 0.0):
+                return
+            self._next_check[org] = now + self.interval
+        with engine.connect() as conn:
+            versions = dict(conn.execute(text('SELECT entity, version FROM data_version')).fetchall())
+        with self._lock:
+            self.polls += 1
+            previous, self._versions[org] = self._versions.get(org), versions
+        if previous is None:
+            return
+        for entity, caches in self._caches.items():
+            if versions.get(entity) != previous.get(entity):
+                self.remote_invalidations += 1
+                for cache in caches:
+                    cache.invalidate()
+
+    def stats(self):
+        return {
+            'interval_seconds': self.interval,
+            'polls': self.polls,
+            'remote_invalidations': self.remote_invalidations,
+            'versions': dict(self._versions.get(current_org()) or {}),
+        }
@@ -0,0 +1,91 @@
+"""Single-flight coalescing of identical concurrent requests within a worker.
+
+When several threads ask for the same expensive result at once (a report
+download, a ledger page, an analytics series), only the first one computes
+it; the others wait and receive the same value or exception. Results are not
+kept after the flight lands, so this never serves data older than the
+slowest concurrent request.
+"""
+
+import threading
+from collections import Counter
+
+from .sharding import current_org
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run ``fn`` once per key among callers that overlap in time.
+
+    ``invalidate()`` starts a new generation: callers arriving after a write
+    no longer join flights that began before it. It has the same shape as
+    ``ReadThroughCache.invalidate`` so ``invalidate_on_commit`` can drive it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._generation = 0
+        self.executions = Counter()
+        self.coalesced = Counter()
+
+    def do(self, key, fn, *args):
+        """Return ``fn(*args)``, sharing the call with concurrent callers of ``key``.
+
+        ``key`` is a tuple whose first element names the route; it is used to
+        group the counters.
+        """
+        with self._lock:
+            # Requests of different organizations read different databases
+            flight_key = (self._generation, current_org(), key)
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+                self.executions[key[0]] += 1
+            else:
+                self.coalesced[key[0]] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.done.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            routes = sorted(set(self.executions) | set(self.coalesced))
+            return {
+                'name': self.name,
+                'in_flight': len(self._flights),
+                'executions': sum(self.executions.values()),
+                'coalesced': sum(self.coalesced.values()),
+                'routes': {
+                    route: {'executions': self.executions[route], 'coalesced': self.coalesced[route]}
+                    for route in routes
+                },
+            }
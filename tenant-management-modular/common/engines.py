@@ -0,0 +1,45 @@
+"""Engine options per database backend.
+
+Both apps, the organization engines and ``manage.py`` build their engines
+with ``engine_options()`` so each backend gets the settings it needs and no
+other: SQLite connections may be used from the thread pool that runs
+FastAPI's sync endpoints, and PostgreSQL gets a bounded connection pool.
+
+Each worker process holds up to ``DB_POOL_SIZE + DB_MAX_OVERFLOW``
+connections per engine, so size them to the threads serving requests and
+keep ``workers * (size + overflow)`` under the server's ``max_connections``
+(100 by default). Connections are checked before use and recycled after
+``DB_POOL_RECYCLE`` seconds, so a restarted server or a dropped idle
+connection is replaced instead of failing a request.
+"""
+
+from sqlalchemy.engine import make_url
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+
+
+def backend(url):
+    """Backend name of a URL string or ``URL``: 'sqlite', 'postgresql', ..."""
+    return make_url(url).get_backend_name()
+
+
+def engine_options(url, pool_size=DEFAULT_POOL_SIZE, max_overflow=DEFAULT_MAX_OVERFLOW,
+                   pool_timeout=DEFAULT_POOL_TIMEOUT, pool_recycle=DEFAULT_POOL_RECYCLE):
+    """Keyword arguments for ``create_engine(url, ...)``; the pool settings apply to server databases."""
+    name = backend(url)
+    if name == 'sqlite':
+        return {'connect_args': {'check_same_thread': False}}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True,
+    }
+    if name == 'postgresql':
+        # Tells the app's connections apart in pg_stat_activity
+        options['connect_args'] = {'application_name': 'tenant-management'}
+    return options
@@ -0,0 +1,217 @@
+"""Materialized ledger balances kept in step with every transaction write.
+
+Running totals per tenant and per property live in ``ledger_balance`` and per
+month in ``ledger_month_balance``. ``track()`` attaches mapper events to a
+Transaction model so every insert, update and delete applies its delta on the
+same connection, i.e. inside the same database transaction as the write.
+``verify()`` and ``rebuild()`` recompute everything from scratch, including
+transactions moved to year partitions or the archive (see ``common.partitions``).
+
+Amounts are integer minor units (see ``common.money``), so the deltas, the
+SUMs that recompute them and the drift checks are all exact.
+"""
+
+from sqlalchemy import event, inspect, text
+
+from . import partitions
+from .money import from_minor, to_minor
+
+PAYMENT_TYPE = 'payment_received'
+ENTITY_TYPES = ('tenant', 'property')
+
+_UPSERT_BALANCE = text("""
+    INSERT INTO ledger_balance (entity_type, entity_id, charges, payments, transaction_count)
+    VALUES (:entity_type, :entity_id, :charges, :payments, :count)
+    ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+        charges = ledger_balance.charges + excluded.charges,
+        payments = ledger_balance.payments + excluded.payments,
+        transaction_count = ledger_balance.transaction_count + excluded.transaction_count
+""")
+
+_UPSERT_MONTH = text("""
+    INSERT INTO ledger_month_balance (entity_type, entity_id, period_month, charges, payments, transaction_count)
+    VALUES (:entity_type, :entity_id, :period_month, :charges, :payments, :count)
+    ON CONFLICT (entity_type, entity_id, period_month) DO UPDATE SET
+        charges = ledger_month_balance.charges + excluded.charges,
+        payments = ledger_month_balance.payments + excluded.payments,
+        transaction_count = ledger_month_balance.transaction_count + excluded.transaction_count
+""")
+
+_EXPECTED_BALANCES = """
+    SELECT '{entity}' AS entity_type, {column} AS entity_id,
+           SUM(CASE WHEN type <> :payment THEN amount ELSE 0 END) AS charges,
+           SUM(CASE WHEN type = :payment THEN amount ELSE 0 END) AS payments,
+           COUNT(*) AS transaction_count
+    FROM {source} AS tx WHERE {column} IS NOT NULL GROUP BY {column}
+"""
+
+_EXPECTED_MONTHS = """
+    SELECT '{entity}' AS entity_type, {column} AS entity_id, period_month,
+           SUM(CASE WHEN type <> :payment THEN amount ELSE 0 END) AS charges,
+           SUM(CASE WHEN type = :payment THEN amount ELSE 0 END) AS payments,
+           COUNT(*) AS transaction_count
+    FROM {source} AS tx WHERE {column} IS NOT NULL AND period_month IS NOT NULL
+    GROUP BY {column}, period_month
+"""
+
+
+def _contributions(values, sign):
+    """Yield (entity_type, entity_id, period_month, charges, payments, count) deltas."""
+    amount = (to_minor(values['amount']) or 0) * sign
+    charges, payments = (0, amount) if values['type'] == PAYMENT_TYPE else (amount, 0)
+    for entity_type in ENTITY_TYPES:
+        entity_id = values[f'{entity_type}_id']
+        if entity_id is not None:
+            yield entity_type, entity_id, values['period_month'], charges, payments, sign
+
+
+def apply(connection, contributions):
+    """Add a batch of deltas to the balance tables on the given connection."""
+    for entity_type, entity_id, period_month, charges, payments, count in contributions:
+        params = {
+            'entity_type': entity_type, 'entity_id': entity_id,
+            'charges': charges, 'payments': payments, 'count': count,
+        }
+        connection.execute(_UPSERT_BALANCE, params)
+        if period_month is not None:
+            connection.execute(_UPSERT_MONTH, dict(params, period_month=period_month.isoformat()))
+
+
+_FIELDS = ('type', 'amount', 'tenant_id', 'property_id', 'period_month')
+
+
+def _current(target):
+    return {field: getattr(target, field) for field in _FIELDS}
+
+
+def _previous(target):
+    state = inspect(target)
+    values = {}
+    for field in _FIELDS:
+        history = state.attrs[field].history
+        values[field] = history.deleted[0] if history.deleted else getattr(target, field)
+    return values
+
+
+def track(transaction_model):
+    """Keep the ledger tables in sync with writes to ``transaction_model``."""
+
+    @event.listens_for(transaction_model, 'after_insert')
+    def _after_insert(mapper, connection, target):
+        apply(connection, _contributions(_current(target), 1))
+
+    @event.listens_for(transaction_model, 'after_update')
+    def _after_update(mapper, connection, target):
+        before, after = _previous(target), _current(target)
+        if before != after:
+            apply(connection, _contributions(before, -1))
+            apply(connection, _contributions(after, 1))
+
+    @event.listens_for(transaction_model, 'after_delete')
+    def _after_delete(mapper, connection, target):
+        apply(connection, _contributions(_previous(target), -1))
+
+
+def get_balance(connection, entity_type, entity_id):
+    """Return the stored running balance for a tenant or property, in major units."""
+    row = connection.execute(
+        text(
+            'SELECT charges, payments, transaction_count FROM ledger_balance '
+            'WHERE entity_type = :entity_type AND entity_id = :entity_id'
+        ),
+        {'entity_type': entity_type, 'entity_id': entity_id},
+    ).first()
+    charges, payments, count = (row.charges, row.payments, row.transaction_count) if row else (0, 0, 0)
+    return {
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'charges': from_minor(charges),
+        'payments': from_minor(payments),
+        'balance': from_minor(payments - charges),
+        'transaction_count': count,
+    }
+
+
+def _expected(connection, template, key_columns, source):
+    sql = ' UNION ALL '.join(
+        template.format(entity=entity, column=f'{entity}_id', source=source) for entity in ENTITY_TYPES
+    )
+    return {
+        tuple(str(row._mapping[column]) for column in key_columns): row
+        for row in connection.execute(text(sql), {'payment': PAYMENT_TYPE})
+    }
+
+
+def _is_empty(row):
+    # Rows whose transactions were all moved or deleted are left at zero
+    return row.transaction_count == 0 and not row.charges and not row.payments
+
+
+def _stored(connection, table, key_columns):
+    return {
+        tuple(str(row._mapping[column]) for column in key_columns): row
+        for row in connection.execute(text(f'SELECT * FROM {table}'))
+        if not _is_empty(row)
+    }
+
+
+def _differs(expected, stored):
+    if expected is None or stored is None:
+        return True
+    return (
+        (expected.charges or 0) != (stored.charges or 0)
+        or (expected.payments or 0) != (stored.payments or 0)
+        or expected.transaction_count != stored.transaction_count
+    )
+
+
+def _as_dict(row):
+    values = dict(row._mapping)
+    for column in ('charges', 'payments'):
+        values[column] = from_minor(values[column] or 0)
+    return values
+
+
+def verify(connection):
+    """Recompute every balance from the transaction table and report drift."""
+    drift = []
+    source = partitions.source(connection)
+    for table, template, keys in (
+        ('ledger_balance', _EXPECTED_BALANCES, ('entity_type', 'entity_id')),
+        ('ledger_month_balance', _EXPECTED_MONTHS, ('entity_type', 'entity_id', 'period_month')),
+    ):
+        expected = _expected(connection, template, keys, source)
+        stored = _stored(connection, table, keys)
+        for key in sorted(expected.keys() | stored.keys()):
+            if _differs(expected.get(key), stored.get(key)):
+                drift.append({
+                    'table': table,
+                    'key': key,
+                    'expected': _as_dict(expected[key]) if key in expected else None,
+                    'stored': _as_dict(stored[key]) if key in stored else None,
+                })
+    return drift
+
+
+def rebuild(connection):
+    """Replace the ledger tables with balances recomputed from scratch.
+
+    Returns the drift that existed before the rebuild.
+    """
+    drift = verify(connection)
+    source = partitions.source(connection)
+    params = {'payment': PAYMENT_TYPE}
+    connection.execute(text('DELETE FROM ledger_balance'))
+    connection.execute(text('DELETE FROM ledger_month_balance'))
+    for entity in ENTITY_TYPES:
+        column = f'{entity}_id'
+        connection.execute(text(
+            'INSERT INTO ledger_balance (entity_type, entity_id, charges, payments, transaction_count) '
+            + _EXPECTED_BALANCES.format(entity=entity, column=column, source=source)
+        ), params)
+        connection.execute(text(
+            'INSERT INTO ledger_month_balance '
+            '(entity_type, entity_id, period_month, charges, payments, transaction_count) '
+            + _EXPECTED_MONTHS.format(entity=entity, column=column, source=source)
+        ), params)
+    return drift
@@ -0,0 +1,217 @@
+"""Process-local metrics rendered in the Prometheus text exposition format.
+
+A deliberately small subset of a Prometheus client: labelled counters,
+gauges and histograms kept in memory, plus gauges computed at scrape time.
+Each worker exposes its own values; the scraper aggregates across workers.
+"""
+
+import os
+import threading
+import time
+from functools import wraps
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Compute the value at scrape time; ``function`` returns {label tuple: value}."""
+        self._function = function
+
+    def collect(self):
+        if self._function is not None:
+            items = sorted(self._function().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = (('le', _number(bound if bound == float('inf') else float(bound))),)
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(float(total))}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+http_requests = _register(Counter(
+    'http_requests_total', 'HTTP requests served.', ('method', 'route', 'status')))
+http_request_duration = _register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ('method', 'route')))
+http_in_flight = _register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served.'))
+sql_queries = _register(Counter(
+    'sql_queries_total', 'SQL statements executed while serving requests.', ('route',)))
+sql_duration = _register(Counter(
+    'sql_query_duration_seconds_total', 'Time spent in SQL while serving requests.', ('route',)))
+sql_queries_per_request = _register(Histogram(
+    'sql_queries_per_request', 'SQL statements per request.', ('route',), QUERY_BUCKETS))
+report_duration = _register(Histogram(
+    'report_generation_seconds', 'Time to build a report body.', ('report',)))
+report_size = _register(Histogram(
+    'report_size_bytes', 'Size of generated report files.', ('report',), SIZE_BUCKETS))
+backup_duration = _register(Histogram(
+    'backup_duration_seconds', 'Time to copy the database for a backup.', (), (0.1, 0.5, 1, 5, 10, 30, 60, 300)))
+sqlite_file_size = _register(Gauge(
+    'sqlite_file_bytes', 'Size of the SQLite database and its WAL file.', ('file',)))
+
+
+http_in_flight.set(0)
+
+
+def watch_sqlite_engine(engine):
+    """Report the size of the engine's SQLite database file and its -wal file."""
+    def _sizes():
+        path = engine.url.database
+        if engine.url.get_backend_name() != 'sqlite' or not path or path == ':memory:':
+            return {}
+        sizes = {}
+        for label, candidate in (('database', path), ('wal', path + '-wal')):
+            sizes[(label,)] = os.path.getsize(candidate) if os.path.exists(candidate) else 0
+        return sizes
+    sqlite_file_size.set_function(_sizes)
+
+
+def observe_request(method, route, status, seconds, query_stats=None):
+    """Record one served request and, if available, the SQL it issued."""
+    http_requests.inc(method=method, route=route, status=status)
+    http_request_duration.observe(seconds, method=method, route=route)
+    if query_stats is not None:
+        sql_queries.inc(query_stats.count, route=route)
+        sql_duration.inc(query_stats.duration, route=route)
+        sql_queries_per_request.observe(query_stats.count, route=route)
+
+
+def _size(value):
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, tuple):
+        sizes = [_size(part) for part in value]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    return None
+
+
+def timed_report(name):
+    """Decorate a report builder to record its duration and, for bytes/str bodies, its size."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = function(*args, **kwargs)
+            report_duration.observe(time.perf_counter() - started, report=name)
+            size = _size(result)
+            if size is not None:
+                report_size.observe(size, report=name)
+            return result
+        return wrapper
+    return decorator
+
+
+def render():
+    """Return every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.header())
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,345 @@
+"""Versioned schema migrations recorded in a ``schema_version`` table.
+
+``Base.metadata.create_all()`` only creates missing tables, so columns and
+indexes added to existing tables are applied by the numbered steps in
+``MIGRATIONS``. ``migrate()`` runs every step that is not yet recorded, in
+order, each in its own transaction together with its version row; a fresh
+database gets the current schema from ``create_all()`` and is stamped with
+every version instead. ``bootstrap`` does both and is invoked explicitly
+(``manage.py db upgrade``, ``serve.py`` before it starts workers), never while
+importing the apps.
+
+Steps receive a connection in commit-as-you-go mode and may commit between
+batches, so long backfills and table rebuilds never hold SQLite's write lock
+for more than one batch. ``rebuild_table()`` is the online way to change a
+large table's definition or add an index to it on SQLite: it builds a copy,
+fills it in batches while triggers mirror concurrent writes, then swaps the
+copy in with a short rename; ``tenant-management-app/db_update.py`` keeps a
+copy of it and ``create_indexes()`` for the single-file app, so fixes here
+belong there too. Steps must be safe to re-run, since a step that fails after
+committing some batches is retried from the start.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+from . import ledger, money
+from .periods import period_month
+
+BACKFILL_BATCH_SIZE = 5000
+# Below this many rows a plain CREATE INDEX is quicker than a table rebuild
+ONLINE_INDEX_MIN_ROWS = 200000
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _column_names(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def add_column(conn, table, name, ddl):
+    """Add a column unless it exists; on SQLite this only rewrites the schema."""
+    if name not in _column_names(conn, table):
+        conn.execute(text(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(name)} {ddl}'))
+
+
+def create_indexes(conn, table, indexes, batch_size=BACKFILL_BATCH_SIZE):
+    """Create the missing ones of ``{name: columns}``, rebuilding large SQLite tables online."""
+    existing = {index['name'] for index in inspect(conn).get_indexes(table)}
+    missing = {name: columns for name, columns in indexes.items() if name not in existing}
+    if not missing:
+        return
+    rows = conn.execute(text(f'SELECT COUNT(*) FROM {_quote(table)}')).scalar()
+    if conn.dialect.name == 'sqlite' and rows >= ONLINE_INDEX_MIN_ROWS:
+        rebuild_table(conn, table, indexes=missing, batch_size=batch_size)
+        return
+    for name, columns in missing.items():
+        column_list = ', '.join(_quote(column) for column in columns)
+        conn.execute(text(f'CREATE INDEX {_quote(name)} ON {_quote(table)} ({column_list})'))
+
+
+_INDEX_HEAD = re.compile(r'^(CREATE (?:UNIQUE )?INDEX\s+)("[^"]+"|\w+)(\s+ON\s+)("[^"]+"|\w+)', re.I)
+
+
+def _table_sql(conn, table):
+    """Return the ``CREATE TABLE`` statement of ``table`` with ``{table}`` in place of its name."""
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {'table': table},
+    ).scalar()
+    return re.sub(r'^CREATE TABLE\s+("[^"]+"|\w+)', 'CREATE TABLE {table}', sql, count=1)
+
+
+def _alternate_name(name):
+    """SQLite index names are schema-wide, so each rebuild flips between two names."""
+    suffix = '__rebuilt'
+    return name[:-len(suffix)] if name.endswith(suffix) else name + suffix
+
+
+def rebuild_table(conn, table, create_sql=None, columns=None, indexes=None,
+                  batch_size=BACKFILL_BATCH_SIZE):
+    """Rebuild ``table`` on SQLite without holding the write lock for the copy.
+
+    ``create_sql`` is the new ``CREATE TABLE`` statement with ``{table}`` in
+    place of the name (default: the current definition). ``columns`` maps new
+    columns to SQL expressions over the old row (default: copy the columns
+    both definitions share). ``indexes`` maps names of indexes to add to their
+    column lists. Existing indexes are recreated on the copy; because SQLite
+    has no RENAME INDEX, they come back under an alternate name.
+
+    The copy is created with AFTER triggers on the old table that mirror every
+    insert, update and delete, then filled in committed batches of rowids, so
+    other writers only ever wait for one batch. The final swap (drop the old
+    table, rename the copy) is a single short transaction. Assumes foreign key
+    enforcement is off, which is SQLite's default and how the apps connect.
+    """
+    shadow = f'_rebuild_{table}'
+    triggers = [f'_rebuild_{table}_{event}' for event in ('insert', 'update', 'delete')]
+    indexes = dict(indexes or {})
+
+    # Clear what an interrupted earlier attempt may have left behind
+    for trigger in triggers:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {_quote(trigger)}'))
+    conn.execute(text(f'DROP TABLE IF EXISTS {_quote(shadow)}'))
+    conn.commit()
+
+    master = conn.execute(
+        text("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = :table AND sql IS NOT NULL"),
+        {'table': table},
+    ).fetchall()
+    if create_sql is None:
+        create_sql = _table_sql(conn, table)
+    conn.exec_driver_sql(create_sql.format(table=_quote(shadow)))
+
+    old_columns = _column_names(conn, table)
+    shadow_info = conn.execute(text(f'PRAGMA table_info({_quote(shadow)})')).fetchall()
+    expressions = {}
+    for column in shadow_info:
+        if columns and column.name in columns:
+            expressions[column.name] = columns[column.name]
+        elif column.name in old_columns:
+            expressions[column.name] = _quote(column.name)
+    # Keep rowids aligned so the delete trigger can find the copied row
+    key = [column for column in shadow_info if column.pk]
+    rowid_alias = len(key) == 1 and key[0].type.upper() == 'INTEGER'
+    target = ', '.join(([] if rowid_alias else ['rowid']) + [_quote(name) for name in expressions])
+    source = ', '.join(([] if rowid_alias else ['rowid']) + list(expressions.values()))
+    copy_rows = f'INTO {_quote(shadow)} ({target}) SELECT {source} FROM {_quote(table)}'
+
+    for row in master:
+        if row.type == 'index' and row.name not in indexes:
+            conn.exec_driver_sql(_INDEX_HEAD.sub(
+                lambda m: f'{m[1]}{_quote(_alternate_name(row.name))}{m[3]}{_quote(shadow)}', row.sql, count=1,
+            ))
+    for name, index_columns in indexes.items():
+        column_list = ', '.join(_quote(column) for column in index_columns)
+        conn.execute(text(f'CREATE INDEX {_quote(name)} ON {_quote(shadow)} ({column_list})'))
+
+    conn.execute(text(
+        f'CREATE TRIGGER {_quote(triggers[0])} AFTER INSERT ON {_quote(table)} BEGIN '
+        f'INSERT OR REPLACE {copy_rows} WHERE rowid = NEW.rowid; END'
+    ))
+    conn.execute(text(
+        f'CREATE TRIGGER {_quote(triggers[1])} AFTER UPDATE ON {_quote(table)} BEGIN '
+        f'DELETE FROM {_quote(shadow)} WHERE rowid = OLD.rowid; '
+        f'INSERT OR REPLACE {copy_rows} WHERE rowid = NEW.rowid; END'
+    ))
+    conn.execute(text(
+        f'CREATE TRIGGER {_quote(triggers[2])} AFTER DELETE ON {_quote(table)} BEGIN '
+        f'DELETE FROM {_quote(shadow)} WHERE rowid = OLD.rowid; END'
+    ))
+    # Rows written from here on are mirrored by the triggers
+    last_rowid = conn.execute(text(f'SELECT MAX(rowid) FROM {_quote(table)}')).scalar() or 0
+    conn.commit()
+
+    low = 0
+    while low < last_rowid:
+        high = conn.execute(
+            text(f'SELECT MAX(rowid) FROM (SELECT rowid FROM {_quote(table)} '
+                 'WHERE rowid > :low ORDER BY rowid LIMIT :limit)'),
+            {'low': low, 'limit': batch_size},
+        ).scalar()
+        if high is None:
+            break
+        high = min(high, last_rowid)
+        # OR IGNORE: a row a trigger already mirrored is newer than this copy
+        conn.execute(
+            text(f'INSERT OR IGNORE {copy_rows} WHERE rowid > :low AND rowid <= :high'),
+            {'low': low, 'high': high},
+        )
+        conn.commit()
+        low = high
+
+    other_triggers = [row.sql for row in master if row.type == 'trigger' and row.name not in triggers]
+    # pysqlite does not open a transaction for DDL on its own; the swap must be atomic
+    conn.exec_driver_sql('BEGIN IMMEDIATE')
+    for trigger in triggers:
+        conn.execute(text(f'DROP TRIGGER {_quote(trigger)}'))
+    conn.execute(text(f'DROP TABLE {_quote(table)}'))
+    # Legacy mode skips re-parsing the rest of the schema, which still names the dropped table
+    conn.execute(text('PRAGMA legacy_alter_table = ON'))
+    conn.execute(text(f'ALTER TABLE {_quote(shadow)} RENAME TO {_quote(table)}'))
+    conn.execute(text('PRAGMA legacy_alter_table = OFF'))
+    for sql in other_triggers:
+        conn.exec_driver_sql(sql)
+    conn.commit()
+
+
+def add_transaction_period_month(conn):
+    """Add ``transaction.period_month``, backfill it and index month lookups."""
+    add_column(conn, 'transaction', 'period_month', 'DATE')
+    conn.commit()
+
+    # Backfill in committed batches so a large ledger is neither held in
+    # memory nor locked for the whole run
+    while True:
+        rows = conn.execute(
+            text(
+                'SELECT id, for_month, transaction_date FROM "transaction" '
+                'WHERE period_month IS NULL LIMIT :limit'
+            ),
+            {'limit': BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            text('UPDATE "transaction" SET period_month = :period WHERE id = :id'),
+            [
+                {'id': row.id, 'period': period_month(row.for_month, row.transaction_date).isoformat()}
+                for row in rows
+            ],
+        )
+        conn.commit()
+
+    create_indexes(conn, 'transaction', {
+        'ix_transaction_property_period': ['property_id', 'period_month'],
+        'ix_transaction_tenant_period': ['tenant_id', 'period_month'],
+    })
+
+
+def populate_ledger_balances(conn):
+    """Build the materialized balances for databases that predate them."""
+    has_balances = conn.execute(text('SELECT 1 FROM ledger_balance LIMIT 1')).first()
+    has_transactions = conn.execute(text('SELECT 1 FROM "transaction" LIMIT 1')).first()
+    if has_transactions and not has_balances:
+        ledger.rebuild(conn)
+
+
+def add_tenant_expiry_indexes(conn):
+    """Index expiry dates so alert lookups are range scans."""
+    create_indexes(conn, 'tenant', {
+        'ix_tenant_contract_expiry_date': ['contract_expiry_date'],
+        'ix_tenant_passport_validity': ['passport_validity'],
+    })
+
+
+def _retype(create_sql, columns, ddl):
+    """Return ``create_sql`` with the declared type of each of ``columns`` replaced by ``ddl``."""
+    for column in columns:
+        create_sql = re.sub(
+            rf'([(,]\s*"?{column}"?\s+)\w+(?:\s*\([^)]*\))?', rf'\g<1>{ddl}', create_sql, count=1,
+        )
+    return create_sql
+
+
+def store_money_in_minor_units(conn):
+    """Convert float money columns to integer minor units, one online rebuild per table.
+
+    The ledger tables are then recomputed from the converted amounts: when they
+    were created by ``create_all()`` their columns are already integers, yet
+    migration 2 filled them from the major-unit amounts of that time.
+    """
+    for table, columns in money.COLUMNS.items():
+        types = {column['name']: column['type'] for column in inspect(conn).get_columns(table)}
+        pending = [column for column in columns if not isinstance(types[column], Integer)]
+        if not pending:
+            continue
+        if conn.dialect.name == 'postgresql':
+            # Transactional DDL: the rewrite commits whole or not at all
+            conn.execute(text(f'ALTER TABLE {_quote(table)} ' + ', '.join(
+                f'ALTER COLUMN {_quote(column)} TYPE BIGINT '
+                f'USING ROUND(ROUND(CAST({_quote(column)} AS NUMERIC), 2) * {money.MINOR_UNITS})'
+                for column in pending
+            )))
+            conn.commit()
+            continue
+        rebuild_table(
+            conn, table,
+            create_sql=_retype(_table_sql(conn, table), pending, 'BIGINT'),
+            columns={column: money.minor_units_sql(_quote(column)) for column in pending},
+        )
+    ledger.rebuild(conn)
+    conn.commit()
+
+
+# Append new steps with the next number; never renumber or edit applied ones
+MIGRATIONS = [
+    (1, add_transaction_period_month),
+    (2, populate_ledger_balances),
+    (3, add_tenant_expiry_indexes),
+    (4, store_money_in_minor_units),
+]
+
+
+def applied_versions(conn):
+    """Return ``{version: applied_at}`` for every recorded migration."""
+    schema_version.create(conn, checkfirst=True)
+    rows = conn.execute(schema_version.select()).fetchall()
+    return {row.version: row.applied_at for row in rows}
+
+
+def _record(conn, version, step):
+    conn.execute(schema_version.insert().values(
+        version=version, name=step.__name__, applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    ))
+
+
+def migrate(engine, migrations=MIGRATIONS):
+    """Apply pending migrations in order; return the (version, name) pairs run."""
+    applied = []
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+        for version, step in migrations:
+            if version in done:
+                continue
+            try:
+                step(conn)
+                _record(conn, version, step)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append((version, step.__name__))
+    return applied
+
+
+def stamp(engine, migrations=MIGRATIONS):
+    """Record every migration as applied without running it."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+        for version, step in migrations:
+            if version not in done:
+                _record(conn, version, step)
+
+
+def bootstrap(engine, metadata):
+    """Create missing tables from ``metadata`` and apply pending migrations."""
+    existing = set(inspect(engine).get_table_names())
+    fresh = not existing & set(metadata.tables)
+    metadata.create_all(bind=engine)
+    if fresh:
+        # create_all() already built the current schema
+        stamp(engine)
+        return []
+    return migrate(engine)
@@ -0,0 +1,61 @@
+"""Money stored as whole numbers of the currency's minor unit (paise, cents).
+
+Amounts live in ``BIGINT`` columns so every SUM over the ledger is exact
+integer arithmetic. The ``Money`` column type converts at the boundary:
+models, schemas and both APIs keep reading and writing amounts in major
+units (rupees) with up to two decimals. Raw SQL over money columns sees
+minor units and converts its results with ``from_minor()``.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+MINOR_UNITS = 100
+
+# Money columns per table
+COLUMNS = {
+    'property': ('rent', 'maintenance'),
+    'tenant': ('rent', 'security'),
+    'transaction': ('amount',),
+    'ledger_balance': ('charges', 'payments'),
+    'ledger_month_balance': ('charges', 'payments'),
+}
+
+
+def to_minor(value):
+    """Convert an amount in major units (number or numeric string) to minor units.
+
+    Goes through the decimal text of the value, so 0.285 becomes 29 rather
+    than the 28 its binary float would round to; halves round away from zero.
+    """
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(value):
+    """Convert minor units to a float amount in major units."""
+    if value is None:
+        return None
+    return int(value) / MINOR_UNITS
+
+
+def minor_units_sql(column):
+    """SQL expression turning a floating point major-unit column into minor units."""
+    # Rounding to two decimals first matches to_minor() on halves such as 0.285
+    return f'CAST(ROUND(ROUND({column}, 2) * {MINOR_UNITS}) AS INTEGER)'
+
+
+class Money(TypeDecorator):
+    """Integer column of minor units that reads and writes major-unit floats."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return from_minor(value)
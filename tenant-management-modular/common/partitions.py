@@ -0,0 +1,215 @@
+"""Year partitions of the transaction table, read through one pruning router.
+
+``split()`` moves the transactions of closed years out of the live
+``transaction`` table into one table per year (``transaction_2019``, ...),
+in committed batches. ``transaction_partition`` records each year's table
+and the ``transaction_date`` and ``period_month`` ranges it holds.
+Partitioning is optional: until ``split()`` runs there are no year tables
+and every reader sees the plain table.
+
+New transactions, and old ones that are edited, live in the live table, so
+it is always read. ``source()`` builds the FROM clause of a transaction query
+and adds only the partitions, and the archive (see ``common.archive``),
+whose recorded range overlaps the requested window; a report on this year
+reads the live table alone. ``load()`` and ``get()`` return ORM objects from
+the live table, the partitions and the archive; ``promote()`` moves a
+partitioned row back into the live table before the ORM changes or deletes
+it.
+"""
+
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, select, text
+
+from . import archive
+from .archive import DEFAULT_BATCH_SIZE, TABLE, as_date
+
+partition_state = Table(
+    'transaction_partition', MetaData(),
+    Column('year', Integer, primary_key=True),
+    Column('table_name', String(50), nullable=False),
+    Column('first_transaction_date', Date),
+    Column('last_transaction_date', Date),
+    Column('first_period_month', Date),
+    Column('last_period_month', Date),
+    Column('row_count', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+
+def table_name(year):
+    return f'transaction_{int(year)}'
+
+
+def get_partitions(connection):
+    """Return the non-empty ``transaction_partition`` rows ordered by year."""
+    if not archive.is_sqlite(connection) or not archive.has_table(connection, 'transaction_partition'):
+        return []
+    return connection.execute(
+        partition_state.select().where(partition_state.c.row_count > 0).order_by(partition_state.c.year)
+    ).fetchall()
+
+
+def _overlaps(partition, start, end, column):
+    """Whether the partition may hold rows with ``start <= column < end`` (open where None)."""
+    if start is None and end is None:
+        return True
+    if column == 'period_month':
+        first, last = partition.first_period_month, partition.last_period_month
+    else:
+        first, last = partition.first_transaction_date, partition.last_transaction_date
+    if first is None:
+        # Only NULLs in this column, which no bound matches
+        return False
+    return (start is None or as_date(last) >= as_date(start)) and (end is None or as_date(first) < as_date(end))
+
+
+def source(connection, start=None, end=None, column='transaction_date', archived=True):
+    """FROM clause for transactions with ``start <= column < end``.
+
+    The live table alone, or a UNION ALL of it with the year partitions and
+    (unless ``archived`` is False) the archive that can hold matching rows.
+    Callers still filter on ``column`` themselves.
+    """
+    tables = [table.table_name for table in get_partitions(connection) if _overlaps(table, start, end, column)]
+    state = archive.get_state(connection) if archived else None
+    include_archive = archive.covers(state, start, end, column)
+    if not tables and not include_archive:
+        return TABLE
+    live = archive.columns(connection, TABLE)
+    selects = [f'SELECT {", ".join(live)} FROM main.{TABLE}']
+    for table in tables:
+        selects.append(f'SELECT {archive.select_list(live, archive.columns(connection, table))} FROM main.{table}')
+    if include_archive:
+        archive.attach(connection, state.path)
+        present = archive.columns(connection, TABLE, archive.SCHEMA)
+        selects.append(f'SELECT {archive.select_list(live, present)} FROM {archive.SCHEMA}.{TABLE}')
+    return '(' + ' UNION ALL '.join(selects) + ')'
+
+
+def load(session, model, filters=None, order_by=None, options=(), archived=True):
+    """Transactions matching ``filters`` ({column: value}) as ``model`` objects.
+
+    Reads the live table, the year partitions and, unless ``archived`` is
+    False, the archive, so ledgers and exports list every transaction their
+    all-time balances count. ``order_by`` is a SQL ORDER BY list and
+    ``options`` are ORM loader options such as ``selectinload(model.tenant)``.
+    """
+    filters = filters or {}
+    # Name the columns in the model's order: text() results map to them by position, and
+    # tables extended by ALTER TABLE keep their columns in a different physical order
+    listed = ', '.join(f'tx.{column.name}' for column in model.__table__.columns)
+    sql = f'SELECT {listed} FROM {source(session, archived=archived)} AS tx'
+    if filters:
+        sql += ' WHERE ' + ' AND '.join(f'{column} = :{column}' for column in filters)
+    if order_by:
+        sql += f' ORDER BY {order_by}'
+    statement = text(sql).bindparams(**filters).columns(*model.__table__.columns)
+    return session.scalars(select(model).from_statement(statement).options(*options)).all()
+
+
+def get(session, model, transaction_id, archived=True):
+    """``session.get()`` that also finds transactions in a year partition or the archive."""
+    transaction = session.get(model, transaction_id)
+    if transaction is None and (get_partitions(session) or (archived and archive.get_state(session))):
+        found = load(session, model, {'id': transaction_id}, archived=archived)
+        transaction = found[0] if found else None
+    return transaction
+
+
+def promote(session, transaction_id):
+    """Move a partitioned transaction back into the live table; return whether one was moved.
+
+    Runs in the caller's transaction so the move commits with the change that
+    needs it. Balances are unaffected: the row only changes tables.
+    """
+    for partition in get_partitions(session):
+        listed = ', '.join(archive.columns(session, partition.table_name))
+        params = {'id': transaction_id}
+        moved = session.execute(text(
+            f'INSERT INTO main.{TABLE} ({listed}) SELECT {listed} FROM main.{partition.table_name} WHERE id = :id'
+        ), params).rowcount
+        if moved:
+            session.execute(text(f'DELETE FROM main.{partition.table_name} WHERE id = :id'), params)
+            session.execute(
+                partition_state.update().where(partition_state.c.year == partition.year)
+                .values(row_count=partition_state.c.row_count - 1)
+            )
+            return True
+    return False
+
+
+def refresh(connection, years):
+    """Recompute the recorded ranges of the given years' partitions; drop the empty ones."""
+    for year in years:
+        name = table_name(year)
+        connection.execute(partition_state.delete().where(partition_state.c.year == year))
+        if not archive.has_table(connection, name):
+            continue
+        summary = connection.execute(text(
+            f'SELECT MIN(transaction_date), MAX(transaction_date), MIN(period_month), MAX(period_month), COUNT(*) '
+            f'FROM main.{name}'
+        )).first()
+        if not summary[4]:
+            connection.exec_driver_sql(f'DROP TABLE main.{name}')
+            continue
+        connection.execute(partition_state.insert().values(
+            year=year,
+            table_name=name,
+            first_transaction_date=as_date(summary[0]),
+            last_transaction_date=as_date(summary[1]),
+            first_period_month=as_date(summary[2]),
+            last_period_month=as_date(summary[3]),
+            row_count=summary[4],
+            updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        ))
+
+
+def split(engine, through_year=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Move transactions dated up to the end of ``through_year`` (default: last year) into year tables.
+
+    Each year table is created like the live table, with its indexes, and
+    filled in one pass over the live table in committed batches of ids.
+    Re-running later moves the next closed years and rows back-dated into
+    years already split. Returns the ``transaction_partition`` rows.
+    """
+    if engine.dialect.name != 'sqlite':
+        raise ValueError('Partitioning is only supported for SQLite databases')
+    through_year = through_year or date.today().year - 1
+    with engine.connect() as conn:
+        partition_state.create(conn, checkfirst=True)
+        years = [int(year) for (year,) in conn.execute(
+            text(f'SELECT DISTINCT substr(transaction_date, 1, 4) FROM main.{TABLE} WHERE transaction_date < :end'),
+            {'end': f'{through_year + 1}-01-01'},
+        )]
+        for year in years:
+            archive.copy_definition(conn, table_name(year), index_suffix=f'_{year}')
+        conn.commit()
+
+        archive.move_rows(conn, TABLE, {
+            ('main', table_name(year)): f"transaction_date >= '{year}-01-01' AND transaction_date < '{year + 1}-01-01'"
+            for year in years
+        }, batch_size=batch_size, progress=progress)
+
+        refresh(conn, years)
+        conn.commit()
+        return get_partitions(conn)
+
+
+def archive_transactions(engine, path, before, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """``archive.archive_transactions()`` over the live table and the year partitions.
+
+    Partitions emptied by the archive are dropped; the others get their
+    ranges recomputed.
+    """
+    with engine.connect() as conn:
+        partitions = get_partitions(conn)
+    sources = (TABLE,) + tuple(
+        partition.table_name for partition in partitions
+        if as_date(partition.first_transaction_date) < before
+    )
+    state = archive.archive_transactions(engine, path, before, sources, batch_size, progress)
+    with engine.connect() as conn:
+        refresh(conn, [partition.year for partition in partitions])
+        conn.commit()
+    return state
@@ -0,0 +1,73 @@
+"""Helpers for normalizing the free-form ``for_month`` value of a transaction."""
+
+import re
+from datetime import date, datetime
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+_YEAR_MONTH = re.compile(r'^(\d{4})[-/.](\d{1,2})$')
+_MONTH_YEAR = re.compile(r'^(\d{1,2})[-/.](\d{4})$')
+_NAME_YEAR = re.compile(r'^([a-z]+)[\s,\-/]*(\d{4})?$')
+_YEAR_NAME = re.compile(r'^(\d{4})[\s,\-/]*([a-z]+)$')
+
+
+def _coerce_date(value):
+    """Accept a date, datetime or ISO string and return a date (or None)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _infer_year(month, reference, months_ahead=3):
+    """Pick the year for a bare month name relative to the reference date.
+
+    Months up to ``months_ahead`` after the reference month are treated as
+    advance entries; anything else is assumed to be the current or a past
+    month, so a "December" charge entered in February belongs to the previous
+    year and a "January" rent collected in December belongs to the next one.
+    """
+    offset = (month - reference.month) % 12
+    if 0 < offset <= months_ahead:
+        return reference.year + (1 if month < reference.month else 0)
+    return reference.year - (1 if month > reference.month else 0)
+
+
+def period_month(for_month, transaction_date=None):
+    """Return the first day of the month a transaction applies to.
+
+    ``for_month`` may be a month name ("July", "Jul"), a month name with a year
+    ("July 2025") or a numeric period ("2025-07", "07/2025"). When it cannot be
+    parsed the month of ``transaction_date`` (or today) is used instead.
+    """
+    reference = _coerce_date(transaction_date) or date.today()
+    text = (for_month or '').strip().lower()
+
+    match = _YEAR_MONTH.match(text)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12:
+            return date(year, month, 1)
+
+    match = _MONTH_YEAR.match(text)
+    if match:
+        month, year = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12:
+            return date(year, month, 1)
+
+    match = _NAME_YEAR.match(text) or _YEAR_NAME.match(text)
+    if match:
+        groups = match.groups()
+        name, year = (groups[0], groups[1]) if match.re is _NAME_YEAR else (groups[1], groups[0])
+        month = MONTHS.get(name[:3])
+        if month:
+            year = int(year) if year else _infer_year(month, reference)
+            return date(year, month, 1)
+
+    return reference.replace(day=1)
@@ -0,0 +1,117 @@
+"""PostgreSQL ``COPY`` for the CSV reports and bulk loads.
+
+On PostgreSQL the tenants, properties and transactions CSV reports are
+produced by the server with ``COPY (SELECT ...) TO STDOUT WITH (FORMAT
+csv, HEADER)``: one statement joins the property addresses and tenant
+names, converts amounts from minor units and quotes the fields, instead of
+loading every row as an ORM object and writing it with the csv module.
+The columns and headers are those of the ORM-built reports; amounts come
+out with two decimals (``16700.00``). ``copy_from()`` is the loading side,
+used by ``common.bulkload``: rows go to ``COPY ... FROM STDIN`` instead of
+INSERT statements.
+
+Both psycopg 3 (``cursor.copy()``) and psycopg2 (``copy_expert()``) are
+supported. Other databases keep the ORM-built reports and INSERTs.
+"""
+
+from io import BytesIO, StringIO
+
+from .money import MINOR_UNITS
+
+
+def _major(column):
+    return f'CAST({column} / {MINOR_UNITS}.0 AS NUMERIC(18, 2))'
+
+
+CSV_REPORTS = {
+    'tenants': f'''
+        SELECT t.id AS "ID", t.name AS "Name", COALESCE(p.address, 'N/A') AS "Property Address",
+               t.passport AS "Passport", t.passport_validity AS "Passport Validity",
+               t.aadhar_no AS "Aadhar No", t.employment_details AS "Employment Details",
+               t.permanent_address AS "Permanent Address", t.contact_no AS "Contact No",
+               t.emergency_contact_no AS "Emergency Contact No", {_major('t.rent')} AS "Rent",
+               {_major('t.security')} AS "Security", t.move_in_date AS "Move In Date",
+               t.contract_start_date AS "Contract Start Date", t.contract_expiry_date AS "Contract Expiry Date",
+               t.created_date AS "Created Date"
+        FROM tenant t LEFT JOIN property p ON p.id = t.property_id
+        ORDER BY t.id''',
+    'properties': f'''
+        SELECT p.id AS "ID", p.address AS "Address", {_major('p.rent')} AS "Rent",
+               {_major('p.maintenance')} AS "Maintenance", p.created_date AS "Created Date"
+        FROM property p
+        ORDER BY p.id''',
+    'transactions': f'''
+        SELECT tx.id AS "ID", COALESCE(p.address, 'N/A') AS "Property Address",
+               COALESCE(t.name, 'N/A') AS "Tenant Name", tx.type AS "Type", tx.for_month AS "For Month",
+               {_major('tx.amount')} AS "Amount", tx.transaction_date AS "Transaction Date",
+               tx.comments AS "Comments"
+        FROM "transaction" tx
+        LEFT JOIN property p ON p.id = tx.property_id
+        LEFT JOIN tenant t ON t.id = tx.tenant_id
+        ORDER BY tx.id''',
+}
+
+
+def is_postgresql(connection):
+    # Sessions do not expose the dialect directly
+    bind = connection.get_bind() if hasattr(connection, 'get_bind') else connection
+    return bind.dialect.name == 'postgresql'
+
+
+def _cursor(connection):
+    """A DB-API cursor on the connection ``connection`` (a Connection or Session) is using."""
+    if hasattr(connection, 'get_bind'):
+        connection = connection.connection()
+    return connection.connection.driver_connection.cursor()
+
+
+def copy_to(connection, query):
+    """Run ``COPY (query) TO STDOUT`` as CSV with a header row and return the bytes."""
+    statement = f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)'
+    cursor = _cursor(connection)
+    try:
+        if hasattr(cursor, 'copy'):
+            with cursor.copy(statement) as copy:
+                return b''.join(bytes(chunk) for chunk in copy)
+        output = BytesIO()
+        cursor.copy_expert(statement, output)
+        return output.getvalue()
+    finally:
+        cursor.close()
+
+
+def export_csv(connection, report):
+    """The ``report`` ('tenants', 'properties' or 'transactions') CSV, built by the server."""
+    return copy_to(connection, CSV_REPORTS[report])
+
+
+def _text_field(value):
+    if value is None:
+        return r'\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_statement(table, columns):
+    """``COPY ... FROM STDIN`` into ``table`` (quoted) and its quoted ``columns``."""
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+
+def copy_from(connection, statement, rows):
+    """Write ``rows`` (tuples in column order) with a ``copy_statement()``.
+
+    Runs in the connection's transaction; the caller commits.
+    """
+    cursor = _cursor(connection)
+    try:
+        if hasattr(cursor, 'copy'):
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            data = StringIO()
+            for row in rows:
+                data.write('\t'.join(_text_field(value) for value in row) + '\n')
+            data.seek(0)
+            cursor.copy_expert(statement, data)
+    finally:
+        cursor.close()
@@ -0,0 +1,175 @@
+"""On-demand and sampled request profiling with collapsed-stack output.
+
+A ``StackSampler`` runs a background thread that reads the stack of the
+thread serving a request every few milliseconds and counts each distinct
+stack. The result is written in the collapsed format (``a;b;c 12``) that
+flamegraph.pl, speedscope and inferno read directly.
+
+Profiling is triggered either by an admin (``X-Profile`` header or
+``profile`` query parameter equal to ``PROFILE_TOKEN``), in which case the
+profile replaces the response body, or by 1-in-N sampling per route, in
+which case it is written to ``PROFILE_DIR``.
+"""
+
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+DEFAULT_INTERVAL = 0.002
+
+_current = ContextVar('request_profile', default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval."""
+
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = self.finished = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.finished = time.perf_counter()
+        return self
+
+    def collapsed(self):
+        """Return the samples as collapsed stacks, one ``stack count`` per line."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Decide which requests to profile and where their output goes."""
+
+    def __init__(self, token='', sample_every=0, directory='profiles', interval=DEFAULT_INTERVAL):
+        self.token = token
+        self.sample_every = sample_every
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._route_counts = Counter()
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_every > 0
+
+    def is_admin(self, header_value, query_value):
+        supplied = header_value or query_value
+        return bool(self.token and supplied and hmac.compare_digest(supplied, self.token))
+
+    def should_sample(self, route):
+        if self.sample_every <= 0:
+            return False
+        with self._lock:
+            self._route_counts[route] += 1
+            return self._route_counts[route] % self.sample_every == 0
+
+    def mode(self, route, header_value=None, query_value=None):
+        """Return 'admin', 'sampled' or None for a request to ``route``."""
+        if self.is_admin(header_value, query_value):
+            return 'admin'
+        if self.should_sample(route):
+            return 'sampled'
+        return None
+
+    def save(self, sampler, method, route):
+        """Write a sampled profile to the profile directory and return its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        path = os.path.join(self.directory, f'{timestamp}_{method}_{slug}.folded')
+        with open(path, 'w') as f:
+            f.write(sampler.collapsed())
+        return path
+
+
+class RequestProfile:
+    """Profiling state of one request, shared with the thread that runs the handler."""
+
+    def __init__(self, mode, interval=DEFAULT_INTERVAL):
+        self.mode = mode
+        self.interval = interval
+        self.sampler = None
+
+    def start(self):
+        """Sample the calling thread; a no-op if sampling already started."""
+        if self.sampler is None:
+            self.sampler = StackSampler(interval=self.interval).start()
+        return self.sampler
+
+    def stop(self):
+        if self.sampler is not None and self.sampler.finished is None:
+            self.sampler.stop()
+        return self.sampler
+
+
+def activate(profiler, mode):
+    """Mark the current request for profiling and return its state."""
+    profile = RequestProfile(mode, profiler.interval)
+    _current.set(profile)
+    return profile
+
+
+def current():
+    return _current.get()
+
+
+def deactivate():
+    _current.set(None)
+
+
+def call(function, *args, **kwargs):
+    """Run a handler, sampling its thread if the current request is being profiled.
+
+    Used where the handler runs on a different thread than the code that
+    decided to profile (FastAPI runs sync endpoints in a thread pool, and
+    the request context is copied into it).
+    """
+    profile = _current.get()
+    if profile is None or profile.sampler is not None:
+        return function(*args, **kwargs)
+    profile.start()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.stop()
+
+
+def summary(sampler):
+    duration_ms = (sampler.finished - sampler.started) * 1000
+    return f'samples={sampler.samples}; interval_ms={sampler.interval * 1000:g}; duration_ms={duration_ms:.1f}'
@@ -0,0 +1,126 @@
+"""Portfolio reports computed with grouped SQL over the transaction table."""
+
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from . import partitions
+from .money import from_minor
+
+PAYMENT_TYPE = 'payment_received'
+
+AGING_BUCKETS = ['0_30', '31_60', '61_90', '90_plus']
+
+ARREARS_HEADERS = [
+    'ID', 'Name', 'Property Address', 'Charges', 'Payments', 'Outstanding',
+    '0-30 Days', '31-60 Days', '61-90 Days', '90+ Days',
+]
+
+_ARREARS_SQL = {
+    'tenant': """
+        SELECT t.tenant_id AS id, tenant.name AS name, property.address AS property_address,
+               {aggregates}
+        FROM {source} t
+        JOIN tenant ON tenant.id = t.tenant_id
+        LEFT JOIN property ON property.id = tenant.property_id
+        WHERE t.tenant_id IS NOT NULL AND t.transaction_date <= :as_of
+        GROUP BY t.tenant_id, tenant.name, property.address
+    """,
+    'property': """
+        SELECT t.property_id AS id, property.address AS name, property.address AS property_address,
+               {aggregates}
+        FROM {source} t
+        JOIN property ON property.id = t.property_id
+        WHERE t.transaction_date <= :as_of
+        GROUP BY t.property_id, property.address
+    """,
+}
+
+# Charges are aged by the month they apply to; payments are only totalled
+_AGGREGATES = """
+    SUM(CASE WHEN t.type = :payment THEN t.amount ELSE 0 END) AS payments,
+    SUM(CASE WHEN t.type <> :payment THEN t.amount ELSE 0 END) AS charges,
+    SUM(CASE WHEN t.type <> :payment AND t.period_month >= :d30 THEN t.amount ELSE 0 END) AS b0_30,
+    SUM(CASE WHEN t.type <> :payment AND t.period_month < :d30 AND t.period_month >= :d60 THEN t.amount ELSE 0 END) AS b31_60,
+    SUM(CASE WHEN t.type <> :payment AND t.period_month < :d60 AND t.period_month >= :d90 THEN t.amount ELSE 0 END) AS b61_90,
+    SUM(CASE WHEN t.type <> :payment AND (t.period_month < :d90 OR t.period_month IS NULL) THEN t.amount ELSE 0 END) AS b90_plus
+"""
+
+
+def _apply_payments(buckets, payments):
+    """Settle the oldest charges first and return what is still owed per bucket."""
+    remaining = payments
+    for key in reversed(AGING_BUCKETS):
+        settled = min(buckets[key], remaining)
+        buckets[key] -= settled
+        remaining -= settled
+    return buckets
+
+
+def arrears_report(connection, as_of=None, group_by='tenant', include_settled=False):
+    """Compute charges, payments and aged outstanding balances as of a date.
+
+    ``connection`` may be a SQLAlchemy session or connection. All figures come
+    from a single grouped query over integer minor units, so the sums, the
+    settlement and the totals are exact; amounts are returned in major units.
+    Payments are applied to the oldest charges. Balances need the whole
+    history up to ``as_of``, so only later year partitions are skipped.
+    """
+    if group_by not in _ARREARS_SQL:
+        raise ValueError(f"group_by must be one of: {', '.join(_ARREARS_SQL)}")
+    as_of = as_of or date.today()
+    params = {
+        'as_of': as_of.isoformat(),
+        'payment': PAYMENT_TYPE,
+        'd30': (as_of - timedelta(days=30)).isoformat(),
+        'd60': (as_of - timedelta(days=60)).isoformat(),
+        'd90': (as_of - timedelta(days=90)).isoformat(),
+    }
+    source = partitions.source(connection, end=as_of + timedelta(days=1))
+    sql = text(_ARREARS_SQL[group_by].format(aggregates=_AGGREGATES, source=source))
+
+    rows = []
+    totals = dict.fromkeys(['charges', 'payments', 'outstanding'] + AGING_BUCKETS, 0)
+    for record in connection.execute(sql, params):
+        charges = int(record.charges or 0)
+        payments = int(record.payments or 0)
+        outstanding = charges - payments
+        if outstanding <= 0 and not include_settled:
+            continue
+        buckets = _apply_payments({
+            '0_30': int(record.b0_30 or 0),
+            '31_60': int(record.b31_60 or 0),
+            '61_90': int(record.b61_90 or 0),
+            '90_plus': int(record.b90_plus or 0),
+        }, payments)
+        figures = {'charges': charges, 'payments': payments, 'outstanding': outstanding, **buckets}
+        for key, value in figures.items():
+            totals[key] += value
+        rows.append({
+            'id': record.id,
+            'name': record.name,
+            'property_address': record.property_address or 'N/A',
+            'charges': from_minor(charges),
+            'payments': from_minor(payments),
+            'outstanding': from_minor(outstanding),
+            'aging': {key: from_minor(value) for key, value in buckets.items()},
+        })
+
+    rows.sort(key=lambda r: r['outstanding'], reverse=True)
+    return {
+        'as_of': as_of.isoformat(),
+        'group_by': group_by,
+        'rows': rows,
+        'totals': {key: from_minor(value) for key, value in totals.items()},
+    }
+
+
+def arrears_table(report):
+    """Flatten an arrears report into rows matching ARREARS_HEADERS for export."""
+    return [
+        [
+            r['id'], r['name'], r['property_address'], r['charges'], r['payments'], r['outstanding'],
+            *(r['aging'][key] for key in AGING_BUCKETS),
+        ]
+        for r in report['rows']
+    ]
@@ -0,0 +1,202 @@
+"""One database per landlord organization, chosen per request.
+
+When ``ORG_DATABASE_URI`` is set, e.g. ``sqlite:///orgs/{org}.db``, every
+organization keeps its data in its own database, so one owner's exports and
+reports never lock or scan another's. A request names its organization in
+the ``X-Organization`` header or with an ``/orgs/<org>`` path prefix
+(``/orgs/acme/api/tenants``); requests without one use ``DATABASE_URI``.
+
+``EnginePool`` hands out one engine per organization and keeps at most
+``ORG_ENGINE_POOL_SIZE`` of them open, disposing the least recently used.
+The organization of the running request lives in a context variable set by
+each app's middleware (``activate()``), so sessions, the per-process caches
+and the single-flight keys stay separate per organization without passing it
+through every call.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+HEADER = 'X-Organization'
+PATH_PREFIX = '/orgs/'
+DEFAULT_POOL_SIZE = 16
+
+_NAME = re.compile(r'[a-z0-9][a-z0-9_-]{0,62}')
+# Archive files sit next to their database as <name>-archive.db (see common.archive)
+_RESERVED_SUFFIX = '-archive'
+_current = ContextVar('organization', default=None)
+
+
+def validate(org):
+    """Return ``org`` if it is a usable organization name, else raise ValueError."""
+    if not _is_name(org):
+        raise ValueError(f'Invalid organization name: {org!r} (use lowercase letters, digits, - and _)')
+    return org
+
+
+def _is_name(org):
+    return bool(org) and _NAME.fullmatch(org) is not None and not org.endswith(_RESERVED_SUFFIX)
+
+
+def split_path(path):
+    """Split ``/orgs/<org>/rest`` into ``(org, '/rest')``; other paths give ``(None, path)``."""
+    if not path.startswith(PATH_PREFIX):
+        return None, path
+    org, _, rest = path[len(PATH_PREFIX):].partition('/')
+    return org, '/' + rest
+
+
+def database_url(template, org, base_dir=None):
+    """The database URL of ``org``: ``template`` with ``{org}`` filled in.
+
+    Relative SQLite paths are resolved against ``base_dir`` (the instance
+    directory), as the apps do for ``DATABASE_URI``.
+    """
+    url = make_url(template.replace('{org}', validate(org)))
+    if url.get_backend_name() == 'sqlite' and url.database and base_dir and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(base_dir, url.database))
+    return url
+
+
+def existing_orgs(template, base_dir=None):
+    """Organizations with a SQLite database under ``template`` (none for other databases).
+
+    Only templates with ``{org}`` in the file name, not a directory, can be listed.
+    """
+    url = make_url(template)
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        return []
+    path = url.database
+    if base_dir and not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    directory, filename = os.path.split(path)
+    head, found, tail = filename.partition('{org}')
+    if not found or not os.path.isdir(directory):
+        return []
+    names = (
+        entry[len(head):len(entry) - len(tail)] for entry in os.listdir(directory)
+        if entry.startswith(head) and entry.endswith(tail) and len(entry) > len(head) + len(tail)
+    )
+    return sorted(name for name in names if _is_name(name))
+
+
+def activate(org, engine):
+    """Make ``org`` and its engine current; pass the returned token to ``deactivate()``."""
+    return _current.set((org, engine))
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current_org():
+    """Name of the request's organization, or None for the default database."""
+    active = _current.get()
+    return active[0] if active else None
+
+
+def current_engine():
+    """Engine of the request's organization, or None for the default database."""
+    active = _current.get()
+    return active[1] if active else None
+
+
+class EnginePool:
+    """Bounded LRU of per-organization engines.
+
+    ``get(org)`` returns the organization's engine, creating it on first use.
+    SQLite databases must already exist (``manage.py --org <org> db upgrade``
+    creates one), so a mistyped name is rejected instead of creating a new
+    empty database; on PostgreSQL an unknown database fails to connect.
+    ``engine_options`` go to every ``create_engine()`` (see
+    ``common.engines``). When more than ``max_engines`` organizations are
+    active the least recently used engine is disposed; requests still holding
+    it finish normally.
+    """
+
+    def __init__(self, template, max_engines=DEFAULT_POOL_SIZE, base_dir=None, **engine_options):
+        self.template = template
+        self.max_engines = max_engines
+        self.base_dir = base_dir
+        self.engine_options = engine_options
+        self._lock = threading.Lock()
+        self._engines = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Forked workers start without the parent's engines (and its connections)
+        os.register_at_fork(after_in_child=self._forget)
+
+    def get(self, org):
+        with self._lock:
+            engine = self._engines.get(org)
+            if engine is not None:
+                self._engines.move_to_end(org)
+                self.hits += 1
+                return engine
+            self.misses += 1
+
+        url = database_url(self.template, org, self.base_dir)
+        if url.get_backend_name() == 'sqlite' and (not url.database or not os.path.exists(url.database)):
+            raise LookupError(f'Unknown organization: {org}')
+        engine = create_engine(url, **self.engine_options)
+
+        evicted = []
+        with self._lock:
+            if org in self._engines:
+                # Another thread created it meanwhile; keep theirs
+                evicted.append(engine)
+                engine = self._engines[org]
+            else:
+                self._engines[org] = engine
+            while len(self._engines) > self.max_engines:
+                evicted.append(self._engines.popitem(last=False)[1])
+                self.evictions += 1
+        for old in evicted:
+            old.dispose()
+        return engine
+
+    def dispose(self):
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def _forget(self):
+        self._lock = threading.Lock()
+        for engine in self._engines.values():
+            engine.dispose(close=False)
+        self._engines.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': 'org_engines',
+                'max_engines': self.max_engines,
+                'open': list(self._engines),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class PathPrefixMiddleware:
+    """WSGI middleware turning ``/orgs/<org>/...`` into ``/...`` with an ``X-Organization`` header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        org, path = split_path(environ.get('PATH_INFO', ''))
+        if org is not None:
+            environ['PATH_INFO'] = path
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + PATH_PREFIX + org
+            environ['HTTP_X_ORGANIZATION'] = org
+        return self.app(environ, start_response)
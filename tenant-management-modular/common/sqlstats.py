@@ -0,0 +1,244 @@
+"""Per-request SQL query counting, N+1 detection and a slow-query log.
+
+``install()`` hooks ``before_cursor_execute``/``after_cursor_execute`` on every
+engine. While a request is being served, each statement is timed and counted
+under its normalized shape (literals and IN lists collapsed), so the same
+query issued once per row shows up as one shape with a high count.
+
+Statements slower than the slow-query threshold are aggregated by shape in
+``slow_queries`` together with redacted sample parameters and the query plan.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import date, datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('tenant_management.sql')
+
+_current = ContextVar('request_query_stats', default=None)
+_installed = False
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|:\w+|%\(\w+\)s)(?:\s*,\s*(?:\?|:\w+|%\(\w+\)s))*\s*\)')
+
+
+class RepeatedQueryError(RuntimeError):
+    """Raised in strict mode when one statement shape repeats too often in a request."""
+
+
+def normalize(statement):
+    """Reduce a SQL statement to its shape: literals become ``?`` and IN lists ``(...)``."""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _PLACEHOLDER_LIST.sub('(...)', shape)
+
+
+class QueryStats:
+    """Queries seen while serving one request."""
+
+    def __init__(self, threshold=10, strict=False):
+        self.threshold = threshold
+        self.strict = strict
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, shape, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[shape] += 1
+
+    def repeated(self):
+        """Shapes executed more than ``threshold`` times, most frequent first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > self.threshold]
+
+    def server_timing(self):
+        """Value for the ``Server-Timing`` response header."""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries", '
+            f'app;dur={total_ms:.1f}'
+        )
+
+    def as_log(self, method, path, status):
+        return {
+            'event': 'request_sql',
+            'method': method,
+            'path': path,
+            'status': status,
+            'queries': self.count,
+            'sql_ms': round(self.duration * 1000, 2),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'repeated': [{'shape': shape, 'count': n} for shape, n in self.repeated()],
+        }
+
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}(-\d{2})?([ T][\d:.]+)?$')
+
+
+def redact(value):
+    """Keep numbers, dates and booleans; mask free-form strings such as names or passport numbers."""
+    if value is None or isinstance(value, (bool, int, float, date, datetime)):
+        return value
+    if isinstance(value, str):
+        return value if _ISO_DATE.match(value) else f'<redacted {len(value)} chars>'
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f'<{type(value).__name__}>'
+
+
+class SlowQueryLog:
+    """Statements slower than a threshold, aggregated by normalized shape."""
+
+    def __init__(self, threshold_ms=100.0, explain=True, max_shapes=200):
+        # A negative threshold disables the log
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def configure(self, threshold_ms=None, explain=None):
+        if threshold_ms is not None:
+            self.threshold_ms = threshold_ms
+        if explain is not None:
+            self.explain = explain
+
+    def _plan(self, conn, statement, parameters):
+        prefix = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+        except Exception as e:
+            return [f'EXPLAIN failed: {e}']
+        finally:
+            cursor.close()
+
+    def record(self, conn, shape, statement, parameters, executemany, duration):
+        """Aggregate one statement that already exceeded the threshold."""
+        duration_ms = duration * 1000
+        sample = redact(parameters[0] if executemany and parameters else parameters)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            needs_plan = self.explain and not executemany and (entry is None or entry['plan'] is None)
+        plan = self._plan(conn, statement, parameters) if needs_plan else None
+        with self._lock:
+            entry = self._shapes.setdefault(shape, {
+                'shape': shape, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'plan': None,
+            })
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['last_ms'] = duration_ms
+            entry['last_params'] = sample
+            entry['last_seen'] = datetime.now().isoformat(timespec='seconds')
+            if plan is not None:
+                entry['plan'] = plan
+            if len(self._shapes) > self.max_shapes:
+                # Forget the shape that has cost the least in total
+                del self._shapes[min(self._shapes, key=lambda key: self._shapes[key]['total_ms'])]
+        logger.warning(json.dumps({
+            'event': 'slow_query', 'duration_ms': round(duration_ms, 2), 'shape': shape, 'params': sample,
+        }, default=str))
+
+    def top(self, limit=20, order_by='total_ms'):
+        """Worst shapes first by ``total_ms``, ``max_ms`` or ``count``."""
+        with self._lock:
+            entries = [dict(entry) for entry in self._shapes.values()]
+        for entry in entries:
+            entry['mean_ms'] = round(entry['total_ms'] / entry['count'], 2)
+            entry['total_ms'] = round(entry['total_ms'], 2)
+            entry['max_ms'] = round(entry['max_ms'], 2)
+            entry['last_ms'] = round(entry['last_ms'], 2)
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+slow_queries = SlowQueryLog()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and stats.strict:
+        shape = normalize(statement)
+        if stats.shapes[shape] >= stats.threshold:
+            raise RepeatedQueryError(
+                f'Statement executed more than {stats.threshold} times in one request: {shape}'
+            )
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    slow = 0 <= slow_queries.threshold_ms <= duration * 1000
+    if stats is None and not slow:
+        return
+    shape = normalize(statement)
+    if stats is not None:
+        stats.record(shape, duration)
+    if slow:
+        slow_queries.record(conn, shape, statement, parameters, executemany, duration)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    starts = connection.info.get('query_start') if connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def install():
+    """Listen on all engines; safe to call more than once."""
+    global _installed
+    if not _installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _installed = True
+
+
+def begin_request(threshold=10, strict=False):
+    """Start counting queries for the current request; returns its stats."""
+    stats = QueryStats(threshold, strict)
+    _current.set(stats)
+    return stats
+
+
+def current():
+    return _current.get()
+
+
+def end_request(stats, method, path, status):
+    """Stop counting and log a structured summary (a warning when N+1 is suspected)."""
+    _current.set(None)
+    record = stats.as_log(method, path, status)
+    if record['repeated']:
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return record
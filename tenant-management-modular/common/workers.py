@@ -0,0 +1,27 @@
+"""Process-model helpers shared by the production launchers.
+
+A pre-forking server (gunicorn with ``preload_app``) builds the app, and
+with it the SQLAlchemy engine, once in the master and then forks workers.
+Pooled connections opened before the fork would be shared by every child,
+and SQLite or PostgreSQL connections must never be used from two
+processes. ``dispose_after_fork`` gives each child a fresh pool while
+leaving the parent's connections untouched.
+"""
+
+import os
+
+_registered = set()
+
+
+def dispose_after_fork(engine):
+    """Drop ``engine``'s inherited pool in every forked child; safe to call repeatedly."""
+    if id(engine) in _registered:
+        return
+    _registered.add(id(engine))
+    # close=False: the parent still owns those connections, the child just forgets them
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def default_workers():
+    """Two workers per core, capped because SQLite serializes writers anyway."""
+    return min(2 * (os.cpu_count() or 1) + 1, 8)
@@ -2,13 +2,45 @@ import os
 from typing import List
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import make_url
+
+from common import engines
+from common.workers import default_workers
 
 load_dotenv()
 
 class Settings(BaseSettings):
     DATABASE_URI: str = os.getenv("DATABASE_URI", "sqlite:///app.db")
+    # Connection pool per worker for PostgreSQL (see common.engines)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # One database per organization, e.g. sqlite:///orgs/{org}.db (empty: DATABASE_URI only),
+    # and how many organization engines each worker keeps open
+    ORG_DATABASE_URI: str = os.getenv("ORG_DATABASE_URI", "")
+    ORG_ENGINE_POOL_SIZE: int = int(os.getenv("ORG_ENGINE_POOL_SIZE", "16"))
     BACKUP_STORAGE_PATH: str = os.getenv("BACKUP_STORAGE_PATH", ".")
     CORS_ORIGINS: List[str] = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")]
+    PROPERTY_CACHE_TTL: float = float(os.getenv("PROPERTY_CACHE_TTL", "60"))
+    DATA_VERSION_POLL_INTERVAL: float = float(os.getenv("DATA_VERSION_POLL_INTERVAL", "1"))
+    SQL_REPEAT_THRESHOLD: int = int(os.getenv("SQL_REPEAT_THRESHOLD", "10"))
+    SQL_STRICT: bool = os.getenv("SQL_STRICT", "false").lower() == "true"
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_SAMPLE_EVERY: int = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "100"))
+    SLOW_QUERY_EXPLAIN: bool = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    # Production server (serve.py): uvicorn worker processes, sync-endpoint threads per
+    # worker, keep-alive and graceful shutdown seconds, recycling after N requests (0 never)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0")) or default_workers()
+    SERVER_THREADS: int = int(os.getenv("SERVER_THREADS", "40"))
+    SERVER_KEEPALIVE: int = int(os.getenv("SERVER_KEEPALIVE", "5"))
+    SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+    SERVER_MAX_REQUESTS: int = int(os.getenv("SERVER_MAX_REQUESTS", "0"))
 
     @property
     def app_root(self) -> str:
@@ -20,20 +52,19 @@ class Settings(BaseSettings):
         return os.path.join(self.app_root, "instance")
 
     @property
-    def resolved_sqlite_path(self) -> str:
-        """Resolve the absolute sqlite file path following Flask instance convention."""
-        if self.DATABASE_URI.startswith("sqlite:///"):
-            filename = self.DATABASE_URI.replace("sqlite:///", "")
-            # ensure instance directory exists
+    def sqlalchemy_url(self) -> str:
+        """DATABASE_URI with a relative SQLite path resolved against the instance directory, as Flask does."""
+        url = make_url(self.DATABASE_URI)
+        if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:" \
+                and not os.path.isabs(url.database):
             os.makedirs(self.instance_dir, exist_ok=True)
-            abs_path = filename if os.path.isabs(filename) else os.path.join(self.instance_dir, filename)
-            return abs_path
-        return ""
+            url = url.set(database=os.path.join(self.instance_dir, url.database))
+        return url.render_as_string(hide_password=False)
 
-    @property
-    def sqlalchemy_url(self) -> str:
-        if self.DATABASE_URI.startswith("sqlite:///"):
-            return f"sqlite:///{self.resolved_sqlite_path}"
-        return self.DATABASE_URI
+    def engine_options(self, url) -> dict:
+        """``create_engine()`` options for ``url`` with the configured pool."""
+        return engines.engine_options(
+            url, self.DB_POOL_SIZE, self.DB_MAX_OVERFLOW, self.DB_POOL_TIMEOUT, self.DB_POOL_RECYCLE
+        )
 
 settings = Settings()
@@ -1,18 +1,21 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from common import sharding
+from common.workers import dispose_after_fork
 from .config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **settings.engine_options(SQLALCHEMY_DATABASE_URL))
+# Workers forked from a process that already used the engine start with their own pool
+dispose_after_fork(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
-    db = SessionLocal()
+    # Bound to the request's organization database when the router picked one
+    db = SessionLocal(bind=sharding.current_engine() or engine)
     try:
         yield db
     finally:
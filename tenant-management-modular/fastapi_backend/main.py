@@ -1,18 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+import anyio
 import csv
-from io import StringIO
-import os
-import shutil
-from datetime import datetime
+import hmac
+from contextlib import asynccontextmanager
+from io import StringIO, BytesIO
+import time
+from datetime import date
 from fastapi import Query
-from sqlalchemy import desc
 
+from common import alerts, backups, ledger, metrics, partitions, pgcopy, profiling, sharding, sqlstats
+from common.cache import DataVersionPoller, ReadThroughCache, invalidate_on_commit
+from common.coalesce import SingleFlight
+from common.reports import ARREARS_HEADERS, arrears_report, arrears_table
 from .config import settings
-from .database import Base, engine, get_db
+from .database import engine, get_db
 from . import models
 from .schemas import (
     TenantCreate, TenantUpdate, TenantOut,
@@ -20,10 +27,13 @@ from .schemas import (
     TransactionCreate, TransactionUpdate, TransactionOut
 )
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync endpoints run on AnyIO's thread pool; size it per worker
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.SERVER_THREADS
+    yield
 
-app = FastAPI(title="Tenant Management API (FastAPI)")
+app = FastAPI(title="Tenant Management API (FastAPI)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,75 +43,189 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from sqlalchemy.orm import Session
-from typing import List
-import csv
-from io import StringIO
-import os
-import shutil
-from datetime import datetime
-from fastapi import Query
-from sqlalchemy import desc
+# Admin-triggered and 1-in-N sampled profiling. Sync endpoints run in a thread pool,
+# so the route class samples the worker thread that actually executes the handler.
+class ProfiledRoute(APIRoute):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        self.dependant.call = lambda **values: profiling.call(call, **values)
 
-from .config import settings
-from .database import Base, engine, get_db
-from . import models
-from .schemas import (
-    TenantCreate, TenantUpdate, TenantOut,
-    PropertyCreate, PropertyUpdate, PropertyOut,
-    TransactionCreate, TransactionUpdate, TransactionOut
-)
+app.router.route_class = ProfiledRoute
+profiler = profiling.RequestProfiler(settings.PROFILE_TOKEN, settings.PROFILE_SAMPLE_EVERY, settings.PROFILE_DIR)
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+def _route_path(request: Request) -> str:
+    for route in app.router.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"
 
-app = FastAPI(title="Tenant Management API (FastAPI)")
+@app.middleware("http")
+async def request_profile(request: Request, call_next):
+    if not profiler.enabled:
+        return await call_next(request)
+    route = _route_path(request)
+    mode = profiler.mode(route, request.headers.get("X-Profile"), request.query_params.get("profile"))
+    if not mode:
+        return await call_next(request)
+    profile = profiling.activate(profiler, mode)
+    try:
+        response = await call_next(request)
+    finally:
+        profiling.deactivate()
+        sampler = profile.stop()
+    if sampler is None:
+        return response
+    if mode == "admin":
+        return Response(sampler.collapsed(), media_type="text/plain", headers={
+            "X-Profile": profiling.summary(sampler),
+            "X-Profiled-Status": str(response.status_code),
+        })
+    profiler.save(sampler, request.method, route)
+    return response
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Count and time the SQL issued by each request and export it with the HTTP metrics
+sqlstats.install()
+sqlstats.slow_queries.configure(settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN)
+metrics.watch_sqlite_engine(engine)
 
-# Tenant Transactions Summary Endpoint
-@app.get("/api/tenants/{tenant_id}/transactions")
-def get_tenant_transactions(tenant_id: int, db: Session = Depends(get_db)):
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    metrics.http_in_flight.inc()
+    stats = sqlstats.begin_request(settings.SQL_REPEAT_THRESHOLD, settings.SQL_STRICT)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = stats.server_timing()
+        response.headers["X-Query-Count"] = str(stats.count)
+        return response
+    finally:
+        metrics.http_in_flight.dec()
+        sqlstats.end_request(stats, request.method, request.url.path, status)
+        route = request.scope.get("route")
+        metrics.observe_request(
+            request.method, route.path if route else "unmatched", status,
+            time.perf_counter() - stats.started, stats,
+        )
+
+# Route each request to its organization's database (header or /orgs/<org> prefix).
+# Registered last so it runs first and the other middleware see the stripped path.
+org_engines = None
+if settings.ORG_DATABASE_URI:
+    org_engines = sharding.EnginePool(
+        settings.ORG_DATABASE_URI, settings.ORG_ENGINE_POOL_SIZE, settings.instance_dir,
+        **settings.engine_options(settings.ORG_DATABASE_URI),
+    )
+
+    @app.middleware("http")
+    async def route_organization(request: Request, call_next):
+        org, path = sharding.split_path(request.scope["path"])
+        if org is not None:
+            request.scope["path"] = path
+            request.scope["root_path"] = request.scope.get("root_path", "") + sharding.PATH_PREFIX + org
+        else:
+            org = request.headers.get(sharding.HEADER)
+        if not org:
+            return await call_next(request)
+        try:
+            engine = org_engines.get(sharding.validate(org))
+        except LookupError as e:
+            return JSONResponse({"detail": str(e)}, status_code=404)
+        except ValueError as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+        token = sharding.activate(org, engine)
+        try:
+            return await call_next(request)
+        finally:
+            sharding.deactivate(token)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Per-process property cache, dropped whenever a Property write is committed
+property_cache = ReadThroughCache("properties", ttl=settings.PROPERTY_CACHE_TTL)
+invalidate_on_commit(models.Property, property_cache)
+
+# Writes made by other workers show up as a bumped property version
+data_versions = DataVersionPoller(interval=settings.DATA_VERSION_POLL_INTERVAL)
+data_versions.watch("property", property_cache)
+
+# Identical report, ledger and analytics requests running at once share one computation;
+# any committed write starts a new generation so later requests see it
+request_flights = SingleFlight("requests")
+for _model in (models.Tenant, models.Property, models.Transaction):
+    invalidate_on_commit(_model, request_flights)
+
+def _load_property_snapshot(db: Session):
+    props = db.query(models.Property).order_by(models.Property.id).all()
+    return {
+        "properties": [PropertyOut.model_validate(p).model_dump() for p in props],
+        "addresses": {p.id: p.address for p in props},
+    }
+
+def property_addresses(db: Session):
+    data_versions.poll(db.get_bind())
+    return property_cache.get(_load_property_snapshot, db)["addresses"]
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    stats = [dict(property_cache.stats(), data_version=data_versions.stats()), request_flights.stats()]
+    if org_engines is not None:
+        stats.append(org_engines.stats())
+    return stats
+
+def _tenant_ledger(db: Session, tenant_id: int):
     tenant = db.query(models.Tenant).get(tenant_id)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
-    transactions = db.query(models.Transaction).filter(models.Transaction.tenant_id == tenant_id).order_by(desc(models.Transaction.transaction_date)).all()
+    transactions = partitions.load(db, models.Transaction, {'tenant_id': tenant_id}, 'transaction_date DESC')
+    addresses = property_addresses(db)
     transactions_list = []
-    total_balance = 0.0
     for tx in transactions:
         tx_dict = {
             'id': tx.id,
-            'property_address': tx.property.address if tx.property else None,
+            'property_address': addresses.get(tx.property_id),
             'type': tx.type,
             'for_month': tx.for_month,
+            'period_month': tx.period_month,
             'amount': tx.amount,
             'transaction_date': tx.transaction_date.isoformat() if tx.transaction_date else None,
             'comments': tx.comments
         }
         transactions_list.append(tx_dict)
-        if tx.type == 'payment_received':
-            total_balance += tx.amount
-        else:
-            total_balance -= tx.amount
+    total_balance = ledger.get_balance(db, 'tenant', tenant_id)['balance']
     return { 'transactions': transactions_list, 'total': total_balance }
 
+def _balance(db: Session, entity_type: str, entity_id: int):
+    model = models.Tenant if entity_type == "tenant" else models.Property
+    if not db.query(model).get(entity_id):
+        raise HTTPException(status_code=404, detail=f"{entity_type.capitalize()} not found")
+    return ledger.get_balance(db, entity_type, entity_id)
+
+# Tenant Transactions Summary Endpoint
+@app.get("/api/tenants/{tenant_id}/transactions")
+def get_tenant_transactions(tenant_id: int, db: Session = Depends(get_db)):
+    return request_flights.do(("tenant_transactions", tenant_id), _tenant_ledger, db, tenant_id)
+
+@app.get("/api/tenants/{tenant_id}/balance")
+def get_tenant_balance(tenant_id: int, db: Session = Depends(get_db)):
+    return request_flights.do(("tenant_balance", tenant_id), _balance, db, "tenant", tenant_id)
+
+@app.get("/api/properties/{property_id}/balance")
+def get_property_balance(property_id: int, db: Session = Depends(get_db)):
+    return request_flights.do(("property_balance", property_id), _balance, db, "property", property_id)
+
 # Tenants
 @app.get("/api/tenants", response_model=List[TenantOut])
 def list_tenants(db: Session = Depends(get_db)):
     tenants = db.query(models.Tenant).all()
+    addresses = property_addresses(db)
     # Attach property_address for each tenant
     result = []
     for t in tenants:
-        property_address = t.property.address if t.property else None
+        property_address = addresses.get(t.property_id)
         t_out = TenantOut(
             **{k: getattr(t, k) for k in TenantOut.__fields__ if k not in ['property_address']},
             property_address=property_address
@@ -147,7 +271,8 @@ def delete_tenant(tenant_id: int, db: Session = Depends(get_db)):
 # Properties
 @app.get("/api/properties", response_model=List[PropertyOut])
 def list_properties(db: Session = Depends(get_db)):
-    return db.query(models.Property).all()
+    data_versions.poll(db.get_bind())
+    return property_cache.get(_load_property_snapshot, db)["properties"]
 
 @app.post("/api/properties", response_model=PropertyOut, status_code=201)
 def create_property(payload: PropertyCreate, db: Session = Depends(get_db)):
@@ -187,7 +312,7 @@ def delete_property(property_id: int, db: Session = Depends(get_db)):
 # Transactions
 @app.get("/api/transactions", response_model=List[TransactionOut])
 def list_transactions(db: Session = Depends(get_db)):
-    return db.query(models.Transaction).all()
+    return partitions.load(db, models.Transaction)
 
 @app.post("/api/transactions", response_model=TransactionOut, status_code=201)
 def create_transaction(payload: TransactionCreate, db: Session = Depends(get_db)):
@@ -199,13 +324,14 @@ def create_transaction(payload: TransactionCreate, db: Session = Depends(get_db)
 
 @app.get("/api/transactions/{transaction_id}", response_model=TransactionOut)
 def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    txn = db.query(models.Transaction).get(transaction_id)
+    txn = partitions.get(db, models.Transaction, transaction_id)
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return txn
 
 @app.put("/api/transactions/{transaction_id}", response_model=TransactionOut)
 def update_transaction(transaction_id: int, payload: TransactionUpdate, db: Session = Depends(get_db)):
+    partitions.promote(db, transaction_id)
     txn = db.query(models.Transaction).get(transaction_id)
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -217,6 +343,7 @@ def update_transaction(transaction_id: int, payload: TransactionUpdate, db: Sess
 
 @app.delete("/api/transactions/{transaction_id}")
 def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
+    partitions.promote(db, transaction_id)
     txn = db.query(models.Transaction).get(transaction_id)
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -225,15 +352,20 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
     return {"message": "Transaction deleted"}
 
 # Reports (CSV)
-@app.get("/api/reports/tenants_csv")
-def report_tenants_csv(db: Session = Depends(get_db)):
+# Report bodies are built as strings so coalesced requests can each stream their own copy;
+# on PostgreSQL the server writes the CSV with COPY (as bytes)
+@metrics.timed_report("tenants_csv")
+def _tenants_csv(db: Session):
+    if pgcopy.is_postgresql(db):
+        return pgcopy.export_csv(db, "tenants")
     tenants = db.query(models.Tenant).all()
+    addresses = property_addresses(db)
     headers = [
         'ID','Name','Property Address','Passport','Passport Validity','Aadhar No','Employment Details','Permanent Address','Contact No','Emergency Contact No','Rent','Security','Move In Date','Contract Start Date','Contract Expiry Date','Created Date'
     ]
     rows = []
     for t in tenants:
-        prop_addr = t.property.address if t.property else 'N/A'
+        prop_addr = addresses.get(t.property_id, 'N/A')
         rows.append([
             t.id, t.name, prop_addr, t.passport, t.passport_validity, t.aadhar_no, t.employment_details,
             t.permanent_address, t.contact_no, t.emergency_contact_no, t.rent, t.security,
@@ -243,54 +375,180 @@ def report_tenants_csv(db: Session = Depends(get_db)):
     writer = csv.writer(output)
     writer.writerow(headers)
     writer.writerows(rows)
-    output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=tenants_report.csv"})
+    return output.getvalue()
 
-@app.get("/api/reports/properties_csv")
-def report_properties_csv(db: Session = Depends(get_db)):
+@metrics.timed_report("properties_csv")
+def _properties_csv(db: Session):
+    if pgcopy.is_postgresql(db):
+        return pgcopy.export_csv(db, "properties")
     props = db.query(models.Property).all()
     headers = ['ID','Address','Rent','Maintenance','Created Date']
     rows = [[p.id, p.address, p.rent, p.maintenance, p.created_date] for p in props]
-    output = StringIO(); writer = csv.writer(output); writer.writerow(headers); writer.writerows(rows); output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=properties_report.csv"})
+    output = StringIO(); writer = csv.writer(output); writer.writerow(headers); writer.writerows(rows)
+    return output.getvalue()
 
-@app.get("/api/reports/transactions_csv")
-def report_transactions_csv(db: Session = Depends(get_db)):
-    txns = db.query(models.Transaction).all()
+@metrics.timed_report("transactions_csv")
+def _transactions_csv(db: Session):
+    if pgcopy.is_postgresql(db):
+        return pgcopy.export_csv(db, "transactions")
+    txns = partitions.load(db, models.Transaction, options=[selectinload(models.Transaction.tenant)])
+    addresses = property_addresses(db)
     headers = ['ID','Property Address','Tenant Name','Type','For Month','Amount','Transaction Date','Comments']
     rows = []
     for t in txns:
         rows.append([
-            t.id, t.property.address if t.property else 'N/A', t.tenant.name if t.tenant else 'N/A',
+            t.id, addresses.get(t.property_id, 'N/A'), t.tenant.name if t.tenant else 'N/A',
             t.type, t.for_month, t.amount, t.transaction_date, t.comments
         ])
-    output = StringIO(); writer = csv.writer(output); writer.writerow(headers); writer.writerows(rows); output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=transactions_report.csv"})
+    output = StringIO(); writer = csv.writer(output); writer.writerow(headers); writer.writerows(rows)
+    return output.getvalue()
+
+@app.get("/api/reports/tenants_csv")
+def report_tenants_csv(db: Session = Depends(get_db)):
+    body = request_flights.do(("tenants_csv",), _tenants_csv, db)
+    return StreamingResponse(iter([body]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=tenants_report.csv"})
+
+@app.get("/api/reports/properties_csv")
+def report_properties_csv(db: Session = Depends(get_db)):
+    body = request_flights.do(("properties_csv",), _properties_csv, db)
+    return StreamingResponse(iter([body]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=properties_report.csv"})
+
+@app.get("/api/reports/transactions_csv")
+def report_transactions_csv(db: Session = Depends(get_db)):
+    body = request_flights.do(("transactions_csv",), _transactions_csv, db)
+    return StreamingResponse(iter([body]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=transactions_report.csv"})
+
+@metrics.timed_report("arrears")
+def _arrears(db: Session, as_of: date, group_by: str, include_settled: bool, format: str):
+    report = arrears_report(db, as_of, group_by, include_settled)
+    if format == "csv":
+        output = StringIO(); writer = csv.writer(output); writer.writerow(ARREARS_HEADERS); writer.writerows(arrears_table(report))
+        return report, output.getvalue()
+    if format == "xlsx":
+        from openpyxl import Workbook
+        wb = Workbook(); ws = wb.active; ws.title = "Arrears"
+        ws.append(ARREARS_HEADERS)
+        for row in arrears_table(report):
+            ws.append(row)
+        output = BytesIO(); wb.save(output)
+        return report, output.getvalue()
+    return report, None
+
+@app.get("/api/reports/arrears")
+def report_arrears(
+    as_of: date = Query(default_factory=date.today),
+    group_by: str = Query("tenant", pattern="^(tenant|property)$"),
+    include_settled: bool = False,
+    format: str = Query("json", pattern="^(json|csv|xlsx)$"),
+    db: Session = Depends(get_db),
+):
+    """Outstanding balances per tenant or property with aging buckets."""
+    report, body = request_flights.do(
+        ("arrears", as_of, group_by, include_settled, format),
+        _arrears, db, as_of, group_by, include_settled, format,
+    )
+    filename = f"arrears_{group_by}_{report['as_of']}"
+    if format == "csv":
+        return StreamingResponse(iter([body]), media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={filename}.csv"})
+    if format == "xlsx":
+        return StreamingResponse(BytesIO(body), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"})
+    return report
+
+# Analytics (common.analytics imports NumPy, so it is loaded on the first analytics request)
+ANALYTICS_REPORTS = {
+    "collections": "monthly_collections",
+    "rent_roll": "rent_roll",
+    "occupancy": "occupancy",
+}
+
+@app.get("/api/analytics/{report}")
+def get_analytics(
+    report: str,
+    start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+):
+    """Monthly portfolio series; optional start and end as YYYY-MM."""
+    if report not in ANALYTICS_REPORTS:
+        raise HTTPException(status_code=404, detail="Invalid analytics report")
+    from common import analytics
+    try:
+        return request_flights.do(
+            ("analytics", report, start, end), getattr(analytics, ANALYTICS_REPORTS[report]), db, start, end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Alerts
+@app.get("/api/alerts/expiring")
+def get_expiring(within_days: int = 30, db: Session = Depends(get_db)):
+    return alerts.expiring(db, within_days)
+
+@app.get("/api/alerts")
+def get_alerts(include_acknowledged: bool = False, db: Session = Depends(get_db)):
+    return alerts.list_alerts(db, include_acknowledged)
+
+@app.post("/api/alerts/scan")
+def scan_alerts(db: Session = Depends(get_db)):
+    inserted = alerts.scan(db)
+    db.commit()
+    return inserted
+
+@app.post("/api/alerts/{alert_id}/acknowledge")
+def acknowledge_alert(alert_id: int, db: Session = Depends(get_db)):
+    if not alerts.acknowledge(db, alert_id):
+        raise HTTPException(status_code=404, detail="Alert not found")
+    db.commit()
+    return {"message": "Alert acknowledged"}
+
+# Admin
+def require_admin(x_admin_token: str = Header("")):
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+def get_slow_queries(
+    limit: int = 20,
+    order_by: str = Query("total_ms", pattern="^(total_ms|max_ms|count)$"),
+):
+    """Slowest statement shapes seen by this worker."""
+    return {
+        "threshold_ms": sqlstats.slow_queries.threshold_ms,
+        "queries": sqlstats.slow_queries.top(limit, order_by),
+    }
+
+@app.delete("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+def reset_slow_queries():
+    sqlstats.slow_queries.reset()
+    return {"message": "Slow-query log cleared"}
 
 # Backup
 @app.get("/api/backup")
-def backup_database():
-    if not settings.sqlalchemy_url.startswith("sqlite"):
-        raise HTTPException(status_code=400, detail="Backup only supported for SQLite")
-    db_path = settings.resolved_sqlite_path
-    if not os.path.exists(db_path):
-        raise HTTPException(status_code=404, detail="Database file not found")
-    os.makedirs(settings.BACKUP_STORAGE_PATH, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_filename = f"app_backup_{timestamp}.db"
-    backup_path = os.path.join(settings.BACKUP_STORAGE_PATH, backup_filename)
-    shutil.copy2(db_path, backup_path)
+def backup_database(db: Session = Depends(get_db)):
+    """File copy of a SQLite database, pg_dump archive of a PostgreSQL one."""
+    started = time.perf_counter()
+    try:
+        backup_path, backup_filename = backups.backup_database(
+            db.get_bind().url, settings.BACKUP_STORAGE_PATH, sharding.current_org() or "app"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    metrics.backup_duration.observe(time.perf_counter() - started)
     return FileResponse(backup_path, media_type="application/octet-stream", filename=backup_filename)
 
-@app.get("/api/properties/{property_id}/transactions")
-def get_property_transactions(property_id: int, db: Session = Depends(get_db)):
-    """Fetch all transactions for a specific property and calculate the total balance."""
+def _property_ledger(db: Session, property_id: int):
     prop = db.query(models.Property).get(property_id)
     if not prop:
         raise HTTPException(status_code=404, detail="Property not found")
-    transactions = db.query(models.Transaction).filter(models.Transaction.property_id == property_id).order_by(desc(models.Transaction.transaction_date)).all()
+    transactions = partitions.load(
+        db, models.Transaction, {'property_id': property_id}, 'transaction_date DESC',
+        options=[selectinload(models.Transaction.tenant)],
+    )
     transactions_list = []
-    total_balance = 0.0
     for tx in transactions:
         tx_dict = {
             'id': tx.id,
@@ -300,6 +558,7 @@ def get_property_transactions(property_id: int, db: Session = Depends(get_db)):
             'tenant_name': tx.tenant.name if tx.tenant else None,
             'type': tx.type,
             'for_month': tx.for_month,
+            'period_month': tx.period_month,
             'amount': tx.amount,
             'transaction_date': tx.transaction_date,
             'comments': tx.comments,
@@ -309,8 +568,10 @@ def get_property_transactions(property_id: int, db: Session = Depends(get_db)):
             'last_updated_by': tx.last_updated_by
         }
         transactions_list.append(tx_dict)
-        if tx.type == 'payment_received':
-            total_balance += tx.amount
-        else:
-            total_balance -= tx.amount
+    total_balance = ledger.get_balance(db, 'property', property_id)['balance']
     return { 'transactions': transactions_list, 'total': total_balance }
+
+@app.get("/api/properties/{property_id}/transactions")
+def get_property_transactions(property_id: int, db: Session = Depends(get_db)):
+    """Fetch all transactions for a specific property and calculate the total balance."""
+    return request_flights.do(("property_transactions", property_id), _property_ledger, db, property_id)
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from common import ledger
+from common.cache import track_data_versions
+from common.money import Money
+from common.periods import period_month
 from .database import Base
 
 class BaseMixin:
@@ -14,8 +18,8 @@ class Property(Base, BaseMixin):
 
     id = Column(Integer, primary_key=True, index=True)
     address = Column(String(255), nullable=False)
-    rent = Column(Float, default=0.0)
-    maintenance = Column(Float, default=0.0)
+    rent = Column(Money, default=0.0)
+    maintenance = Column(Money, default=0.0)
 
     tenants = relationship("Tenant", back_populates="property")
     transactions = relationship("Transaction", back_populates="property")
@@ -27,17 +31,17 @@ class Tenant(Base, BaseMixin):
     name = Column(String(100), nullable=False)
     property_id = Column(Integer, ForeignKey("property.id"), nullable=True)
     passport = Column(String(100))
-    passport_validity = Column(Date)
+    passport_validity = Column(Date, index=True)
     aadhar_no = Column(String(100))
     employment_details = Column(String(255))
     permanent_address = Column(String(255))
     contact_no = Column(String(20))
     emergency_contact_no = Column(String(20))
-    rent = Column(Float, default=0.0)
-    security = Column(Float, default=0.0)
+    rent = Column(Money, default=0.0)
+    security = Column(Money, default=0.0)
     move_in_date = Column(Date)
     contract_start_date = Column(Date)
-    contract_expiry_date = Column(Date)
+    contract_expiry_date = Column(Date, index=True)
 
     property = relationship("Property", back_populates="tenants")
     transactions = relationship("Transaction", back_populates="tenant")
@@ -50,9 +54,64 @@ class Transaction(Base, BaseMixin):
     tenant_id = Column(Integer, ForeignKey("tenant.id"))
     type = Column(String(50), nullable=False)
     for_month = Column(String(20))
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)
     transaction_date = Column(Date, nullable=False)
     comments = Column(String(255))
+    period_month = Column(Date)
+
+    __table_args__ = (
+        Index("ix_transaction_property_period", "property_id", "period_month"),
+        Index("ix_transaction_tenant_period", "tenant_id", "period_month"),
+    )
 
     property = relationship("Property", back_populates="transactions")
     tenant = relationship("Tenant", back_populates="transactions")
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def set_period_month(mapper, connection, target):
+    target.period_month = period_month(target.for_month, target.transaction_date)
+
+ledger.track(Transaction)
+
+class LedgerBalance(Base):
+    __tablename__ = "ledger_balance"
+
+    entity_type = Column(String(10), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    charges = Column(Money, nullable=False, default=0.0)
+    payments = Column(Money, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+class LedgerMonthBalance(Base):
+    __tablename__ = "ledger_month_balance"
+
+    entity_type = Column(String(10), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    period_month = Column(Date, primary_key=True)
+    charges = Column(Money, nullable=False, default=0.0)
+    payments = Column(Money, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+class ExpiryAlert(Base):
+    __tablename__ = "expiry_alert"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenant.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    expiry_date = Column(Date, nullable=False)
+    threshold_days = Column(Integer, nullable=False)
+    created_date = Column(DateTime, server_default=func.now())
+    acknowledged = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "kind", "expiry_date", "threshold_days"),
+    )
+
+class DataVersion(Base):
+    """Write counter per entity type, bumped in the same transaction as each write."""
+    __tablename__ = "data_version"
+    entity = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+track_data_versions({"property": Property, "tenant": Tenant, "transaction": Transaction})
@@ -88,6 +88,7 @@ class TransactionUpdate(BaseModel):
 
 class TransactionOut(TransactionBase):
     id: int
+    period_month: Optional[date] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the Tenant Management System (Modular Version)
+
+Usage:
+    python manage.py db upgrade        # create missing tables and apply pending migrations
+    python manage.py db status         # list applied and pending migrations
+    python manage.py load dump.sql     # restore a SQLite .dump or CSV report exports into an empty database
+    python manage.py archive run       # move transactions of closed years to the archive file
+    python manage.py archive status    # show what the archive holds
+    python manage.py partition split   # move transactions of closed years into per-year tables
+    python manage.py partition status  # list the year tables and the ranges they hold
+    python manage.py ledger verify     # report drift between stored and recomputed balances
+    python manage.py ledger rebuild    # recompute all stored balances from scratch
+    python manage.py alerts scan       # record newly crossed expiry thresholds (run daily from cron)
+
+With one database per organization (ORG_DATABASE_URI), pass --org <name> to
+act on that organization's database (``--org acme db upgrade`` creates it),
+or --all-orgs to run the command for every existing organization.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from common import alerts, archive, ledger, partitions, sharding
+from common.bulkload import CSV_TABLE_ORDER, DEFAULT_BATCH_SIZE, Loader, csv_table
+from common.migrations import MIGRATIONS, add_transaction_period_month, applied_versions, bootstrap
+
+
+def get_engine(database_uri=None):
+    """Create an engine for the configured database (or an explicit URI)."""
+    if database_uri is None:
+        # pydantic-settings costs ~150 ms to import; skip it when the URI is given
+        from fastapi_backend.config import settings
+        database_uri = settings.sqlalchemy_url
+    return create_engine(database_uri)
+
+
+def upgrade_database(database_uri=None):
+    """Create missing tables and apply pending migrations; safe to run on every deploy."""
+    from fastapi_backend.models import Base
+    engine = get_engine(database_uri)
+    applied = bootstrap(engine, Base.metadata)
+    engine.dispose()
+    return applied
+
+
+def cmd_db(args):
+    """Bring the database schema up to date or report its version."""
+    if args.action == 'status':
+        engine = get_engine(args.database_uri)
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, step in MIGRATIONS:
+            state = f"applied {done[version]:%Y-%m-%d %H:%M}" if version in done else "pending"
+            print(f"  {version:4} {step.__name__:40} {state}")
+        pending = sum(1 for version, _ in MIGRATIONS if version not in done)
+        print(f"{pending} pending migration(s).")
+        return 1 if pending else 0
+    for version, name in upgrade_database(args.database_uri):
+        print(f"  applied {version:4} {name}")
+    print("Database schema is up to date.")
+    return 0
+
+
+def restore_database(paths, database_uri=None, batch_size=DEFAULT_BATCH_SIZE, upgrade=True, progress=None):
+    """Bulk load dumps, then CSV exports (properties before tenants before transactions).
+
+    With ``upgrade`` the schema is created or upgraded afterwards and the
+    derived data (``period_month``, ledger balances) is rebuilt from the rows.
+    """
+    dumps = [path for path in paths if not path.lower().endswith('.csv')]
+    csvs = []
+    for path in paths:
+        if path.lower().endswith('.csv'):
+            with open(path, newline='', encoding='utf-8') as f:
+                csvs.append((csv_table(next(csv.reader(f))), path))
+    csvs.sort(key=lambda item: CSV_TABLE_ORDER.index(item[0]))
+
+    from fastapi_backend.models import Base
+    engine = get_engine(database_uri)
+    if csvs and upgrade and not dumps:
+        # CSV exports carry no schema; create it from the models first
+        bootstrap(engine, Base.metadata)
+    loader = Loader(engine, batch_size=batch_size, progress=progress)
+    try:
+        for path in dumps:
+            loader.load_dump(path)
+        for table, path in csvs:
+            loader.load_csv(path, table)
+        report = loader.finish()
+    finally:
+        loader.close()
+
+    if upgrade and report['integrity'] == 'ok':
+        bootstrap(engine, Base.metadata)
+        with engine.connect() as conn:
+            add_transaction_period_month(conn)
+            # Ledger tables restored from the same dump are already consistent
+            if not {'ledger_balance', 'ledger_month_balance'} <= set(report['rows']):
+                ledger.rebuild(conn)
+            conn.commit()
+    engine.dispose()
+    return report
+
+
+def cmd_load(args):
+    """Restore a database from SQL dumps and CSV exports."""
+    def progress(counts):
+        print("\r  " + ", ".join(f"{table} {count:,}" for table, count in counts.items()), end='', flush=True)
+
+    try:
+        report = restore_database(args.files, args.database_uri, args.batch_size, not args.no_upgrade, progress)
+    except (OSError, ValueError) as e:
+        print(f"\nLoad failed: {e}")
+        return 1
+    print()
+    total = sum(report['rows'].values())
+    print(f"Loaded {total:,} rows into {len(report['rows'])} table(s) in {report['seconds']}s.")
+    print(f"Integrity check: {report['integrity']}")
+    if report['foreign_key_violations']:
+        print(f"Warning: {report['foreign_key_violations']} row(s) reference missing parents "
+              "(see PRAGMA foreign_key_check).")
+    return 0 if report['integrity'] == 'ok' else 1
+
+
+def print_archive(state):
+    print(f"Archive {state.path}: {state.row_count:,} transaction(s) dated "
+          f"{state.first_transaction_date} to {state.last_transaction_date} (cutoff {state.cutoff}), "
+          f"updated {state.archived_at:%Y-%m-%d %H:%M}")
+
+
+def cmd_archive(args):
+    """Move transactions before a cutoff to the archive database, or describe it."""
+    engine = get_engine(args.database_uri)
+    with engine.connect() as conn:
+        state = archive.get_state(conn)
+    if args.action == 'status':
+        if state is None:
+            print("No transactions are archived.")
+        else:
+            print_archive(state)
+        return 0
+    if args.before:
+        before = date.fromisoformat(args.before)
+    else:
+        before = date(date.today().year - args.keep_years, 1, 1)
+    path = args.path or (state.path if state else archive.default_path(engine.url.database))
+
+    def progress(moved):
+        if moved and moved % (args.batch_size * 20) == 0:
+            print(f"  {moved:,} transactions moved", file=sys.stderr)
+
+    try:
+        state = partitions.archive_transactions(engine, path, before, args.batch_size, progress)
+    except ValueError as e:
+        print(f"Archive failed: {e}", file=sys.stderr)
+        return 1
+    print_archive(state)
+    return 0
+
+
+def cmd_partition(args):
+    """Split transactions of closed years into per-year tables, or list them."""
+    engine = get_engine(args.database_uri)
+    if args.action == 'split':
+        def progress(moved):
+            if moved and moved % (args.batch_size * 20) == 0:
+                print(f"  {moved:,} transactions moved", file=sys.stderr)
+
+        try:
+            partitions.split(engine, args.through_year, args.batch_size, progress)
+        except ValueError as e:
+            print(f"Partitioning failed: {e}", file=sys.stderr)
+            return 1
+    with engine.connect() as conn:
+        rows = partitions.get_partitions(conn)
+        live = conn.exec_driver_sql(f'SELECT COUNT(*) FROM {archive.TABLE}').scalar()
+    for row in rows:
+        print(f"  {row.table_name:18} {row.row_count:>10,} transaction(s) dated "
+              f"{row.first_transaction_date} to {row.last_transaction_date}, "
+              f"months {row.first_period_month} to {row.last_period_month}")
+    print(f"{len(rows)} year partition(s); {live:,} transaction(s) in the live table.")
+    return 0
+
+
+def print_drift(drift):
+    for item in drift:
+        print(f"  {item['table']} {item['key']}: expected={item['expected']} stored={item['stored']}")
+
+
+def cmd_ledger(args):
+    """Verify or rebuild the materialized ledger balances."""
+    engine = get_engine(args.database_uri)
+    with engine.begin() as conn:
+        if args.action == 'verify':
+            drift = ledger.verify(conn)
+        else:
+            drift = ledger.rebuild(conn)
+    if drift:
+        print(f"Found {len(drift)} drifted balance(s):")
+        print_drift(drift)
+    else:
+        print("Ledger balances match the transaction table.")
+    if args.action == 'rebuild':
+        print("Ledger balances rebuilt.")
+        return 0
+    return 1 if drift else 0
+
+
+def cmd_alerts(args):
+    """Record alerts for contracts and passports that crossed a threshold."""
+    engine = get_engine(args.database_uri)
+    with engine.begin() as conn:
+        inserted = alerts.scan(conn)
+    for alert in inserted:
+        print(f"  {alert['kind']} of {alert['tenant_name']} (#{alert['tenant_id']}) expires "
+              f"{alert['expiry_date']} ({alert['days_left']} days, threshold {alert['threshold_days']})")
+    print(f"{len(inserted)} new alert(s) recorded.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tenant Management maintenance commands")
+    parser.add_argument('--database-uri', help="SQLAlchemy URL (defaults to DATABASE_URI)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--org', help="Use this organization's database (ORG_DATABASE_URI)")
+    target.add_argument('--all-orgs', action='store_true', help="Run the command for every organization database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    db_parser = commands.add_parser('db', help="Create or upgrade the database schema")
+    db_parser.add_argument('action', choices=['upgrade', 'status'])
+    db_parser.set_defaults(func=cmd_db)
+
+    load_parser = commands.add_parser('load', help="Bulk load SQL dumps or CSV exports into an empty database")
+    load_parser.add_argument('files', nargs='+', help="SQLite .dump files and/or tenants, properties, transactions CSVs")
+    load_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    load_parser.add_argument('--no-upgrade', action='store_true',
+                             help="Only restore the rows; skip schema upgrades and ledger rebuild")
+    load_parser.set_defaults(func=cmd_load)
+
+    archive_parser = commands.add_parser('archive', help="Move old transactions to the archive database")
+    archive_parser.add_argument('action', choices=['run', 'status'])
+    cutoff = archive_parser.add_mutually_exclusive_group()
+    cutoff.add_argument('--before', help="Archive transactions dated before this day (YYYY-MM-DD)")
+    cutoff.add_argument('--keep-years', type=int, default=2,
+                        help="Keep the current year and this many before it (default 2)")
+    archive_parser.add_argument('--path', help="Archive database file (default: <database>-archive.db)")
+    archive_parser.add_argument('--batch-size', type=int, default=archive.DEFAULT_BATCH_SIZE)
+    archive_parser.set_defaults(func=cmd_archive)
+
+    partition_parser = commands.add_parser('partition', help="Split old transactions into per-year tables")
+    partition_parser.add_argument('action', choices=['split', 'status'])
+    partition_parser.add_argument('--through-year', type=int,
+                                  help="Last year to move out of the live table (default: last year)")
+    partition_parser.add_argument('--batch-size', type=int, default=archive.DEFAULT_BATCH_SIZE)
+    partition_parser.set_defaults(func=cmd_partition)
+
+    ledger_parser = commands.add_parser('ledger', help="Verify or rebuild ledger balances")
+    ledger_parser.add_argument('action', choices=['verify', 'rebuild'])
+    ledger_parser.set_defaults(func=cmd_ledger)
+
+    alerts_parser = commands.add_parser('alerts', help="Scan for expiring contracts and passports")
+    alerts_parser.add_argument('action', choices=['scan'])
+    alerts_parser.set_defaults(func=cmd_alerts)
+
+    return parser
+
+
+def organization_uris(orgs=None, create=False):
+    """Database URLs of ``orgs`` (default: every existing one); unless ``create``, they must exist."""
+    from fastapi_backend.config import settings
+    if not settings.ORG_DATABASE_URI:
+        raise ValueError('ORG_DATABASE_URI is not set')
+    if orgs is None:
+        orgs = sharding.existing_orgs(settings.ORG_DATABASE_URI, settings.instance_dir)
+    return {org: _organization_uri(settings, org, create) for org in orgs}
+
+
+def _organization_uri(settings, org, create):
+    url = sharding.database_url(settings.ORG_DATABASE_URI, org, settings.instance_dir)
+    if url.get_backend_name() == 'sqlite':
+        if create:
+            os.makedirs(os.path.dirname(url.database), exist_ok=True)
+        elif not os.path.exists(url.database):
+            raise ValueError(f'Unknown organization: {org} (create it with --org {org} db upgrade)')
+    return url.render_as_string(hide_password=False)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.org and not args.all_orgs:
+        return args.func(args)
+    # Creating an organization is upgrading or loading its empty database
+    create = args.command == 'load' or (args.command == 'db' and args.action == 'upgrade')
+    try:
+        uris = organization_uris([args.org] if args.org else None, create)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    status = 0
+    for org, uri in uris.items():
+        if args.all_orgs:
+            print(f"[{org}]")
+        args.database_uri = uri
+        status = max(status, args.func(args))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,8 +4,11 @@ Main entry point for the Tenant Management System Backend (Modular Version)
 """
 
 from backend.app import create_app
+from manage import upgrade_database
 
 app = create_app()
 
 if __name__ == '__main__':
+    # The development server keeps the old convenience of creating the schema on start
+    upgrade_database()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Tenant Management System (Modular Version)
+
+Runs the Flask backend under gunicorn or the FastAPI backend under uvicorn,
+each with several worker processes. Workers, threads, keep-alive, timeouts,
+preloading and worker recycling come from ``SERVER_*`` settings in
+backend/config.py and fastapi_backend/config.py.
+
+Usage:
+    python serve.py flask      # gunicorn, gthread workers (uv pip install gunicorn)
+    python serve.py fastapi    # uvicorn workers
+    python serve.py fastapi --no-migrate
+
+Reload code without dropping requests by sending SIGHUP to the master
+process: gunicorn and uvicorn both start fresh workers and let the old ones
+finish their requests. With SERVER_PRELOAD=true gunicorn imports the app
+once in the master, so a HUP restarts workers on the already loaded code;
+restart the master to pick up code changes in that mode.
+
+The schema is brought up to date once here, before any worker starts, so
+workers boot without DDL checks; pass --no-migrate to skip it.
+"""
+
+import sys
+
+
+def serve_flask():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is required for the Flask server: uv pip install gunicorn")
+
+    from backend.config import Config
+
+    class FlaskApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported here so that without preloading only the workers build the app
+            from backend.app import create_app
+            return create_app()
+
+    options = {
+        'bind': f"{Config.SERVER_HOST}:{Config.SERVER_PORT}",
+        'workers': Config.SERVER_WORKERS,
+        'threads': Config.SERVER_THREADS,
+        'worker_class': 'gthread' if Config.SERVER_THREADS > 1 else 'sync',
+        'keepalive': Config.SERVER_KEEPALIVE,
+        'timeout': Config.SERVER_TIMEOUT,
+        'graceful_timeout': Config.SERVER_GRACEFUL_TIMEOUT,
+        'preload_app': Config.SERVER_PRELOAD,
+        'max_requests': Config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': Config.SERVER_MAX_REQUESTS // 10,
+        'proc_name': 'tenant-management-flask',
+        'accesslog': '-',
+    }
+    FlaskApplication(options).run()
+
+
+def serve_fastapi():
+    import uvicorn
+
+    from fastapi_backend.config import settings
+
+    # Workers are spawned, not forked, so each imports the app and opens its own engine
+    uvicorn.run(
+        'fastapi_backend.main:app',
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+        proxy_headers=True,
+    )
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--no-migrate']
+    backend = args[0].lower() if args else 'fastapi'
+    if backend in ('flask', 'fastapi') and '--no-migrate' not in sys.argv:
+        from manage import upgrade_database
+        upgrade_database()
+    if backend == 'flask':
+        serve_flask()
+    elif backend == 'fastapi':
+        serve_fastapi()
+    else:
+        print("Usage: python serve.py [flask|fastapi] [--no-migrate]")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
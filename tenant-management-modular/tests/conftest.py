@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from common.migrations import bootstrap
+from fastapi_backend.models import Base
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'app.db'}"
+
+
+@pytest.fixture
+def engine(database_uri):
+    """An empty SQLite database with the current schema."""
+    engine = create_engine(database_uri)
+    bootstrap(engine, Base.metadata)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+def insert_rows(connection, table, rows):
+    """Insert ``rows`` (dicts with the same keys) with plain SQL, bypassing the ORM events."""
+    columns = list(rows[0])
+    connection.execute(
+        text(f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join(":" + c for c in columns)})'),
+        rows,
+    )
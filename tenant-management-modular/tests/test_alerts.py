@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from common import alerts
+from conftest import insert_rows
+
+TODAY = date(2025, 6, 1)
+
+
+def _tenant(connection, contract_days_left):
+    insert_rows(connection, 'property', [{'id': 1, 'address': '1 Main St'}])
+    insert_rows(connection, 'tenant', [{
+        'id': 1, 'name': 'Asha', 'property_id': 1,
+        'contract_expiry_date': (TODAY + timedelta(days=contract_days_left)).isoformat(),
+    }])
+
+
+def test_scan_records_the_tightest_crossed_threshold_once(engine):
+    with engine.connect() as conn:
+        _tenant(conn, 5)
+        inserted = alerts.scan(conn, today=TODAY)
+        again = alerts.scan(conn, today=TODAY)
+        conn.commit()
+        rows = conn.execute(text('SELECT kind, threshold_days, created_date FROM expiry_alert')).fetchall()
+
+    assert [(a['kind'], a['threshold_days']) for a in inserted] == [('contract', 7)]
+    assert again == []
+    assert [(row.kind, row.threshold_days) for row in rows] == [('contract', 7)]
+
+
+def test_scan_stamps_alerts_in_naive_utc(engine):
+    before = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    with engine.connect() as conn:
+        _tenant(conn, 0)
+        alerts.scan(conn, today=TODAY)
+        created = conn.execute(text('SELECT created_date FROM expiry_alert')).scalar()
+
+    stamped = datetime.fromisoformat(str(created))
+    assert stamped.tzinfo is None
+    assert before <= stamped <= before + timedelta(minutes=1)
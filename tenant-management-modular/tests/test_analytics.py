@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+
+from common import analytics
+from fastapi_backend.models import Property, Tenant, Transaction
+
+
+@pytest.fixture
+def portfolio(session):
+    session.add_all([
+        Property(id=1, address='1 Main St', rent=100.0),
+        Property(id=2, address='2 Side Rd', rent=200.0),
+        Property(id=3, address='3 Empty Ln', rent=0.0),
+    ])
+    session.add_all([
+        Transaction(property_id=property_id, type=kind, for_month=for_month, amount=amount,
+                    transaction_date=date(2025, 3, 5))
+        for property_id, kind, for_month, amount in [
+            (1, 'rent', 'January 2025', 100.0), (1, 'rent', 'February 2025', 100.0),
+            (1, 'rent', 'March 2025', 100.0), (1, 'payment_received', 'January 2025', 100.0),
+            (1, 'payment_received', 'February 2025', 60.0), (2, 'rent', 'January 2025', 200.0),
+            (2, 'payment_received', 'March 2025', 150.0),
+            # A property that no longer exists is left out of every series
+            (99, 'payment_received', 'January 2025', 10.0),
+        ]
+    ])
+    session.add_all([
+        Tenant(name='Asha', property_id=1, move_in_date=date(2025, 1, 15), contract_expiry_date=date(2025, 2, 10)),
+        # Open-ended contract: occupies through the end of the window
+        Tenant(name='Ravi', property_id=1, move_in_date=date(2025, 2, 1)),
+        # No move-in date: occupies from the start of the window
+        Tenant(name='Mira', property_id=2, contract_expiry_date=date(2025, 1, 31)),
+        # Expired before moving in
+        Tenant(name='Dev', property_id=2, move_in_date=date(2025, 3, 1), contract_expiry_date=date(2024, 12, 31)),
+        Tenant(name='Nobody', property_id=None, move_in_date=date(2025, 1, 1)),
+    ])
+    session.commit()
+    return session
+
+
+def test_monthly_collections_grid(portfolio):
+    report = analytics.monthly_collections(portfolio, '2025-01', '2025-03')
+
+    assert report['months'] == ['2025-01', '2025-02', '2025-03']
+    assert {s['property_id']: s['values'] for s in report['series']} == {
+        1: [100.0, 60.0, 0.0], 2: [0.0, 0.0, 150.0], 3: [0.0, 0.0, 0.0],
+    }
+    assert report['total'] == [100.0, 60.0, 150.0]
+    assert analytics.monthly_collections(portfolio, start=date(2025, 2, 1))['total'] == [60.0, 150.0]
+    # Without bounds the window spans the observed payment months
+    assert analytics.monthly_collections(portfolio)['months'] == report['months']
+
+
+def test_rent_roll_ratios(portfolio):
+    report = analytics.rent_roll(portfolio, '2025-01', '2025-03')
+
+    assert report['months'] == 3
+    rows = {row['property_id']: row for row in report['properties']}
+    assert (rows[1]['expected_rent'], rows[1]['billed_rent'], rows[1]['average_monthly_rent']) == (300.0, 300.0, 100.0)
+    assert (rows[1]['collected'], rows[1]['billing_ratio'], rows[1]['collection_rate']) == (160.0, 1.0, 0.5333)
+    assert (rows[2]['billing_ratio'], rows[2]['collection_rate']) == (0.3333, 0.75)
+    assert (rows[3]['billing_ratio'], rows[3]['collection_rate']) == (None, None)
+
+
+def test_occupancy_handles_open_ended_and_missing_dates(portfolio):
+    report = analytics.occupancy(portfolio, '2025-01', '2025-04')
+
+    assert report['months'] == ['2025-01', '2025-02', '2025-03', '2025-04']
+    assert report['total_properties'] == 3
+    assert report['occupied'] == [2, 1, 1, 1]
+    assert report['tenants'] == [2, 2, 1, 1]
+    assert report['occupancy_rate'] == [0.6667, 0.3333, 0.3333, 0.3333]
+    # Without bounds the window spans the observed move-in months
+    assert analytics.occupancy(portfolio)['months'] == ['2025-01', '2025-02', '2025-03']
+
+
+@pytest.mark.parametrize('report', [analytics.monthly_collections, analytics.rent_roll, analytics.occupancy])
+def test_end_before_start_is_rejected(portfolio, report):
+    with pytest.raises(ValueError, match='end must not be before start'):
+        report(portfolio, '2025-03', '2025-01')
+
+
+def test_empty_database_reports_the_current_month(session):
+    this_month = date.today().isoformat()[:7]
+    assert analytics.monthly_collections(session) == {'months': [this_month], 'series': [], 'total': [0.0]}
+    assert analytics.occupancy(session)['occupancy_rate'] == [None]
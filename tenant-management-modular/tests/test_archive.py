@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from common import archive, ledger, partitions
+from fastapi_backend.main import _property_ledger, _tenant_ledger
+from fastapi_backend.models import Property, Tenant, Transaction
+
+CUTOFF = date(2023, 1, 1)
+
+
+@pytest.fixture
+def history(engine, session):
+    session.add_all([Property(id=1, address='1 Main St'), Tenant(id=1, name='Asha', property_id=1)])
+    session.add_all([
+        Transaction(id=i, property_id=1, tenant_id=1, type='rent', amount=10.0 * i, transaction_date=day)
+        for i, day in enumerate([date(2021, 3, 1), date(2021, 9, 1), date(2022, 6, 1), date(2024, 2, 1)], start=1)
+    ])
+    session.commit()
+    return engine
+
+
+def _ids(conn, sql_from, where=''):
+    return conn.execute(text(f'SELECT id FROM {sql_from} AS tx {where} ORDER BY id')).scalars().all()
+
+
+def test_archive_moves_closed_years_into_the_attached_file(history, tmp_path):
+    path = tmp_path / 'app-archive.db'
+    state = archive.archive_transactions(history, path, CUTOFF, batch_size=1)
+
+    assert (state.row_count, state.first_transaction_date, state.last_transaction_date) == (
+        3, date(2021, 3, 1), date(2022, 6, 1))
+    with history.connect() as conn:
+        assert _ids(conn, archive.TABLE) == [4]
+        assert _ids(conn, partitions.source(conn)) == [1, 2, 3, 4]
+        assert _ids(conn, f'{archive.SCHEMA}.{archive.TABLE}') == [1, 2, 3]
+        assert ledger.verify(conn) == []
+        assert ledger.get_balance(conn, 'property', 1)['charges'] == 100.0
+
+
+def test_source_attaches_the_archive_only_for_covered_ranges(history, tmp_path):
+    archive.archive_transactions(history, tmp_path / 'app-archive.db', CUTOFF)
+    # Start from connections that have not attached the archive while moving rows
+    history.dispose()
+
+    with history.connect() as conn:
+        assert partitions.source(conn, start=date(2023, 1, 1)) == archive.TABLE
+        assert partitions.source(conn, end=date(2021, 1, 1)) == archive.TABLE
+        assert archive.SCHEMA not in {row[1] for row in conn.execute(text('PRAGMA database_list'))}
+
+        covered = partitions.source(conn, start=date(2022, 1, 1))
+        assert _ids(conn, covered, "WHERE transaction_date >= '2022-01-01'") == [3, 4]
+        assert archive.SCHEMA in {row[1] for row in conn.execute(text('PRAGMA database_list'))}
+
+
+def test_rerunning_with_the_same_cutoff_is_a_no_op(history, tmp_path):
+    path = tmp_path / 'app-archive.db'
+    first = archive.archive_transactions(history, path, CUTOFF)
+    again = archive.archive_transactions(history, path, date(2022, 1, 1))
+
+    assert (again.row_count, again.cutoff) == (first.row_count, first.cutoff)
+    with pytest.raises(ValueError):
+        archive.archive_transactions(history, tmp_path / 'other.db', CUTOFF)
+
+
+def test_archive_empties_and_drops_year_partitions(history, tmp_path):
+    partitions.split(history, through_year=2022)
+    partitions.archive_transactions(history, tmp_path / 'app-archive.db', date(2022, 1, 1))
+
+    with history.connect() as conn:
+        assert [p.table_name for p in partitions.get_partitions(conn)] == ['transaction_2022']
+        assert _ids(conn, 'transaction_2022') == [3]
+        assert _ids(conn, partitions.source(conn)) == [1, 2, 3, 4]
+        assert ledger.verify(conn) == []
+
+
+def test_ledgers_and_lookups_include_archived_transactions(history, tmp_path):
+    archive.archive_transactions(history, tmp_path / 'app-archive.db', CUTOFF)
+
+    with Session(history) as session:
+        for ledger_page in (_tenant_ledger(session, 1), _property_ledger(session, 1)):
+            listed = ledger_page['transactions']
+            assert [tx['id'] for tx in listed] == [4, 3, 2, 1]
+            assert -sum(tx['amount'] for tx in listed) == ledger_page['total'] == -100.0
+        assert partitions.get(session, Transaction, 2).amount == 20.0
+        assert partitions.get(session, Transaction, 2, archived=False) is None
+        assert [t.id for t in partitions.load(session, Transaction, archived=False)] == [4]
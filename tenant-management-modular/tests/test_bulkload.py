@@ -0,0 +1,135 @@
+import re
+import sqlite3
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from common.bulkload import Loader
+from common.migrations import bootstrap
+from fastapi_backend.main import _properties_csv, _tenants_csv, _transactions_csv
+from fastapi_backend.models import Base, Property, Tenant, Transaction
+
+# An older database: AUTOINCREMENT ids (so the dump carries sqlite_sequence rows),
+# money in major units, a column the current schema dropped and a table it never had
+SOURCE_SCHEMA = """
+    CREATE TABLE property (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, address VARCHAR(255) NOT NULL, rent FLOAT, maintenance FLOAT,
+        legacy_code VARCHAR(10)
+    );
+    CREATE TABLE tenant (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(100) NOT NULL, property_id INTEGER,
+        rent FLOAT, security FLOAT, contract_expiry_date DATE
+    );
+    CREATE TABLE "transaction" (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, property_id INTEGER NOT NULL, tenant_id INTEGER,
+        type VARCHAR(50) NOT NULL, for_month VARCHAR(20), amount FLOAT NOT NULL, transaction_date DATE,
+        comments TEXT
+    );
+    CREATE INDEX ix_old_tenant ON "transaction" (tenant_id);
+    CREATE TABLE note (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT);
+    INSERT INTO property (address, rent, maintenance, legacy_code) VALUES
+        ('1 Main St', 16700.0, 10.5, 'A'), ('2 Side Rd', 8800.0, NULL, 'B');
+    INSERT INTO tenant (name, property_id, rent, security, contract_expiry_date) VALUES
+        ('Asha', 1, 16700.0, 0.285, '2025-12-31'), ('Ravi', 2, 8800.0, 8000.0, NULL);
+    INSERT INTO "transaction" (property_id, tenant_id, type, for_month, amount, transaction_date, comments) VALUES
+        (1, 1, 'rent', 'January', 551.21, '2025-01-05', 'it''s paid;
+in two lines'),
+        (1, 1, 'payment_received', 'January', 200.0, '2025-01-10', NULL),
+        (2, NULL, 'maintenance', NULL, 0.285, '2025-02-01', NULL);
+    INSERT INTO note (body) VALUES ('first'), ('second'), ('third');
+"""
+
+
+def _cli_style(lines):
+    """The sqlite3 shell's ``.dump`` leaves plain table names unquoted."""
+    for line in lines:
+        yield re.sub(r'^(INSERT INTO|DELETE FROM) "(\w+)"', lambda m: f'{m[1]} {m[2]}', line)
+
+
+@pytest.fixture(params=['iterdump', 'cli'])
+def dump_path(request, tmp_path):
+    source = sqlite3.connect(tmp_path / 'source.db')
+    source.executescript(SOURCE_SCHEMA)
+    lines = source.iterdump()
+    if request.param == 'cli':
+        lines = _cli_style(lines)
+    path = tmp_path / 'dump.sql'
+    path.write_text(''.join(f'{line}\n' for line in lines), encoding='utf-8')
+    source.close()
+    return path
+
+
+def _load(engine, load):
+    loader = Loader(engine, batch_size=2)
+    try:
+        load(loader)
+        return loader.finish()
+    finally:
+        loader.close()
+
+
+def test_dump_round_trip_converts_money_and_skips_sqlite_sequence(engine, dump_path):
+    report = _load(engine, lambda loader: loader.load_dump(dump_path))
+
+    assert report['integrity'] == 'ok'
+    assert report['rows'] == {'property': 2, 'tenant': 2, 'transaction': 3, 'note': 3}
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT id, amount, comments FROM "transaction" ORDER BY id')).fetchall() == [
+            (1, 55121, "it's paid;\nin two lines"), (2, 20000, None), (3, 29, None),
+        ]
+        assert conn.execute(text('SELECT id, rent, maintenance FROM property ORDER BY id')).fetchall() == [
+            (1, 1670000, 1050), (2, 880000, None),
+        ]
+        assert conn.execute(text('SELECT rent, security FROM tenant WHERE id = 1')).first() == (1670000, 29)
+        assert conn.execute(text('SELECT body FROM note ORDER BY id')).scalars().all() == ['first', 'second', 'third']
+        indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+    assert 'ix_old_tenant' in indexes
+    assert 'ix_transaction_tenant_period' in indexes
+
+
+def test_dump_into_a_database_with_rows_is_refused(engine, dump_path):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO property (id, address) VALUES (9, 'taken')"))
+
+    with pytest.raises(ValueError, match='already has rows'):
+        _load(engine, lambda loader: loader.load_dump(dump_path))
+
+
+def test_csv_round_trip_resolves_addresses_and_tenant_names(engine, tmp_path):
+    source = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    bootstrap(source, Base.metadata)
+    with Session(source) as session:
+        session.add_all([
+            Property(id=1, address='1 Main St', rent=16700.0, maintenance=10.5),
+            Property(id=2, address='2 Side Rd', rent=8800.0),
+            # The same name at two properties resolves by property first
+            Tenant(id=1, name='Asha', property_id=1, rent=16700.0, security=0.29, contract_expiry_date=date(2025, 12, 31)),
+            Tenant(id=2, name='Asha', property_id=2, rent=8800.0),
+        ])
+        session.add_all([
+            Transaction(id=1, property_id=1, tenant_id=1, type='rent', for_month='January 2025',
+                        amount=551.21, transaction_date=date(2025, 1, 5), comments='a, "quoted"\nnote'),
+            Transaction(id=2, property_id=2, tenant_id=2, type='rent', amount=88.0, transaction_date=date(2025, 1, 6)),
+            Transaction(id=3, property_id=2, tenant_id=None, type='maintenance', amount=0.29,
+                        transaction_date=date(2025, 2, 1)),
+        ])
+        session.commit()
+        exports = {}
+        for table, export in (('property', _properties_csv), ('tenant', _tenants_csv), ('transaction', _transactions_csv)):
+            exports[table] = tmp_path / f'{table}.csv'
+            exports[table].write_text(export(session), encoding='utf-8', newline='')
+    source.dispose()
+
+    report = _load(engine, lambda loader: [loader.load_csv(path) for path in exports.values()])
+
+    assert report['integrity'] == 'ok'
+    assert report['rows'] == {'property': 2, 'tenant': 2, 'transaction': 3}
+    with Session(engine) as session:
+        tenants = {t.id: (t.property_id, t.rent, t.security, t.contract_expiry_date) for t in session.query(Tenant)}
+        transactions = {t.id: (t.property_id, t.tenant_id, t.amount, t.comments) for t in session.query(Transaction)}
+    assert tenants == {1: (1, 16700.0, 0.29, date(2025, 12, 31)), 2: (2, 8800.0, 0.0, None)}
+    assert transactions == {
+        1: (1, 1, 551.21, 'a, "quoted"\nnote'), 2: (2, 2, 88.0, None), 3: (2, None, 0.29, None),
+    }
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common import sharding
+from common.coalesce import SingleFlight
+
+CALLERS = 8
+
+
+def _gated():
+    """A function that blocks until released and counts its calls."""
+    release = threading.Event()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return [value]
+    return compute, release, calls
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting for the callers'
+        time.sleep(0.001)
+
+
+def _wait_for_waiters(flight, count):
+    _wait_until(lambda: sum(flight.coalesced.values()) >= count)
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight('reports')
+    compute, release, calls = _gated()
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(flight.do, ('report', 1), compute, 'rows') for _ in range(CALLERS)]
+        _wait_for_waiters(flight, CALLERS - 1)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ['rows']
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats['executions'], stats['coalesced'], stats['in_flight']) == (1, CALLERS - 1, 0)
+    assert stats['routes'] == {'report': {'executions': 1, 'coalesced': CALLERS - 1}}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight('reports')
+    compute, release, calls = _gated()
+    error = RuntimeError('database is locked')
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, ('report',), compute, error) for _ in range(3)]
+        _wait_for_waiters(flight, 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert len(calls) == 1
+
+
+def test_results_are_not_kept_after_the_flight_lands():
+    flight = SingleFlight('reports')
+    assert flight.do(('report',), lambda: 1) == 1
+    assert flight.do(('report',), lambda: 2) == 2
+    assert flight.stats()['executions'] == 2
+
+
+def test_invalidate_and_organizations_start_separate_flights():
+    flight = SingleFlight('reports')
+    compute, release, calls = _gated()
+
+    with ThreadPoolExecutor(3) as pool:
+        before = pool.submit(flight.do, ('report',), compute, 'before write')
+        _wait_until(lambda: calls)
+        flight.invalidate()
+        after = pool.submit(flight.do, ('report',), compute, 'after write')
+
+        def other_org():
+            token = sharding.activate('acme', None)
+            try:
+                return flight.do(('report',), compute, 'acme')
+            finally:
+                sharding.deactivate(token)
+        acme = pool.submit(other_org)
+        _wait_until(lambda: len(calls) == 3)
+        release.set()
+
+        assert (before.result(), after.result(), acme.result()) == (['before write'], ['after write'], ['acme'])
+    assert flight.stats()['coalesced'] == 0
@@ -0,0 +1,85 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from common import ledger
+from fastapi_backend.models import Property, Tenant, Transaction
+
+
+def _balance(session, entity_type, entity_id):
+    balance = ledger.get_balance(session, entity_type, entity_id)
+    return balance['charges'], balance['payments'], balance['balance'], balance['transaction_count']
+
+
+def _seed(session):
+    session.add_all([
+        Property(id=1, address='1 Main St', rent=100.0),
+        Tenant(id=1, name='Asha', property_id=1),
+        Tenant(id=2, name='Ravi', property_id=1),
+    ])
+    session.add_all([
+        Transaction(id=1, property_id=1, tenant_id=1, type='rent', for_month='January 2025',
+                    amount=0.1, transaction_date=date(2025, 1, 5)),
+        Transaction(id=2, property_id=1, tenant_id=1, type='rent', for_month='February 2025',
+                    amount=0.2, transaction_date=date(2025, 2, 5)),
+        Transaction(id=3, property_id=1, tenant_id=1, type='payment_received', for_month='January 2025',
+                    amount=0.3, transaction_date=date(2025, 1, 10)),
+        Transaction(id=4, property_id=1, tenant_id=None, type='maintenance', for_month=None,
+                    amount=12.5, transaction_date=date(2025, 1, 20)),
+    ])
+    session.commit()
+
+
+def test_inserts_add_exact_deltas(session):
+    _seed(session)
+
+    assert _balance(session, 'tenant', 1) == (0.3, 0.3, 0.0, 3)
+    assert _balance(session, 'property', 1) == (12.8, 0.3, -12.5, 4)
+    assert _balance(session, 'tenant', 2) == (0.0, 0.0, 0.0, 0)
+    assert ledger.verify(session) == []
+
+
+def test_updates_move_amounts_between_entities_and_months(session):
+    _seed(session)
+    transaction = session.get(Transaction, 2)
+    transaction.tenant_id = 2
+    transaction.amount = 50.0
+    transaction.for_month = 'March 2025'
+    session.get(Transaction, 3).type = 'rent'
+    session.commit()
+
+    assert _balance(session, 'tenant', 1) == (0.4, 0.0, -0.4, 2)
+    assert _balance(session, 'tenant', 2) == (50.0, 0.0, -50.0, 1)
+    assert _balance(session, 'property', 1) == (62.9, 0.0, -62.9, 4)
+    months = session.execute(text(
+        "SELECT period_month, charges FROM ledger_month_balance WHERE entity_type = 'tenant' AND entity_id = 2"
+    )).fetchall()
+    assert [tuple(row) for row in months] == [('2025-03-01', 5000)]
+    assert ledger.verify(session) == []
+
+
+def test_deletes_subtract_their_contribution(session):
+    _seed(session)
+    session.delete(session.get(Transaction, 1))
+    session.delete(session.get(Transaction, 3))
+    session.commit()
+
+    assert _balance(session, 'tenant', 1) == (0.2, 0.0, -0.2, 1)
+    assert _balance(session, 'property', 1) == (12.7, 0.0, -12.7, 2)
+    assert ledger.verify(session) == []
+
+
+def test_rebuild_repairs_and_reports_drift(session):
+    _seed(session)
+    session.execute(text("UPDATE ledger_balance SET charges = 0 WHERE entity_type = 'tenant'"))
+    session.execute(text("DELETE FROM ledger_month_balance WHERE entity_type = 'property'"))
+
+    drift = ledger.verify(session)
+    assert {(d['table'], d['key']) for d in drift} == {
+        ('ledger_balance', ('tenant', '1')),
+        ('ledger_month_balance', ('property', '1', '2025-01-01')),
+        ('ledger_month_balance', ('property', '1', '2025-02-01')),
+    }
+    assert ledger.rebuild(session) == drift
+    assert ledger.verify(session) == []
+    assert _balance(session, 'tenant', 1) == (0.3, 0.3, 0.0, 3)
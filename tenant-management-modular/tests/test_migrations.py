@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from common import ledger
+from common.migrations import MIGRATIONS, applied_versions, bootstrap
+from conftest import insert_rows
+from fastapi_backend.models import Base, Transaction
+
+# Schema of the shipped instance/app.db before any migration: amounts are
+# floats in major units and the ledger tables do not exist yet
+BASELINE_SCHEMA = [
+    """CREATE TABLE property (
+        id INTEGER NOT NULL, address VARCHAR(255) NOT NULL, rent FLOAT, maintenance FLOAT,
+        created_date DATETIME, created_by VARCHAR(50), last_updated DATETIME, last_updated_by VARCHAR(50),
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE tenant (
+        id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, passport VARCHAR(100), passport_validity DATE,
+        aadhar_no VARCHAR(100), employment_details VARCHAR(255), permanent_address VARCHAR(255),
+        contact_no VARCHAR(20), emergency_contact_no VARCHAR(20), rent FLOAT, security FLOAT,
+        move_in_date DATE, contract_start_date DATE, contract_expiry_date DATE, created_date DATETIME,
+        created_by VARCHAR(50), last_updated DATETIME, last_updated_by VARCHAR(50), property_id INTEGER,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE "transaction" (
+        id INTEGER NOT NULL, property_id INTEGER NOT NULL, tenant_id INTEGER, type VARCHAR(50) NOT NULL,
+        for_month VARCHAR(20), amount FLOAT NOT NULL, created_date DATETIME, created_by VARCHAR(50),
+        last_updated DATETIME, last_updated_by VARCHAR(50), transaction_date DATE, comments TEXT,
+        PRIMARY KEY (id)
+    )""",
+]
+
+
+@pytest.fixture
+def baseline_engine(database_uri):
+    engine = create_engine(database_uri)
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.exec_driver_sql(statement)
+        insert_rows(conn, 'property', [{'id': 1, 'address': '1 Main St', 'rent': 16700.0, 'maintenance': 10.5}])
+        insert_rows(conn, 'tenant', [{'id': 1, 'name': 'Asha', 'property_id': 1, 'rent': 16700.0, 'security': 0.285}])
+        insert_rows(conn, 'transaction', [
+            {'id': 1, 'property_id': 1, 'tenant_id': 1, 'type': 'rent', 'for_month': 'January',
+             'amount': 551.21, 'transaction_date': '2025-01-05'},
+            {'id': 2, 'property_id': 1, 'tenant_id': 1, 'type': 'payment_received', 'for_month': 'January',
+             'amount': 200.0, 'transaction_date': '2025-01-10'},
+            {'id': 3, 'property_id': 1, 'tenant_id': None, 'type': 'maintenance', 'for_month': None,
+             'amount': 0.285, 'transaction_date': '2025-02-01'},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_from_baseline_applies_every_migration(baseline_engine):
+    applied = bootstrap(baseline_engine, Base.metadata)
+
+    assert [version for version, _ in applied] == [version for version, _ in MIGRATIONS]
+    with baseline_engine.connect() as conn:
+        assert set(applied_versions(conn)) == {version for version, _ in MIGRATIONS}
+        amounts = conn.execute(text('SELECT id, amount FROM "transaction" ORDER BY id')).fetchall()
+        money = conn.execute(text('SELECT rent, security FROM tenant')).first()
+    assert [tuple(row) for row in amounts] == [(1, 55121), (2, 20000), (3, 29)]
+    assert tuple(money) == (1670000, 29)
+
+
+def test_upgrade_from_baseline_leaves_consistent_ledger_balances(baseline_engine):
+    bootstrap(baseline_engine, Base.metadata)
+
+    with baseline_engine.connect() as conn:
+        assert ledger.verify(conn) == []
+        tenant = ledger.get_balance(conn, 'tenant', 1)
+        prop = ledger.get_balance(conn, 'property', 1)
+    assert (tenant['charges'], tenant['payments'], tenant['balance']) == (551.21, 200.0, -351.21)
+    assert (prop['charges'], prop['balance'], prop['transaction_count']) == (551.5, -351.5, 3)
+
+
+def test_upgraded_database_reads_major_units_through_the_orm(baseline_engine):
+    bootstrap(baseline_engine, Base.metadata)
+
+    with Session(baseline_engine) as session:
+        transaction = session.get(Transaction, 1)
+        assert transaction.amount == 551.21
+        assert transaction.period_month.isoformat() == '2025-01-01'
+
+
+def _dump(engine):
+    with engine.connect() as conn:
+        tables = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'schema_version' ORDER BY name"
+        )).scalars().all()
+        return {table: conn.execute(text(f'SELECT * FROM "{table}" ORDER BY 1, 2')).fetchall() for table in tables}
+
+
+def test_fresh_database_is_stamped_without_running_steps(engine):
+    with engine.connect() as conn:
+        assert set(applied_versions(conn)) == {version for version, _ in MIGRATIONS}
+    assert bootstrap(engine, Base.metadata) == []
+
+
+def test_bootstrap_after_an_upgrade_applies_nothing(baseline_engine):
+    bootstrap(baseline_engine, Base.metadata)
+    upgraded = _dump(baseline_engine)
+
+    assert bootstrap(baseline_engine, Base.metadata) == []
+    assert _dump(baseline_engine) == upgraded
+
+
+@pytest.mark.parametrize('step', [step for _, step in MIGRATIONS], ids=lambda step: step.__name__)
+def test_rerunning_a_step_leaves_the_data_unchanged(baseline_engine, step):
+    bootstrap(baseline_engine, Base.metadata)
+    upgraded = _dump(baseline_engine)
+
+    with baseline_engine.connect() as conn:
+        step(conn)
+        conn.commit()
+
+    assert _dump(baseline_engine) == upgraded
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from common.money import from_minor, minor_units_sql, to_minor
+
+
+@pytest.mark.parametrize('value, minor', [
+    (0, 0),
+    (551.21, 55121),
+    (16700, 1670000),
+    ('12.5', 1250),
+    (Decimal('0.01'), 1),
+    (0.285, 29),
+    (1.005, 101),
+    (0.004, 0),
+    (-0.285, -29),
+    (-0.005, -1),
+    (None, None),
+])
+def test_to_minor_rounds_the_decimal_text_half_away_from_zero(value, minor):
+    assert to_minor(value) == minor
+
+
+@pytest.mark.parametrize('minor, value', [(0, 0.0), (55121, 551.21), (-29, -0.29), ('1250', 12.5), (None, None)])
+def test_from_minor(minor, value):
+    assert from_minor(minor) == value
+
+
+@pytest.mark.parametrize('value', [0.1, 0.29, 1.01, 551.21, 99999.99, -351.21])
+def test_round_trip_is_exact_for_two_decimals(value):
+    assert from_minor(to_minor(value)) == value
+
+
+@pytest.mark.parametrize('value', [0.285, 1.005, 2.675, 551.21, -0.285, 16700.0])
+def test_minor_units_sql_matches_to_minor(engine, value):
+    with engine.connect() as conn:
+        converted = conn.execute(text(f'SELECT {minor_units_sql(":value")}'), {'value': value}).scalar()
+    assert converted == to_minor(value)
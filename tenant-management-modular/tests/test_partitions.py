@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from common import partitions
+from common.migrations import bootstrap
+from conftest import insert_rows
+from fastapi_backend.models import Base, Transaction
+
+# The transaction table of the original app: transaction_date and comments were
+# added later by ALTER TABLE, and migration 1 appends period_month after them
+LEGACY_TRANSACTION = """
+    CREATE TABLE "transaction" (
+        id INTEGER NOT NULL, property_id INTEGER NOT NULL, tenant_id INTEGER, type VARCHAR(50) NOT NULL,
+        for_month VARCHAR(20), amount BIGINT NOT NULL, created_date DATETIME, created_by VARCHAR(50),
+        last_updated DATETIME, last_updated_by VARCHAR(50), PRIMARY KEY (id)
+    )
+"""
+
+
+@pytest.fixture
+def altered_engine(database_uri):
+    engine = create_engine(database_uri)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_TRANSACTION)
+        conn.exec_driver_sql('ALTER TABLE "transaction" ADD COLUMN transaction_date DATE')
+        conn.exec_driver_sql('ALTER TABLE "transaction" ADD COLUMN comments TEXT')
+    bootstrap(engine, Base.metadata)
+    with engine.begin() as conn:
+        insert_rows(conn, 'property', [{'id': 1, 'address': '1 Main St', 'rent': 1000000, 'maintenance': 0}])
+        insert_rows(conn, 'tenant', [{'id': 1, 'name': 'Asha', 'property_id': 1, 'rent': 1000000}])
+        insert_rows(conn, 'transaction', [
+            {'id': 1, 'property_id': 1, 'tenant_id': 1, 'type': 'rent', 'for_month': 'January 2023',
+             'amount': 1000000, 'transaction_date': '2023-01-05', 'comments': 'old', 'period_month': '2023-01-01',
+             'created_date': '2023-01-05 10:00:00'},
+            {'id': 2, 'property_id': 1, 'tenant_id': 1, 'type': 'payment_received', 'for_month': None,
+             'amount': 12345, 'transaction_date': f'{date.today().year}-01-10', 'comments': None,
+             'period_month': f'{date.today().year}-01-01', 'created_date': None},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def test_table_extended_by_alter_keeps_a_different_column_order(altered_engine):
+    with altered_engine.connect() as conn:
+        physical = [row[1] for row in conn.exec_driver_sql('PRAGMA table_info("transaction")')]
+    assert physical != [column.name for column in Transaction.__table__.columns]
+
+
+def test_load_maps_columns_by_name(altered_engine):
+    with Session(altered_engine) as session:
+        loaded = {t.id: t for t in partitions.load(session, Transaction)}
+
+    assert loaded[1].transaction_date == date(2023, 1, 5)
+    assert loaded[1].period_month == date(2023, 1, 1)
+    assert loaded[1].comments == 'old'
+    assert loaded[1].amount == 10000.0
+    assert loaded[2].type == 'payment_received'
+    assert loaded[2].amount == 123.45
+    assert loaded[2].created_date is None
+
+
+def test_load_and_get_read_year_partitions(altered_engine):
+    partitions.split(altered_engine, through_year=2023)
+    with altered_engine.connect() as conn:
+        assert [p.table_name for p in partitions.get_partitions(conn)] == ['transaction_2023']
+
+    with Session(altered_engine) as session:
+        loaded = partitions.load(session, Transaction, {'tenant_id': 1}, 'transaction_date DESC')
+        assert [t.id for t in loaded] == [2, 1]
+        assert loaded[1].transaction_date == date(2023, 1, 5)
+        assert partitions.get(session, Transaction, 1).comments == 'old'
+
+
+def test_promote_moves_a_partitioned_row_back(altered_engine):
+    partitions.split(altered_engine, through_year=2023)
+    with Session(altered_engine) as session:
+        assert partitions.promote(session, 1)
+        session.commit()
+        assert session.get(Transaction, 1).transaction_date == date(2023, 1, 5)
+    with altered_engine.connect() as conn:
+        assert partitions.get_partitions(conn) == []
+        assert conn.execute(text('SELECT COUNT(*) FROM "transaction"')).scalar() == 2
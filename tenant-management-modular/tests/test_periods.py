@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import pytest
+
+from common.periods import period_month
+
+PAID = date(2025, 3, 15)
+
+
+@pytest.mark.parametrize('for_month, expected', [
+    ('2025-07', date(2025, 7, 1)),
+    ('2024/7', date(2024, 7, 1)),
+    ('07/2025', date(2025, 7, 1)),
+    ('7-2024', date(2024, 7, 1)),
+    ('July 2024', date(2024, 7, 1)),
+    ('jul, 2024', date(2024, 7, 1)),
+    ('2024 July', date(2024, 7, 1)),
+    ('  SEPTEMBER-2026 ', date(2026, 9, 1)),
+])
+def test_explicit_year_and_month(for_month, expected):
+    assert period_month(for_month, PAID) == expected
+
+
+@pytest.mark.parametrize('for_month, transaction_date, expected', [
+    ('March', PAID, date(2025, 3, 1)),
+    ('Mar', PAID, date(2025, 3, 1)),
+    # Up to three months ahead is paid in advance
+    ('June', PAID, date(2025, 6, 1)),
+    # Further ahead is a late entry for last year
+    ('July', PAID, date(2024, 7, 1)),
+    ('February', PAID, date(2025, 2, 1)),
+    # Across the new year in both directions
+    ('December', date(2025, 1, 10), date(2024, 12, 1)),
+    ('January', date(2024, 12, 20), date(2025, 1, 1)),
+    ('October', date(2025, 1, 10), date(2024, 10, 1)),
+])
+def test_bare_month_name_takes_the_year_from_the_transaction_date(for_month, transaction_date, expected):
+    assert period_month(for_month, transaction_date) == expected
+
+
+@pytest.mark.parametrize('for_month', ['rent', '2025-13', '13/2025', 'Q1 2025', '', None])
+def test_unparseable_values_fall_back_to_the_transaction_month(for_month):
+    assert period_month(for_month, PAID) == date(2025, 3, 1)
+
+
+@pytest.mark.parametrize('transaction_date', ['2025-03-15', '2025-03-15 10:30:00', datetime(2025, 3, 15, 10, 30)])
+def test_transaction_date_may_be_a_string_or_datetime(transaction_date):
+    assert period_month('December', transaction_date) == date(2024, 12, 1)
+    assert period_month(None, transaction_date) == date(2025, 3, 1)
+
+
+def test_without_a_transaction_date_today_is_the_reference():
+    assert period_month('nonsense') == date.today().replace(day=1)
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from common import sharding
+
+
+@pytest.fixture
+def orgs_dir(tmp_path):
+    directory = tmp_path / 'orgs'
+    directory.mkdir()
+    # An empty file is an empty SQLite database
+    for name in ('acme', 'globex', 'initech', 'acme-archive', 'Not Valid'):
+        (directory / f'{name}.db').touch()
+    return tmp_path
+
+
+@pytest.mark.parametrize('org', ['acme', 'a', 'acme_2-east', 'x' * 63])
+def test_validate_accepts_org_names(org):
+    assert sharding.validate(org) == org
+
+
+@pytest.mark.parametrize('org', ['', None, 'Acme', '-acme', 'acme/../x', 'a b', 'acme-archive', 'x' * 64])
+def test_validate_rejects_unsafe_names(org):
+    with pytest.raises(ValueError):
+        sharding.validate(org)
+
+
+def test_database_url_resolves_relative_sqlite_paths(tmp_path):
+    url = sharding.database_url('sqlite:///orgs/{org}.db', 'acme', base_dir=str(tmp_path))
+    assert url.database == os.path.join(str(tmp_path), 'orgs', 'acme.db')
+    assert sharding.database_url('postgresql://db/{org}', 'acme').database == 'acme'
+
+
+def test_existing_orgs_lists_valid_database_files(orgs_dir):
+    assert sharding.existing_orgs('sqlite:///orgs/{org}.db', str(orgs_dir)) == ['acme', 'globex', 'initech']
+    assert sharding.existing_orgs('sqlite:///{org}/app.db', str(orgs_dir)) == []
+    assert sharding.existing_orgs('postgresql://db/{org}') == []
+
+
+def test_split_path():
+    assert sharding.split_path('/orgs/acme/api/tenants') == ('acme', '/api/tenants')
+    assert sharding.split_path('/orgs/acme') == ('acme', '/')
+    assert sharding.split_path('/api/tenants') == (None, '/api/tenants')
+
+
+def test_engine_pool_reuses_and_evicts_least_recently_used(orgs_dir):
+    pool = sharding.EnginePool('sqlite:///orgs/{org}.db', max_engines=2, base_dir=str(orgs_dir))
+
+    acme = pool.get('acme')
+    pool.get('globex')
+    assert pool.get('acme') is acme
+    pool.get('initech')
+
+    stats = pool.stats()
+    assert (stats['open'], stats['hits'], stats['misses'], stats['evictions']) == (['acme', 'initech'], 1, 3, 1)
+    with acme.connect() as conn:
+        assert conn.execute(text('SELECT 1')).scalar() == 1
+    pool.dispose()
+    assert pool.stats()['open'] == []
+
+
+def test_engine_pool_rejects_unknown_organizations(orgs_dir):
+    pool = sharding.EnginePool('sqlite:///orgs/{org}.db', base_dir=str(orgs_dir))
+
+    with pytest.raises(LookupError):
+        pool.get('umbrella')
+    with pytest.raises(ValueError):
+        pool.get('../app')
+    assert not (orgs_dir / 'orgs' / 'umbrella.db').exists()
+
+
+def test_activate_sets_the_current_org_for_the_context():
+    engine = object()
+    token = sharding.activate('acme', engine)
+    try:
+        assert (sharding.current_org(), sharding.current_engine()) == ('acme', engine)
+    finally:
+        sharding.deactivate(token)
+    assert (sharding.current_org(), sharding.current_engine()) == (None, None)
+
+
+def test_path_prefix_middleware_moves_the_org_into_a_header():
+    seen = []
+    middleware = sharding.PathPrefixMiddleware(lambda environ, start_response: seen.append(dict(environ)))
+
+    middleware({'PATH_INFO': '/orgs/acme/api/tenants', 'SCRIPT_NAME': ''}, None)
+    middleware({'PATH_INFO': '/api/tenants', 'SCRIPT_NAME': ''}, None)
+
+    assert (seen[0]['PATH_INFO'], seen[0]['SCRIPT_NAME'], seen[0]['HTTP_X_ORGANIZATION']) == (
+        '/api/tenants', '/orgs/acme', 'acme')
+    assert 'HTTP_X_ORGANIZATION' not in seen[1]